@@ -9,11 +9,13 @@
     :license: GNU GPL v3 or above, see LICENSE for more details.
 """
 import cProfile
+import json
 import pstats
 import sys
 
 import MC6809
-from MC6809.core.bechmark import run_benchmark
+from MC6809.core.batch import BatchRunner, iter_jobs
+from MC6809.core.bechmark import run_benchmark, run_memory_benchmark
 
 
 try:
@@ -52,6 +54,13 @@ def benchmark(loops, multiply):
     run_benchmark(loops, multiply)
 
 
+@cli.command(help="Compare the speed of the memory backing stores")
+@click.option("--loops", default=DEFAULT_LOOPS,
+              help=f"How many benchmark loops should be run? (default: {DEFAULT_LOOPS:d})")
+def memory_benchmark(loops):
+    run_memory_benchmark(loops)
+
+
 @cli.command(help="Profile the MC6809 emulation benchmark")
 @click.option("--loops", default=DEFAULT_LOOPS,
               help=f"How many benchmark loops should be run? (default: {DEFAULT_LOOPS:d})")
@@ -68,5 +77,39 @@ def profile(loops, multiply):
     pstats.Stats(pr).sort_stats('tottime', 'cumulative', 'calls').print_stats(20)
 
 
+@cli.command(help="Run emulation jobs (JSON lines file, '-' for stdin, or a directory of *.json files)")
+@click.argument("jobs")
+@click.option("--workers", type=int, default=None,
+              help="Number of worker processes (default: all CPU cores)")
+@click.option("--setup", type=click.Path(exists=True, dir_okay=False), default=None,
+              help="JSON file with a job, run once per worker before all jobs, e.g. to load a program")
+@click.option("--chunk-size", default=16,
+              help="How many jobs are send to a worker at once? (default: 16)")
+@click.option("--output", type=click.File("w"), default="-",
+              help="Write the results as JSON lines into this file (default: stdout)")
+def batch(jobs, workers, setup, chunk_size, output):
+    setup_job = None
+    if setup is not None:
+        with open(setup) as f:
+            setup_job = json.load(f)
+
+    runner = BatchRunner(workers=workers, setup_job=setup_job, chunk_size=chunk_size)
+    for result in runner.run(iter_jobs(jobs)):
+        output.write(json.dumps(result) + "\n")
+
+    stats = runner.get_stats()
+    click.echo(
+        f"{stats['jobs']:d} jobs ({stats['errors']:d} errors) in {stats['duration']:.2f} sec."
+        f" with {stats['workers']:d} workers: {stats['jobs_per_sec'] or 0:.1f} jobs/sec.",
+        err=True,
+    )
+    if stats["cycles_mean"] is not None:
+        click.echo(
+            f"CPU cycles per job: min {stats['cycles_min']:d}"
+            f" / mean {stats['cycles_mean']:.1f} / max {stats['cycles_max']:d}",
+            err=True,
+        )
+
+
 if __name__ == "__main__":
     cli()
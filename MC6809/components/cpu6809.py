@@ -24,8 +24,10 @@
 import logging
 
 from MC6809.components.mc6809_addressing import AddressingMixin
+from MC6809.components.mc6809_async import AsyncRunMixin
 from MC6809.components.mc6809_base import CPUBase
 from MC6809.components.mc6809_cc_register import CPUConditionCodeRegisterMixin
+from MC6809.components.mc6809_guest_call import GuestCallMixin
 from MC6809.components.mc6809_interrupt import InterruptMixin
 from MC6809.components.mc6809_ops_branches import OpsBranchesMixin
 from MC6809.components.mc6809_ops_load_store import OpsLoadStoreMixin
@@ -45,7 +47,8 @@ HTML_TRACE = False
 
 
 class CPU(CPUBase, AddressingMixin, StackMixin, InterruptMixin, OpsLoadStoreMixin, OpsBranchesMixin,
-          OpsTestMixin, OpsLogicalMixin, CPUConditionCodeRegisterMixin, CPUThreadedStatusMixin):
+          OpsTestMixin, OpsLogicalMixin, CPUConditionCodeRegisterMixin, CPUThreadedStatusMixin, GuestCallMixin,
+          AsyncRunMixin):
 
     def to_speed_limit(self):
         return change_cpu(self, CPUSpeedLimit)
@@ -66,11 +69,24 @@ class CPUControlServer(CPUControlServerMixin, CPU):
 
 
 def change_cpu(old_cpu, NewCPU):
+    """
+    Return a 'NewCPU' instance with the state of 'old_cpu'.
+    The memory, the event scheduler (with all sync callbacks and pending events),
+    the pending interrupts and the traps are moved to the new CPU.
+    Note: Callbacks that are bound to the old CPU object still use it.
+    """
     old_cpu.running = False
-    cpu_state = old_cpu.get_state()
+    snapshot = old_cpu.get_snapshot(ram=False)  # The memory will be shared
 
     new_cpu = NewCPU(memory=old_cpu.memory, cfg=old_cpu.cfg)
-    new_cpu.set_state(cpu_state)
+
+    new_cpu.scheduler = old_cpu.scheduler
+    new_cpu.scheduler.poll = new_cpu._poll_interrupts
+    new_cpu.interrupt_counts = old_cpu.interrupt_counts
+    new_cpu.traps = old_cpu.traps
+    new_cpu.trap_counts = old_cpu.trap_counts
+
+    new_cpu.set_snapshot(snapshot)  # restores the interrupt lines and requests a poll
 
     log.critical("Change CPU from %r to %r",
                  old_cpu.__class__.__name__,
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - cycle ordered event scheduler
+    ======================================
+
+    A heap of (due cycles, callback) entries. The run loop compares the CPU
+    cycles with 'next_due' after every instruction and calls dispatch() only
+    if a event is due. So events fire at the first instruction boundary at
+    or after their due cycles, and the number of registered events costs
+    nothing in the hot loop.
+
+    request_poll() forces a call of 'poll(cycles)' at the next instruction
+    boundary (after the due events) and on every boundary after that, as
+    long as 'poll' returns True. The interrupt lines of the CPU use it.
+
+    >>> scheduler = EventScheduler()
+    >>> calls = []
+    >>> event = scheduler.schedule(100, lambda cycles: calls.append(("once", cycles)))
+    >>> event = scheduler.schedule(50, lambda cycles: calls.append(("tick", cycles)), period=50)
+    >>> scheduler.next_due
+    50
+    >>> scheduler.dispatch(101)
+    >>> calls
+    [('tick', 101), ('once', 101)]
+    >>> scheduler.next_due
+    150
+    >>> event.cancel()
+    >>> scheduler.next_due == NEVER
+    True
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import heapq
+import itertools
+
+
+NEVER = 1 << 63  # 'next_due' if no event is scheduled
+
+
+class ScheduledEvent:
+    __slots__ = ("scheduler", "due", "callback", "period", "cancelled")
+
+    def __init__(self, scheduler, due, callback, period):
+        self.scheduler = scheduler
+        self.due = due
+        self.callback = callback
+        self.period = period
+        self.cancelled = False
+
+    def cancel(self):
+        self.scheduler.cancel(self)
+
+    def __repr__(self):
+        return (
+            f"<ScheduledEvent due={self.due:d} period={self.period!r}"
+            f" callback={self.callback!r} cancelled={self.cancelled!r}>"
+        )
+
+
+class EventScheduler:
+    def __init__(self):
+        self._heap = []
+        self._sequence = itertools.count()  # same due cycles: first come, first served
+        self.next_due = NEVER
+        self.dispatched = 0
+        self.poll = None
+        self._polling = False
+
+    def __len__(self):
+        return sum(1 for __, __, event in self._heap if not event.cancelled)
+
+    def _push(self, event):
+        heapq.heappush(self._heap, (event.due, next(self._sequence), event))
+        if event.due < self.next_due:
+            self.next_due = event.due
+
+    def _update_next_due(self):
+        if self._polling:
+            self.next_due = 0
+        else:
+            self.next_due = self.get_next_event_due()
+
+    def get_next_event_due(self):
+        """ The due cycles of the next event, a requested poll is ignored """
+        heap = self._heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else NEVER
+
+    def request_poll(self):
+        """ Call 'poll(cycles)' at the next instruction boundary """
+        self._polling = True
+        self.next_due = 0
+
+    def schedule(self, due, callback, period=None):
+        """
+        Call 'callback(cycles)' at CPU cycles 'due' (absolute) and,
+        if 'period' is given, every 'period' cycles after that.
+        """
+        if period is not None and period <= 0:
+            raise ValueError(f"Period must be positive, not: {period!r}")
+        event = ScheduledEvent(self, due, callback, period)
+        self._push(event)
+        return event
+
+    def cancel(self, event):
+        event.cancelled = True
+        if event.due == self.next_due:
+            self._update_next_due()
+
+    def shift(self, delta):
+        """
+        Move all events by 'delta' cycles, e.g. if the CPU cycles are set
+        back to a snapshot: The events keep their distance to the CPU cycles.
+        """
+        if not delta:
+            return
+        heap = []
+        for __, sequence, event in self._heap:
+            if not event.cancelled:
+                event.due += delta
+                heap.append((event.due, sequence, event))
+        heapq.heapify(heap)
+        self._heap = heap
+        self._update_next_due()
+
+    def dispatch(self, cycles):
+        """ Call all events that are due at 'cycles', in order of their due cycles """
+        heap = self._heap
+        while heap and heap[0][0] <= cycles:
+            __, __, event = heapq.heappop(heap)
+            if event.cancelled:
+                continue
+            if event.period is not None:
+                # The next due cycles after 'cycles', skip all missed periods at once:
+                event.due += event.period * ((cycles - event.due) // event.period + 1)
+                heapq.heappush(heap, (event.due, next(self._sequence), event))
+            self.dispatched += 1
+            event.callback(cycles)
+        if self._polling:
+            self._polling = bool(self.poll(cycles))
+        self._update_next_due()
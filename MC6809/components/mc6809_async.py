@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - run the CPU in a asyncio event loop
+    ============================================
+
+    cpu.run_async() runs the CPU in slices and yields to the event loop
+    between them, so other tasks (device I/O, the control API, a GUI)
+    run in the same thread:
+
+        async def main():
+            cpu_task = asyncio.ensure_future(cpu.run_async(yield_every=10000))
+            ...
+            cpu.quit()
+            await cpu_task
+
+        loop = asyncio.get_event_loop()  # or asyncio.run(main()) with Python 3.7+
+        loop.run_until_complete(main())
+
+    A slice ends at a cycle boundary ('yield_every' CPU cycles, via the
+    event scheduler) and, with 'time_slice', it's shortened so that it
+    doesn't block the loop longer than 'time_slice' seconds.
+    With 'target_cycles_per_sec' the speed is limited by a Pacer, that
+    waits with asyncio.sleep() instead of time.sleep().
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import asyncio
+import time
+
+from MC6809.components.mc6809_speedlimited import Pacer
+
+
+MIN_SLICE_CYCLES = 100
+
+
+class AsyncRunMixin:
+
+    async def run_async(self, cycles=None, yield_every=10000, time_slice=None, target_cycles_per_sec=None):
+        """
+        Run 'cycles' CPU cycles, or until cpu.quit() is called if 'cycles' is None.
+        Returns the used CPU cycles.
+        """
+        start_cycles = self.cycles
+        end_cycles = None if cycles is None else start_cycles + cycles
+        slice_cycles = yield_every
+
+        pacer = None
+        if target_cycles_per_sec is not None:
+            pacer = self._pacer = Pacer(target_cycles_per_sec)
+            pacer.start(self.cycles)
+
+        clock = time.perf_counter
+        while self.running:
+            if end_cycles is not None:
+                slice_cycles = min(slice_cycles, end_cycles - self.cycles)
+                if slice_cycles <= 0:
+                    break
+
+            slice_start = clock()
+            used_cycles = self.run_for_cycles(slice_cycles)
+
+            if time_slice is not None:
+                duration = clock() - slice_start
+                if duration > 0:
+                    rate = used_cycles / duration
+                    slice_cycles = int(max(MIN_SLICE_CYCLES, min(yield_every, rate * time_slice)))
+            else:
+                slice_cycles = yield_every
+
+            if pacer is None:
+                await asyncio.sleep(0)
+            else:
+                await pacer.pace_async(self.cycles)
+
+        return self.cycles - start_cycles
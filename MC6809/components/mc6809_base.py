@@ -33,7 +33,9 @@ from MC6809.components.cpu_utils.MC6809_registers import (
     ValueStorage16Bit,
     convert_differend_width,
 )
-from MC6809.components.mc6809_tools import calc_new_count
+from MC6809.components.event_scheduler import EventScheduler
+from MC6809.components.mc6809_interrupt import FIRQ_LINE, IRQ_LINE, NMI_LINE, WAIT_NONE
+from MC6809.components.mc6809_tools import BurstController
 from MC6809.components.MC6809data.MC6809_op_data import (
     REG_A,
     REG_B,
@@ -46,6 +48,7 @@ from MC6809.components.MC6809data.MC6809_op_data import (
     REG_X,
     REG_Y,
 )
+from MC6809.core.snapshot import pack_snapshot, restore_snapshot
 
 
 log = logging.getLogger("MC6809")
@@ -57,6 +60,11 @@ HTML_TRACE = False
 undefined_reg = UndefinedRegister()
 
 
+def _end_of_run(cycles):
+    """ The end event of a cycle budgeted run: It only stops the hot loop """
+    pass
+
+
 class CPUBase:
 
     SWI3_VECTOR = 0xfff2
@@ -68,7 +76,7 @@ class CPUBase:
     RESET_VECTOR = 0xfffe
 
     STARTUP_BURST_COUNT = 100
-    min_burst_count = 10  # minimum outer op count per burst
+    min_burst_count = 10  # minimum op count per burst
     max_burst_count = 10000  # maximum outer op count per burst
 
     def __init__(self, memory, cfg):
@@ -80,6 +88,26 @@ class CPUBase:
         self.cycles = 0
         self.last_op_address = 0  # Store the current run opcode memory address
         self.outer_burst_op_count = self.STARTUP_BURST_COUNT
+        self.inner_burst_op_count = 100  # How many ops calls per outer burst
+        self.burst_controller = BurstController(
+            min_ops=self.min_burst_count,
+            max_ops=self.max_burst_count * self.inner_burst_op_count,
+            inner_ops=self.inner_burst_op_count,
+        )
+
+        self.scheduler = EventScheduler()
+        self.scheduler.poll = self._poll_interrupts
+
+        self.interrupt_lines = 0  # active IRQ_LINE/FIRQ_LINE/NMI_LINE bits
+        self.interrupt_counts = {IRQ_LINE: 0, FIRQ_LINE: 0, NMI_LINE: 0}
+        self.irq_enabled = False  # used only by irq()
+        self.wait_state = WAIT_NONE  # WAIT_SYNC or WAIT_CWAI: waiting for a interrupt
+        self.traps = {}  # SWI/SWI2/SWI3 opcode: {service byte: callback}, see add_trap()
+        self.trap_counts = {}  # (opcode, service byte): calls
+
+        self._wrong_NEG = 0  # counts NEG $00 ops, to detect a wrong PC
+
+        self._cpu_thread = None  # set by MC6809.core.cpu_thread.CPUThread
 
         # start_http_control_server(self, cfg) # TODO: Move into seperate Class
 
@@ -154,7 +182,7 @@ class CPUBase:
             REG_CC: self.get_cc_value(),
 
             "cycles": self.cycles,
-            "RAM": tuple(self.memory._mem)  # copy of array.array() values,
+            "RAM": self.memory.tobytes(),
         }
 
     def set_state(self, state):
@@ -178,12 +206,23 @@ class CPUBase:
         self.cycles = state["cycles"]
         self.memory.load(address=0x0000, data=state["RAM"])
 
+    def get_snapshot(self, ram=True, compression=None):
+        """
+        Returns a binary snapshot of the registers and the RAM,
+        see: MC6809.core.snapshot
+        """
+        return pack_snapshot(self, ram=ram, compression=compression)
+
+    def set_snapshot(self, data):
+        return restore_snapshot(self, data)
+
     ####
 
     def reset(self):
         log.info("%04x| CPU reset:", self.program_counter.value)
 
         self.last_op_address = 0
+        self.wait_state = WAIT_NONE
 
         if self.cfg.__class__.__name__ == "SBC09Cfg":
             # first op is:
@@ -215,6 +254,9 @@ class CPUBase:
     ####
 
     def get_and_call_next_op(self):
+        # Set before the opcode fetch: A read callback detects the opcode
+        # fetch by "address == last_op_address", e.g. a breakpoint.
+        self.last_op_address = self.program_counter.value
         op_address, opcode = self.read_pc_byte()
         # try:
         self.call_instruction_func(op_address, opcode)
@@ -231,7 +273,7 @@ class CPUBase:
         self.running = False
 
     def call_instruction_func(self, op_address, opcode):
-        self.last_op_address = op_address
+        # 'last_op_address' is set by get_and_call_next_op(), before the opcode fetch
         try:
             cycles, instr_func = self.opcode_dict[opcode]
         except KeyError:
@@ -244,51 +286,51 @@ class CPUBase:
 
     ####
 
-    # TODO: Move to __init__
-    quickest_sync_callback_cycles = None
-    sync_callbacks_cyles = {}
-    sync_callbacks = []
+    def schedule_event(self, cycles, callback, period=None):
+        """
+        Call 'callback(cycles)' in 'cycles' CPU cycles from now (one-shot)
+        or with 'period' every 'period' cycles after that.
+        Returns the event, cancel it with event.cancel()
+        """
+        return self.scheduler.schedule(self.cycles + cycles, callback, period)
 
     def add_sync_callback(self, callback_cycles, callback):
-        """ Add a CPU cycle triggered callback """
-        self.sync_callbacks_cyles[callback] = 0
-        self.sync_callbacks.append([callback_cycles, callback])
-        if self.quickest_sync_callback_cycles is None or \
-                self.quickest_sync_callback_cycles > callback_cycles:
-            self.quickest_sync_callback_cycles = callback_cycles
-
-    def call_sync_callbacks(self):
-        """ Call every sync callback with CPU cycles trigger """
-        current_cycles = self.cycles
-        for callback_cycles, callback in self.sync_callbacks:
-            # get the CPU cycles count of the last call
-            last_call_cycles = self.sync_callbacks_cyles[callback]
-
-            if current_cycles - last_call_cycles > callback_cycles:
-                # this callback should be called
+        """
+        Add a CPU cycle triggered callback, called every 'callback_cycles'.
+        'callback' gets the CPU cycles since the last call.
+        Returns the periodic event, remove the callback with event.cancel()
+        """
+        last_call_cycles = self.cycles
 
-                # Save the current cycles, to trigger the next call
-                self.sync_callbacks_cyles[callback] = self.cycles
+        def sync_callback(cycles):
+            nonlocal last_call_cycles
+            if cycles < last_call_cycles:
+                # The CPU cycles are set back, e.g. by a rewind: the event, too
+                last_call_cycles = cycles - callback_cycles
+            callback(cycles - last_call_cycles)
+            last_call_cycles = cycles
 
-                # Call the callback function
-                callback(current_cycles - last_call_cycles)
+        return self.schedule_event(callback_cycles, sync_callback, period=callback_cycles)
 
-    # TODO: Move to __init__
-    inner_burst_op_count = 100  # How many ops calls, before next sync call
+    def call_sync_callbacks(self):
+        """ Call every due event """
+        if self.cycles >= self.scheduler.next_due:
+            self.scheduler.dispatch(self.cycles)
 
     def burst_run(self):
         """ Run CPU as fast as Python can... """
         # https://wiki.python.org/moin/PythonSpeed/PerformanceTips#Avoiding_dots...
         get_and_call_next_op = self.get_and_call_next_op
+        scheduler = self.scheduler
 
         for __ in range(self.outer_burst_op_count):
             for __ in range(self.inner_burst_op_count):
                 get_and_call_next_op()
-
-            self.call_sync_callbacks()
+                if self.cycles >= scheduler.next_due:
+                    scheduler.dispatch(self.cycles)
 
     def run(self, max_run_time=0.1, target_cycles_per_sec=None):
-        now = time.time
+        now = time.perf_counter
 
         start_time = now()
 
@@ -300,13 +342,11 @@ class CPUBase:
             self.delay = 0
             self.burst_run()
 
-        # Calculate the outer_burst_count new, to hit max_run_time
-        self.outer_burst_op_count = calc_new_count(
-            min_value=self.min_burst_count,
-            value=self.outer_burst_op_count,
-            max_value=self.max_burst_count,
-            trigger=now() - start_time - self.delay,
-            target=max_run_time
+        # Calculate the burst counts new, to hit max_run_time
+        self.outer_burst_op_count, self.inner_burst_op_count = self.burst_controller.update(
+            ops=self.outer_burst_op_count * self.inner_burst_op_count,
+            duration=now() - start_time - self.delay,
+            target_time=max_run_time,
         )
 
     def test_run(self, start, end, max_ops=1000000):
@@ -329,17 +369,101 @@ class CPUBase:
         #        log.warning("CPU test_run2(): from $%x count: %i" % (start, count))
         self.program_counter.set(start)
 #        log.debug("-"*79)
+        self.step(count)
 
-        _old_burst_count = self.outer_burst_op_count
-        self.outer_burst_op_count = count
+    ####
+
+    def step(self, count=1):
+        """
+        Run exactly 'count' instructions. Returns the used CPU cycles.
+        """
+        start_cycles = self.cycles
 
-        _old_sync_count = self.inner_burst_op_count
-        self.inner_burst_op_count = 1
+        # https://wiki.python.org/moin/PythonSpeed/PerformanceTips#Avoiding_dots...
+        get_and_call_next_op = self.get_and_call_next_op
+        scheduler = self.scheduler
 
-        self.burst_run()
+        for __ in range(count):
+            get_and_call_next_op()
+            if self.cycles >= scheduler.next_due:
+                scheduler.dispatch(self.cycles)
+
+        return self.cycles - start_cycles
+
+    def _run_to_cycles(self, end_cycles):
+        """
+        Run until the first instruction boundary at or after 'end_cycles'.
+
+        The end is a scheduled event, too. So the hot loop compares only
+        the CPU cycles with the next due event and needs no extra check.
+        """
+        # https://wiki.python.org/moin/PythonSpeed/PerformanceTips#Avoiding_dots...
+        get_and_call_next_op = self.get_and_call_next_op
+        scheduler = self.scheduler
+
+        if self.cycles >= end_cycles:
+            return
+
+        end_event = scheduler.schedule(end_cycles, _end_of_run)
+        try:
+            while True:
+                # At least one op: A poll of the interrupt lines (next_due == 0)
+                # is done after every op, until the lines are released.
+                get_and_call_next_op()
+                while self.cycles < scheduler.next_due:
+                    get_and_call_next_op()
+                if self.cycles >= end_cycles:
+                    break
+                scheduler.dispatch(self.cycles)
+        finally:
+            end_event.cancel()
+
+        # Call the other events that are due at the end, too:
+        if self.cycles >= scheduler.next_due:
+            scheduler.dispatch(self.cycles)
+
+    def run_for_cycles(self, cycles):
+        """
+        Run 'cycles' CPU cycles. Returns the really used CPU cycles:
+        The last instruction may end a few cycles behind the budget.
+        """
+        start_cycles = self.cycles
+        self._run_to_cycles(start_cycles + cycles)
+        return self.cycles - start_cycles
+
+    def run_until(self, condition, max_cycles=None):
+        """
+        Run until 'condition' is met. Returns the used CPU cycles.
+
+        'condition' is the absolute CPU cycles count, e.g.: Run frame by frame
+        without drift by "cpu.run_until(frame_no * CYCLES_PER_FRAME)",
+        a overshoot of one frame is subtracted from the next one.
+
+        Or 'condition' is a callable, that's called after every instruction,
+        e.g.: "cpu.run_until(lambda: cpu.program_counter.value == 0x1234)"
+        The run stops after 'max_cycles', if given.
+        """
+        start_cycles = self.cycles
+        if not callable(condition):
+            if max_cycles is not None:
+                condition = min(condition, start_cycles + max_cycles)
+            self._run_to_cycles(condition)
+            return self.cycles - start_cycles
+
+        end_cycles = None if max_cycles is None else start_cycles + max_cycles
+
+        # https://wiki.python.org/moin/PythonSpeed/PerformanceTips#Avoiding_dots...
+        get_and_call_next_op = self.get_and_call_next_op
+        scheduler = self.scheduler
+
+        while not condition():
+            if end_cycles is not None and self.cycles >= end_cycles:
+                break
+            get_and_call_next_op()
+            if self.cycles >= scheduler.next_due:
+                scheduler.dispatch(self.cycles)
 
-        self.outer_burst_op_count = _old_burst_count
-        self.inner_burst_op_count = _old_sync_count
+        return self.cycles - start_cycles
 
     ####
 
@@ -777,7 +901,6 @@ class CPUBase:
         self.clear_NZVC()
         self.update_NZVC_8(0, x, r)
 
-    _wrong_NEG = 0
     @opcode(0x0, 0x60, 0x70)  # NEG (direct, indexed, extended)
     def instruction_NEG_memory(self, opcode, ea, m):
         """ Negate memory """
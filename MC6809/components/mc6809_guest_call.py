@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - call 6809 routines from Python
+    =======================================
+
+    cpu.call() works like a JSR from Python: A sentinel return address is
+    pushed on the system stack and the CPU runs until the routine returns
+    with RTS. The opcode fetch from the sentinel address raise GuestReturn
+    via a read callback, so there is no extra check per instruction.
+
+        routine = GuestRoutine(cpu, address=0x4000, code=[...])  # load once
+        registers = routine({REG_X: 0x1234})
+        registers.d
+
+    A pure routine can be memoized with MemoizedRoutine: The results are
+    cached by the input registers and the content of the declared read ranges.
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import hashlib
+from collections import OrderedDict, namedtuple
+
+
+# $FFF0/$FFF1 is the reserved vector of the 6809: Never a valid code address
+GUEST_RETURN_ADDRESS = 0xfff0
+
+
+class GuestRegisters(namedtuple("GuestRegisters", "a b dp cc x y u s")):
+    @property
+    def d(self):
+        return (self.a << 8) + self.b
+
+
+class GuestReturn(Exception):
+    """ The called routine returns to the sentinel address """
+    pass
+
+
+class GuestCallMixin:
+
+    def _guest_return(self, cycles, last_op_address, address):
+        raise GuestReturn()
+
+    def call(self, address, registers=None, max_cycles=None):
+        """
+        Call the routine at 'address' like JSR and run until it returns via RTS.
+        'registers' is a dict with the register names as keys, e.g.: {"X": 0x1234}
+        If 'S' isn't given, the current system stack is used.
+        Returns a GuestRegisters namedtuple. The PC is restored.
+
+        With 'max_cycles' a RuntimeError is raised, if the routine doesn't
+        return at the first instruction boundary at or after 'max_cycles'.
+        Then S is restored, too.
+
+        The scheduled events (e.g. timer interrupts) are not dispatched
+        during the call: The routine runs like one atomic instruction.
+        """
+        if registers:
+            register_str2object = self.register_str2object
+            for name, value in registers.items():
+                register_str2object[name].set(value)
+
+        old_pc = self.program_counter.value
+        old_s = self.system_stack_pointer.value
+        self.push_word(self.system_stack_pointer, GUEST_RETURN_ADDRESS)
+        self.program_counter.set(address)
+
+        read_byte_callbacks = self.memory._read_byte_callbacks
+        old_callback = read_byte_callbacks.get(GUEST_RETURN_ADDRESS)
+        read_byte_callbacks[GUEST_RETURN_ADDRESS] = self._guest_return
+
+        # https://wiki.python.org/moin/PythonSpeed/PerformanceTips#Avoiding_dots...
+        get_and_call_next_op = self.get_and_call_next_op
+        try:
+            if max_cycles is None:
+                while True:
+                    get_and_call_next_op()
+            else:
+                end_cycles = self.cycles + max_cycles
+                while self.cycles < end_cycles:
+                    get_and_call_next_op()
+                raise RuntimeError(f"Guest routine at ${address:04x} doesn't return after {max_cycles:d} cycles")
+        except GuestReturn:
+            self.cycles -= 1  # The opcode fetch from the sentinel address
+        except BaseException:
+            self.system_stack_pointer.set(old_s)  # Remove the sentinel return address
+            raise
+        finally:
+            if old_callback is None:
+                del read_byte_callbacks[GUEST_RETURN_ADDRESS]
+            else:
+                read_byte_callbacks[GUEST_RETURN_ADDRESS] = old_callback
+            self.program_counter.set(old_pc)
+
+        return self.get_guest_registers()
+
+    def get_guest_registers(self):
+        return GuestRegisters(
+            self.accu_a.value, self.accu_b.value,
+            self.direct_page.value, self.get_cc_value(),
+            self.index_x.value, self.index_y.value,
+            self.user_stack_pointer.value, self.system_stack_pointer.value,
+        )
+
+    def set_guest_registers(self, registers):
+        self.accu_a.set(registers.a)
+        self.accu_b.set(registers.b)
+        self.direct_page.set(registers.dp)
+        self.set_cc(registers.cc)
+        self.index_x.set(registers.x)
+        self.index_y.set(registers.y)
+        self.user_stack_pointer.set(registers.u)
+        self.system_stack_pointer.set(registers.s)
+
+
+class GuestRoutine:
+    """
+    A 6809 routine that is loaded once and can be called like a Python function.
+    The code must return with RTS.
+    """
+
+    def __init__(self, cpu, address, code):
+        self.cpu = cpu
+        self.address = address
+        cpu.memory.load(address, code)
+
+    def __call__(self, registers=None, max_cycles=None):
+        return self.cpu.call(self.address, registers, max_cycles)
+
+
+class MemoizedRoutine(GuestRoutine):
+    """
+    A GuestRoutine with a LRU result cache for pure routines.
+
+    The cache key is the given input registers and a hash of the memory
+    'reads' ranges, so the routine must not depend on other registers.
+    A cache hit sets the output registers,
+    writes the 'writes' ranges and adds the CPU cycles of the real call.
+    Other memory changes (e.g. stack below S) are not restored on a hit.
+    Ranges are (start, end) tuples, end inclusive.
+
+    The cache is cleared if the code of the routine changes.
+    """
+
+    def __init__(self, cpu, address, code, reads=(), writes=(), max_size=1024):
+        super().__init__(cpu, address, code)
+        self.reads = tuple(reads)
+        self.writes = tuple(writes)
+        self.max_size = max_size
+
+        self.code_tracker = cpu.memory.add_dirty_tracking(address, address + len(code) - 1, private=True)
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def close(self):
+        self.cpu.memory.remove_dirty_tracking(self.code_tracker)
+
+    def _get_key(self, registers):
+        memory_hash = hashlib.blake2b(digest_size=16)
+        tobytes = self.cpu.memory.tobytes
+        for start, end in self.reads:
+            memory_hash.update(tobytes(start, end + 1))
+        if registers:
+            return tuple(sorted(registers.items())), memory_hash.digest()
+        return (), memory_hash.digest()
+
+    def __call__(self, registers=None, max_cycles=None):
+        cpu = self.cpu
+        cache = self.cache
+
+        if self.code_tracker.collect() and cache:
+            cache.clear()
+            self.invalidations += 1
+
+        key = self._get_key(registers)
+        try:
+            output_registers, written, cycles = cache[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            cache.move_to_end(key)
+            cpu.set_guest_registers(output_registers)
+            load = cpu.memory.load
+            for start, data in written:
+                load(start, data)
+            cpu.cycles += cycles
+            return output_registers
+
+        self.misses += 1
+        start_cycles = cpu.cycles
+        output_registers = cpu.call(self.address, registers, max_cycles)
+        tobytes = cpu.memory.tobytes
+        written = tuple((start, tobytes(start, end + 1)) for start, end in self.writes)
+        cache[key] = (output_registers, written, cpu.cycles - start_cycles)
+        if len(cache) > self.max_size:
+            cache.popitem(last=False)
+            self.evictions += 1
+        return output_registers
+
+    def get_stats(self):
+        return {
+            "size": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -18,15 +18,77 @@
         * ApplyPy by James Tauber (MIT license)
         * XRoar emulator by Ciaran Anscomb (GPL license)
     more info, see README
+
+    Interrupt lines:
+
+        cpu.assert_interrupt(IRQ_LINE)  # e.g.: from a device
+        cpu.release_interrupt(IRQ_LINE)  # the device is served
+
+    IRQ and FIRQ are level triggered: They are delivered again and again,
+    until the device releases the line. NMI is edge triggered: It's latched
+    and delivered once. All lines are one integer 'interrupt_lines'.
+    The run loops doesn't look at it: Asserting a line requests a poll from
+    the event scheduler, so it's checked at the next instruction boundary,
+    with the same comparison the run loop does for the scheduled events.
+    The poll is repeated only as long as a line is active (and maybe masked).
+
+    SYNC and CWAI wait for a interrupt: The instruction is executed again
+    and again, but every time the CPU cycles jump forward to the next
+    scheduled event (e.g. the timer of a VSYNC IRQ). So a waiting CPU
+    costs one instruction per event.
+
+    Traps (host calls):
+
+        cpu.add_trap(service=0x42, callback=func)  # default: SWI2
+
+    A SWI/SWI2/SWI3 followed by a registered service byte (the OS-9 system
+    call convention) calls 'func(cpu)' instead of the software interrupt
+    and continues after the service byte. 'func' can read/write the
+    registers and the memory and can return the CPU cycles to add.
+    Without a registered trap it's a normal software interrupt.
 """
 
 
 from MC6809.components.cpu_utils.instruction_caller import opcode
+from MC6809.components.event_scheduler import NEVER
+
+
+IRQ_LINE = 0x01
+FIRQ_LINE = 0x02
+NMI_LINE = 0x04
+
+WAIT_NONE = 0  # not waiting for a interrupt
+WAIT_SYNC = 1
+WAIT_CWAI = 2
+
+SWI = 0x3f
+SWI2 = 0x103f
+SWI3 = 0x113f
+
+INTERRUPT_NAMES = {
+    IRQ_LINE: "IRQ",
+    FIRQ_LINE: "FIRQ",
+    NMI_LINE: "NMI",
+}
 
 
 class InterruptMixin:
 
-    # ---- Not Implemented, yet. ----
+    def _wait_for_interrupt(self, opcode, wait_state):
+        """
+        Execute the current instruction again, but fast-forward the CPU
+        cycles, so that the instruction ends with the next scheduled event,
+        e.g. the end event of run_for_cycles(). Without a scheduled event the
+        cycles are untouched and the wait is retried op by op, e.g. on step()
+        """
+        self.wait_state = wait_state
+        self.program_counter.set(self.last_op_address)
+        due = self.scheduler.get_next_event_due()
+        if due == NEVER:
+            return
+        cycles = due - self.opcode_dict[opcode][0]
+        if cycles > self.cycles:
+            self.cycles = cycles
 
     @opcode(  # AND condition code register, then wait for interrupt
         0x3c,  # CWAI (immediate)
@@ -52,8 +114,16 @@ class InterruptMixin:
 
         CC bits "HNZVC": ddddd
         """
-#        log.error("$%x CWAI not implemented, yet!", opcode)
-        # Update CC bits: ddddd
+        if self.wait_state != WAIT_CWAI:
+            # First execution: Mask CC and stack the entire state,
+            # with the address of the next instruction as return address.
+            self.set_cc(self.get_cc_value() & m)
+            self.E = 1
+            self.push_irq_registers()
+
+        # The delivery of the interrupt is done by the poll
+        # of the interrupt lines after this instruction.
+        self._wait_for_interrupt(opcode, WAIT_CWAI)
 
     @opcode(  # Undocumented opcode!
         0x3e,  # RESET (inherent)
@@ -72,26 +142,137 @@ class InterruptMixin:
 
     # ---- Interrupt handling ----
 
-    irq_enabled = False
-
     def irq(self):
+        """
+        Deliver a IRQ immediately, if enabled and not masked.
+        A device should better use assert_interrupt(IRQ_LINE)
+        """
         if not self.irq_enabled or self.I == 1:
             # log.critical("$%04x *** IRQ, ignore!\t%s" % (
             #     self.program_counter.value, self.get_cc_info()
             # ))
             return
 
-        if self.E:
-            self.push_irq_registers()
+        self._deliver_interrupt(IRQ_LINE)
+
+    def assert_interrupt(self, line):
+        """
+        Activate the interrupt line IRQ_LINE, FIRQ_LINE or NMI_LINE
+        """
+        self.interrupt_lines |= line
+        self.scheduler.request_poll()
+
+    def release_interrupt(self, line):
+        """
+        Deactivate a interrupt line (a pending NMI is not canceled).
+        """
+        self.interrupt_lines &= ~line | NMI_LINE
+
+    def nmi(self):
+        self.assert_interrupt(NMI_LINE)
+
+    def _poll_interrupts(self, cycles):
+        """
+        Called by the event scheduler at a instruction boundary, while a
+        interrupt line is active. Delivers the highest priority, not masked
+        interrupt. Returns True, if the lines must be checked again.
+        """
+        lines = self.interrupt_lines
+        if lines & NMI_LINE:
+            self.interrupt_lines &= ~NMI_LINE
+            self._deliver_interrupt(NMI_LINE)
+        elif lines & FIRQ_LINE and not self.F:
+            self._deliver_interrupt(FIRQ_LINE)
+        elif lines & IRQ_LINE and not self.I:
+            self._deliver_interrupt(IRQ_LINE)
+        return self.interrupt_lines != 0
+
+    def _deliver_interrupt(self, line):
+        wait_state = self.wait_state
+        self.wait_state = WAIT_NONE
+        if wait_state == WAIT_SYNC:
+            # Return to the instruction after SYNC
+            self.program_counter.set(self.program_counter.value + 1)
+
+        if wait_state != WAIT_CWAI:  # CWAI has stacked the entire state, already
+            if line == FIRQ_LINE:
+                self.E = 0
+                self.push_firq_registers()
+            else:
+                self.E = 1
+                self.push_irq_registers()
+
+        if line == IRQ_LINE:
+            vector = self.IRQ_VECTOR
         else:
-            self.push_firq_registers()
+            self.F = 1
+            vector = self.FIRQ_VECTOR if line == FIRQ_LINE else self.NMI_VECTOR
+        self.I = 1
+
+        self.interrupt_counts[line] += 1
 
-        ea = self.memory.read_word(self.IRQ_VECTOR)
-        # log.critical("$%04x *** IRQ, set PC to $%04x\t%s" % (
-        #     self.program_counter.value, ea, self.get_cc_info()
+        ea = self.memory.read_word(vector)
+        # log.critical("$%04x *** %s, set PC to $%04x\t%s" % (
+        #     self.program_counter.value, INTERRUPT_NAMES[line], ea, self.get_cc_info()
         # ))
         self.program_counter.set(ea)
 
+    def add_trap(self, service, callback, opcode=SWI2):
+        """
+        Call 'callback(cpu)' if the software interrupt 'opcode' (SWI, SWI2
+        or SWI3) is followed by the 'service' byte.
+        """
+        if opcode not in (SWI, SWI2, SWI3):
+            raise ValueError(f"Trap opcode must be SWI, SWI2 or SWI3, not: ${opcode:x}")
+        self.traps.setdefault(opcode, {})[service] = callback
+
+    def remove_trap(self, service, opcode=SWI2):
+        services = self.traps[opcode]
+        del services[service]
+        if not services:
+            del self.traps[opcode]
+
+    def _call_trap(self, opcode):
+        """
+        Call the registered trap and returns True or returns False,
+        if the service byte after 'opcode' has no trap.
+        """
+        try:
+            services = self.traps[opcode]
+        except KeyError:
+            return False
+
+        pc = self.program_counter.value
+        service = self.memory.read_byte(pc)
+        try:
+            callback = services[service]
+        except KeyError:
+            self.cycles -= 1  # only a look at the service byte
+            return False
+
+        self.program_counter.set(pc + 1)
+        self.trap_counts[(opcode, service)] = self.trap_counts.get((opcode, service), 0) + 1
+        cycles = callback(self)
+        if cycles:
+            self.cycles += cycles
+        return True
+
+    def _software_interrupt(self, opcode, vector):
+        if self._call_trap(opcode):
+            return
+        self.E = 1
+        self.push_irq_registers()
+        if opcode == SWI:
+            self.I = 1
+            self.F = 1
+        self.program_counter.set(self.memory.read_word(vector))
+
+    def get_interrupt_counts(self):
+        return {
+            INTERRUPT_NAMES[line]: count
+            for line, count in self.interrupt_counts.items()
+        }
+
     def push_irq_registers(self):
         """
         push PC, U, Y, X, DP, B, A, CC on System stack pointer
@@ -170,12 +351,12 @@ class InterruptMixin:
 
         CC bits "HNZVC": -----
         """
-        raise NotImplementedError(f"${opcode:x} SWI")
+        self._software_interrupt(opcode, self.SWI_VECTOR)
 
     @opcode(  # Software interrupt (absolute indirect)
         0x103f,  # SWI2 (inherent)
     )
-    def instruction_SWI2(self, opcode, ea, m):
+    def instruction_SWI2(self, opcode):
         """
         All of the processor registers are pushed onto the hardware stack (with
         the exception of the hardware stack pointer itself), and control is
@@ -187,12 +368,12 @@ class InterruptMixin:
 
         CC bits "HNZVC": -----
         """
-        raise NotImplementedError(f"${opcode:x} SWI2")
+        self._software_interrupt(opcode, self.SWI2_VECTOR)
 
     @opcode(  # Software interrupt (absolute indirect)
         0x113f,  # SWI3 (inherent)
     )
-    def instruction_SWI3(self, opcode, ea, m):
+    def instruction_SWI3(self, opcode):
         """
         All of the processor registers are pushed onto the hardware stack (with
         the exception of the hardware stack pointer itself), and control is
@@ -203,7 +384,7 @@ class InterruptMixin:
 
         CC bits "HNZVC": -----
         """
-        raise NotImplementedError(f"${opcode:x} SWI3")
+        self._software_interrupt(opcode, self.SWI3_VECTOR)
 
     @opcode(  # Synchronize with interrupt line
         0x13,  # SYNC (inherent)
@@ -218,4 +399,10 @@ class InterruptMixin:
 
         CC bits "HNZVC": -----
         """
-        raise NotImplementedError(f"${opcode:x} SYNC")
+        if self.interrupt_lines:
+            # Any interrupt line ends the synchronization, a masked one, too.
+            # A not masked interrupt will be delivered after this instruction.
+            self.wait_state = WAIT_NONE
+            return
+
+        self._wait_for_interrupt(opcode, WAIT_SYNC)
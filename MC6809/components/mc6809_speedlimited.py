@@ -21,35 +21,189 @@
 """
 
 
+import asyncio
 import time
+from collections import deque
+
+
+PACE_SLEEP = "sleep"  # only time.sleep(): lowest CPU usage, the OS timer resolution is the jitter
+PACE_SPIN = "spin"  # busy wait: lowest jitter, burns a core
+PACE_HYBRID = "hybrid"  # sleep, but busy wait the last 'spin_time' seconds
+
+PACE_MODES = (PACE_SLEEP, PACE_SPIN, PACE_HYBRID)
+
+
+def percentile(sorted_values, percent):
+    """
+    Nearest-rank percentile of a sorted list
+
+    >>> values = list(range(1, 101))
+    >>> percentile(values, 50), percentile(values, 99), percentile(values, 100)
+    (50, 99, 100)
+    >>> percentile([], 50)
+    """
+    if not sorted_values:
+        return None
+    index = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return sorted_values[int(index)]
+
+
+class Pacer:
+    """
+    Hold a emulated CPU speed against the wall time.
+
+    The deadline of every burst is calculated from the start, via the
+    emulated CPU cycles: start_time + (cycles - start_cycles) / cycles_per_sec
+    So a oversleep or a slow burst is caught up by the next bursts and the
+    emulated speed doesn't drift.
+    If the emulation lags more than 'max_lag' seconds behind (e.g. the host
+    was paused, or the machine is too slow), the deadlines are restarted
+    from now, instead of running at full speed to catch up.
+    """
+
+    def __init__(self, cycles_per_sec, mode=PACE_HYBRID, spin_time=0.002, max_lag=0.25,
+                 history=1000, clock=time.perf_counter, sleep=time.sleep):
+        if mode not in PACE_MODES:
+            raise ValueError(f"Unknown pace mode {mode!r}, choose one of: {', '.join(PACE_MODES)}")
+        self.cycles_per_sec = cycles_per_sec
+        self.mode = mode
+        self.spin_time = spin_time
+        self.max_lag = max_lag
+        self.clock = clock
+        self.sleep = sleep
+
+        self.start_time = None
+        self.start_cycles = 0
+        self.first_time = None
+        self.first_cycles = 0
+        self.last_time = None
+        self.last_cycles = 0
+        self.lateness = deque(maxlen=history)  # seconds after the deadline, per burst
+        self.slept = 0.0
+        self.spun = 0.0
+        self.resyncs = 0
+
+    def start(self, cycles):
+        self.start_time = self.last_time = self.clock()
+        self.start_cycles = self.last_cycles = cycles
+        if self.first_time is None:
+            self.first_time = self.start_time
+            self.first_cycles = cycles
+
+    def _wait_until(self, deadline):
+        clock = self.clock
+        now = clock()
+        if self.mode != PACE_SPIN:
+            sleep_time = deadline - now
+            if self.mode == PACE_HYBRID:
+                sleep_time -= self.spin_time
+            if sleep_time > 0:
+                self.sleep(sleep_time)
+                self.slept += sleep_time
+                now = clock()
+        if self.mode != PACE_SLEEP:
+            spin_start = now
+            while now < deadline:
+                now = clock()
+            self.spun += now - spin_start
+        return now
+
+    def _get_deadline(self, cycles):
+        if self.start_time is None:
+            self.start(cycles)
+            return None
+        self.last_cycles = cycles
+        return self.start_time + (cycles - self.start_cycles) / self.cycles_per_sec
+
+    def _behind(self, now, deadline, cycles):
+        self.last_time = now
+        lag = now - deadline
+        self.lateness.append(lag)
+        if lag > self.max_lag:
+            self.resyncs += 1
+            self.start(cycles)
+
+    def pace(self, cycles):
+        """
+        Wait until the wall time reached the emulated 'cycles'.
+        Returns the wait time in seconds.
+        """
+        deadline = self._get_deadline(cycles)
+        if deadline is None:
+            return 0.0
+
+        now = self.clock()
+        if now >= deadline:
+            self._behind(now, deadline, cycles)
+            return 0.0
+
+        end = self.last_time = self._wait_until(deadline)
+        self.lateness.append(end - deadline)
+        return end - now
+
+    async def pace_async(self, cycles):
+        """
+        Same as pace(), but wait with asyncio.sleep(): The event loop runs
+        other tasks meanwhile. There is no busy wait in any mode.
+        """
+        deadline = self._get_deadline(cycles)
+        if deadline is None:
+            return 0.0
+
+        now = self.clock()
+        if now >= deadline:
+            self._behind(now, deadline, cycles)
+            return 0.0
+
+        await asyncio.sleep(deadline - now)
+        self.slept += deadline - now
+        end = self.last_time = self.clock()
+        self.lateness.append(end - deadline)
+        return end - now
+
+    def get_stats(self):
+        """
+        Returns the achieved emulation speed since the first start
+        and the lateness percentiles in seconds of the last bursts.
+        """
+        lateness = sorted(self.lateness)
+        stats = {
+            "target_cycles_per_sec": self.cycles_per_sec,
+            "cycles_per_sec": None,
+            "speed": None,
+            "slept": self.slept,
+            "spun": self.spun,
+            "resyncs": self.resyncs,
+            "bursts": len(lateness),
+        }
+        for percent in (50, 90, 99, 100):
+            stats[f"lateness_p{percent:d}"] = percentile(lateness, percent)
+
+        if self.first_time is not None:
+            duration = self.last_time - self.first_time
+            if duration > 0:
+                cycles_per_sec = (self.last_cycles - self.first_cycles) / duration
+                stats["cycles_per_sec"] = cycles_per_sec
+                stats["speed"] = cycles_per_sec / self.cycles_per_sec
+        return stats
 
 
 class CPUSpeedLimitMixin:
-    max_delay = 0.01  # maximum time.sleep() value per burst run
-    delay = 0  # the current time.sleep() value per burst run
+    delay = 0  # the wait time of the last burst run
+    _pacer = None  # private: CPUTypeAssert would record the None type
+    pace_mode = PACE_HYBRID
 
     def delayed_burst_run(self, target_cycles_per_sec):
         """ Run CPU not faster than given speedlimit """
-        old_cycles = self.cycles
-        start_time = time.time()
-
-        self.burst_run()
-
-        is_duration = time.time() - start_time
-        new_cycles = self.cycles - old_cycles
-        try:
-            is_cycles_per_sec = new_cycles / is_duration
-        except ZeroDivisionError:
-            pass
-        else:
-            should_burst_duration = is_cycles_per_sec / target_cycles_per_sec
-            target_duration = should_burst_duration * is_duration
-            delay = target_duration - is_duration
-            if delay > 0:
-                if delay > self.max_delay:
-                    self.delay = self.max_delay
-                else:
-                    self.delay = delay
-                time.sleep(self.delay)
-
-        self.call_sync_callbacks()
+        pacer = self._pacer
+        if pacer is None or pacer.cycles_per_sec != target_cycles_per_sec:
+            pacer = self._pacer = Pacer(target_cycles_per_sec, mode=self.pace_mode)
+            pacer.start(self.cycles)
+
+        self.burst_run()  # dispatches the scheduled events
+        self.delay = pacer.pace(self.cycles)
+
+    def get_speed_stats(self):
+        if self._pacer is None:
+            return None
+        return self._pacer.get_stats()
@@ -22,10 +22,12 @@
 
 
 import inspect
+import math
 import queue
 import threading
 import time
 import warnings
+from collections import deque, namedtuple
 
 import _thread
 
@@ -83,7 +85,7 @@ class CPUTypeAssertMixin:
         cpu.index_x = ValueStorage16Bit(...)
         cpu.index_x = 0x1234 # will raised a error
     """
-    __ATTR_DICT = {}
+    __ATTR_DICT = None  # The types of this instance, set after __init__()
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -93,46 +95,124 @@ class CPUTypeAssertMixin:
         )
 
     def __set_attr_dict(self):
+        attr_dict = {}
         for name, obj in inspect.getmembers(self, lambda x: not(inspect.isroutine(x))):
             if name.startswith("_") or name == "cfg":
                 continue
-            self.__ATTR_DICT[name] = type(obj)
+            attr_dict[name] = type(obj)
+        self.__ATTR_DICT = attr_dict
 
     def __setattr__(self, attr, value):
-        if attr in self.__ATTR_DICT:
+        if self.__ATTR_DICT is not None and attr in self.__ATTR_DICT:
             obj = self.__ATTR_DICT[attr]
             assert isinstance(value, obj), \
                 f"Attribute {attr!r} is no more type {obj} (Is now: {type(obj)})!"
         return object.__setattr__(self, attr, value)
 
 
-def calc_new_count(min_value, value, max_value, trigger, target):
-    """
-    change 'value' between 'min_value' and 'max_value'
-    so that 'trigger' will be match 'target'
-
-    >>> calc_new_count(min_value=0, value=100, max_value=200, trigger=30, target=30)
-    100
+BurstDecision = namedtuple("BurstDecision", "duration target_time ops rate new_ops outer inner")
 
-    >>> calc_new_count(min_value=0, value=100, max_value=200, trigger=50, target=5)
-    55
-    >>> calc_new_count(min_value=60, value=100, max_value=200, trigger=50, target=5)
-    60
 
-    >>> calc_new_count(min_value=0, value=100, max_value=200, trigger=20, target=40)
-    150
-    >>> calc_new_count(min_value=0, value=100, max_value=125, trigger=20, target=40)
-    125
+class BurstController:
     """
-    try:
-        new_value = float(value) / float(trigger) * target
-    except ZeroDivisionError:
-        return value * 2
-
-    if new_value > max_value:
-        return max_value
-
-    new_value = int((value + new_value) / 2)
-    if new_value < min_value:
-        return min_value
-    return new_value
+    Calculate the ops of the next CPU.run() burst, so that a run takes
+    'target_time' seconds, e.g. the time of one GUI frame.
+
+    The ops/sec rate is measured on every run and smoothed by a exponential
+    moving average ('smoothing': 1.0 = use only the last run, lower values
+    = less reaction to load peaks). The rate times 'target_time' is the
+    next burst. A integral of the timing errors ('ki') removes a permanent
+    offset, e.g. from time, that doesn't scale with the ops.
+
+    The ops are split into outer and inner burst counts, the inner count
+    is at most 'inner_ops' and is resized to hit the ops.
+
+    >>> controller = BurstController(target_time=0.02, min_ops=10, max_ops=100000)
+    >>> ops = 1000
+    >>> for __ in range(20):  # 50000 ops/sec with a constant overhead of 5 ms
+    ...     outer, inner = controller.update(ops, duration=ops / 50000 + 0.005)
+    ...     ops = outer * inner
+    >>> round(controller.history[-1].duration, 3)
+    0.02
+    >>> outer, inner
+    (8, 94)
+
+    >>> BurstController(min_ops=10).update(ops=40, duration=1.0)
+    (1, 10)
+    """
+
+    def __init__(self, target_time=0.1, min_ops=10, max_ops=1000000, inner_ops=100,
+                 smoothing=0.5, ki=0.3, history=100):
+        self.target_time = target_time
+        self.min_ops = min_ops
+        self.max_ops = max_ops
+        self.inner_ops = inner_ops
+        self.smoothing = smoothing
+        self.ki = ki
+        self.max_integral = math.log(4)  # anti windup: max. factor 4 up or down
+
+        self.rate = None  # smoothed ops/sec
+        self.integral = 0.0
+        self.history = deque(maxlen=history)
+
+    def split(self, ops):
+        """
+        >>> BurstController(inner_ops=100).split(748)
+        (8, 94)
+        """
+        outer = -(-ops // self.inner_ops)  # ceil
+        return outer, round(ops / outer)
+
+    def update(self, ops, duration, target_time=None):
+        """
+        Returns the (outer, inner) burst counts for the next run,
+        after 'ops' ops in 'duration' seconds.
+        """
+        if target_time is not None:
+            self.target_time = target_time
+        target_time = self.target_time
+
+        if duration <= 0:
+            rate = None
+            new_ops = ops * 2
+        else:
+            rate = ops / duration
+            if self.rate is None:
+                self.rate = rate
+            else:
+                self.rate += self.smoothing * (rate - self.rate)
+
+            self.integral += self.ki * math.log(target_time / duration)
+            self.integral = max(-self.max_integral, min(self.max_integral, self.integral))
+
+            new_ops = int(self.rate * target_time * math.exp(self.integral))
+
+        new_ops = max(self.min_ops, min(self.max_ops, new_ops))
+        outer, inner = self.split(new_ops)
+        self.history.append(BurstDecision(duration, target_time, ops, rate, new_ops, outer, inner))
+        return outer, inner
+
+    def get_stats(self):
+        """
+        The achieved run times against the target, to tune the controller.
+        """
+        history = self.history
+        if not history:
+            return None
+        durations = [decision.duration for decision in history]
+        last = history[-1]
+        return {
+            "runs": len(history),
+            "target_time": last.target_time,
+            "last_duration": last.duration,
+            "mean_duration": sum(durations) / len(durations),
+            "max_duration": max(durations),
+            "mean_abs_error": sum(
+                abs(decision.duration - decision.target_time) for decision in history
+            ) / len(history),
+            "rate": self.rate,
+            "integral": self.integral,
+            "ops": last.new_ops,
+            "outer": last.outer,
+            "inner": last.inner,
+        }
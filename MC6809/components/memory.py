@@ -20,20 +20,175 @@
 """
 
 
-import array
 import logging
+import mmap
+import re
+import traceback
+
+from MC6809.components.memory_backends import SharedMemoryBackend, get_backend
+from MC6809.components.memory_bus import MemoryBusClient
+from MC6809.components.memory_hashes import DEFAULT_PAGE_SIZE, PageHashes, diff_hashes, hash_pages
+from MC6809.utils.image_formats import ImageFormatError, guess_format, iter_segments, load_segments
 
 
 log = logging.getLogger("MC6809")
 
 
+class DirtyTracker:
+    """
+    Remember which blocks of a address range are changed since the last
+    collect() call. One bit per block, so a host (e.g. a GUI that renders
+    the video RAM) needs no write callback per byte.
+
+    >>> tracker = DirtyTracker(start_addr=0x0400, end_addr=0x05ff, block_size=0x20)
+    >>> tracker.mark_range(0x0410, 0x0450)
+    >>> [(hex(start), hex(end)) for start, end in tracker.collect()]
+    [('0x400', '0x45f')]
+    >>> tracker.collect()
+    []
+    >>> tracker.mark_range(0x0500, 0x0500)
+    >>> [(hex(start), hex(end)) for start, end in tracker.collect(0x0400, 0x0510)]
+    [('0x500', '0x510')]
+    >>> [(hex(start), hex(end)) for start, end in tracker.collect()]
+    [('0x500', '0x51f')]
+    """
+
+    def __init__(self, start_addr, end_addr, block_size=0x100):
+        assert block_size > 0 and block_size & (block_size - 1) == 0, (
+            f"Block size {block_size:d} is not a power of two!"
+        )
+        assert start_addr <= end_addr, f"${start_addr:04x} > ${end_addr:04x}"
+        self.start_addr = start_addr
+        self.end_addr = end_addr
+        self.block_size = block_size
+        self.block_shift = block_size.bit_length() - 1
+
+        self.block_count = ((end_addr - start_addr) >> self.block_shift) + 1
+        self.bitmap = bytearray((self.block_count + 7) // 8)
+
+    def iter_marks(self):
+        """
+        yield (address, (bitmap, byte index, bit mask)) for every address.
+        All addresses of one block share the same tuple.
+        """
+        for block in range(self.block_count):
+            mark = (self.bitmap, block >> 3, 1 << (block & 7))
+            block_start = self.start_addr + (block << self.block_shift)
+            block_end = min(block_start + self.block_size, self.end_addr + 1)
+            for address in range(block_start, block_end):
+                yield address, mark
+
+    def _block_range(self, start_addr, end_addr):
+        start_addr = max(start_addr, self.start_addr)
+        end_addr = min(end_addr, self.end_addr)
+        if start_addr > end_addr:
+            return range(0)
+        return range(
+            (start_addr - self.start_addr) >> self.block_shift,
+            ((end_addr - self.start_addr) >> self.block_shift) + 1,
+        )
+
+    def mark_range(self, start_addr, end_addr):
+        bitmap = self.bitmap
+        for block in self._block_range(start_addr, end_addr):
+            bitmap[block >> 3] |= 1 << (block & 7)
+
+    def collect(self, start_addr=0x0000, end_addr=0xffff):
+        """
+        Returns the changed (start, end) address spans (end inclusive)
+        between start_addr and end_addr and reset them to clean.
+        Neighboring blocks are merged into one span.
+        A block that is only partly in the range is reported clipped and
+        stays dirty, because its other part is not reported.
+        """
+        bitmap = self.bitmap
+        if not any(bitmap):
+            return []
+
+        spans = []
+        for block in self._block_range(start_addr, end_addr):
+            index = block >> 3
+            mask = 1 << (block & 7)
+            if not bitmap[index] & mask:
+                continue
+
+            block_start = self.start_addr + (block << self.block_shift)
+            block_end = min(block_start + self.block_size - 1, self.end_addr)
+            if start_addr <= block_start and block_end <= end_addr:
+                bitmap[index] &= ~mask
+
+            span_start = max(block_start, start_addr)
+            span_end = min(block_end, end_addr)
+            if spans and spans[-1][1] + 1 == span_start:
+                spans[-1][1] = span_end
+            else:
+                spans.append([span_start, span_end])
+        return [tuple(span) for span in spans]
+
+
+def compile_pattern(pattern, mask=None):
+    """
+    Compile a search pattern to a bytes regex that match overlapping.
+    'None' in 'pattern' is a wildcard. With 'mask' only the set bits of
+    each pattern byte will be compared.
+
+    >>> compile_pattern(b"ABC").pattern
+    b'(?=ABC)'
+    >>> compile_pattern(b"A?C").pattern
+    b'(?=A\\\\?C)'
+    >>> compile_pattern([0x41, None, 0x43]).pattern
+    b'(?=A.C)'
+    >>> compile_pattern(b"AB", mask=[0xff, 0x00]).pattern
+    b'(?=A.)'
+    >>> compile_pattern(b"A", mask=[0xfe]).pattern
+    b'(?=[@A])'
+    >>> compile_pattern(b"AB", mask=b"A")
+    Traceback (most recent call last):
+    ...
+    ValueError: Pattern and mask must have the same length!
+    """
+    pattern = list(pattern)
+    if not pattern:
+        raise ValueError("Empty search pattern!")
+    if mask is None:
+        mask = [0x00 if value is None else 0xff for value in pattern]
+    else:
+        mask = list(mask)
+        if len(mask) != len(pattern):
+            raise ValueError("Pattern and mask must have the same length!")
+
+    regex = []
+    for value, value_mask in zip(pattern, mask):
+        if value is None or value_mask == 0x00:
+            regex.append(b".")
+        elif value_mask == 0xff:
+            regex.append(re.escape(bytes([value])))
+        else:
+            matches = b"".join(
+                re.escape(bytes([candidate]))
+                for candidate in range(0x100)
+                if candidate & value_mask == value & value_mask
+            )
+            regex.append(b"[" + matches + b"]")
+
+    # lookahead: find overlapping matches, too
+    return re.compile(b"(?=" + b"".join(regex) + b")", re.DOTALL)
+
+
 class Memory:
-    def __init__(self, cfg, read_bus_request_queue=None, read_bus_response_queue=None, write_bus_queue=None):
+    def __init__(self, cfg, read_bus_request_queue=None, read_bus_response_queue=None, write_bus_queue=None,
+                 shared_memory=False, backend=None):
         self.cfg = cfg
         self.read_bus_request_queue = read_bus_request_queue
         self.read_bus_response_queue = read_bus_response_queue
         self.write_bus_queue = write_bus_queue
 
+        if write_bus_queue is not None and read_bus_request_queue is not None:
+            # Forward address ranges to a other process, via: self.bus.add_range()
+            self.bus = MemoryBusClient(self, read_bus_request_queue, read_bus_response_queue, write_bus_queue)
+        else:
+            self.bus = None
+
         self.INTERNAL_SIZE = (0xFFFF + 1)
 
         self.RAM_SIZE = (self.cfg.RAM_END - self.cfg.RAM_START) + 1
@@ -58,17 +213,22 @@ class Memory:
             f"{self.RAM_SIZE + self.RAM_SIZE} Bytes < {self.INTERNAL_SIZE} Bytes"
         )
 
-        # About different types of memory see:
+        # The backing store is pluggable, see: memory_backends.py
+        # About different types of memory see also:
         # http://www.python-forum.de/viewtopic.php?p=263775#p263775 (de)
-
-        # The old variant: Use a simple List:
-#        self._mem = [None] * self.cfg.MEMORY_SIZE
-
-        # Bytearray will be consume less RAM, but it's slower:
-#        self._mem = bytearray(self.cfg.MEMORY_SIZE)
-
-        # array consumes also less RAM than lists and it's a little bit faster:
-        self._mem = array.array("B", [0x00] * self.INTERNAL_SIZE)  # unsigned char
+        if shared_memory:
+            # Other processes can read the memory, see: get_shared_memory_layout()
+            backend = SharedMemoryBackend.name
+        elif backend is None:
+            backend = getattr(cfg, "MEMORY_BACKEND", None)
+        self._backend = get_backend(backend)(self.INTERNAL_SIZE)
+        self._mem = self._backend.mem
+
+        # Opt-in dirty tracking, see: add_dirty_tracking()
+        self._dirty_trackers = []  # of the host, collected by collect_dirty()
+        self._private_dirty_trackers = []  # e.g. of PageHashes, collected only by the owner
+        self._dirty_marks = {}
+        self._page_hashes = None
 
         if cfg and cfg.rom_cfg:
             for romfile in cfg.rom_cfg:
@@ -163,27 +323,248 @@ class Memory:
 
     # ---------------------------------------------------------------------------
 
+    def get_shared_memory_layout(self):
+        """
+        Returns the layout descriptor (a JSON serializable dict) that other
+        processes need to attach the memory via SharedMemoryView()
+        """
+        if not isinstance(self._backend, SharedMemoryBackend):
+            raise RuntimeError("Memory is not shared, use: Memory(cfg, shared_memory=True)")
+        return self._backend.shared_memory.get_layout(self)
+
+    def close(self):
+        """
+        Free the resources of the backing store (e.g. the shared memory block)
+        The content is kept in a new store of the default backend.
+        """
+        content = self._backend.tobytes()
+        self._backend.close()
+        self._backend = get_backend()(self.INTERNAL_SIZE)
+        self._mem = self._backend.mem
+        self._mem[:] = self._backend.block(content)
+
+    # ---------------------------------------------------------------------------
+
+    def add_dirty_tracking(self, start_addr, end_addr, block_size=0x100, private=False):
+        """
+        Track RAM changes between start_addr and end_addr (inclusive) per block.
+        A store into a tracked area costs one bit set in a bitmap.
+        Use collect_dirty() e.g. once per frame to get the changed spans.
+
+        A 'private' tracker is not collected by collect_dirty(), only by its
+        owner via tracker.collect(). Internal users (e.g. page hashes, rewind)
+        use it, so the host doesn't steal their changes.
+        """
+        tracker = DirtyTracker(start_addr, end_addr, block_size)
+        for address, mark in tracker.iter_marks():
+            self._dirty_marks[address] = self._dirty_marks.get(address, ()) + (mark,)
+        if private:
+            self._private_dirty_trackers.append(tracker)
+        else:
+            self._dirty_trackers.append(tracker)
+        return tracker
+
+    def remove_dirty_tracking(self, tracker):
+        if tracker in self._private_dirty_trackers:
+            self._private_dirty_trackers.remove(tracker)
+        else:
+            self._dirty_trackers.remove(tracker)
+        bitmap = tracker.bitmap
+        for address, mark in tracker.iter_marks():
+            marks = tuple(m for m in self._dirty_marks[address] if m[0] is not bitmap)
+            if marks:
+                self._dirty_marks[address] = marks
+            else:
+                del self._dirty_marks[address]
+
+    def collect_dirty(self, start_addr=0x0000, end_addr=0xffff):
+        """
+        Returns the changed (start, end) spans (end inclusive) of all not
+        private trackers between start_addr and end_addr and mark them as clean.
+        """
+        spans = []
+        for tracker in self._dirty_trackers:
+            spans += tracker.collect(start_addr, end_addr)
+
+        merged = []
+        for span_start, span_end in sorted(spans):
+            if merged and span_start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], span_end)
+            else:
+                merged.append([span_start, span_end])
+        return [tuple(span) for span in merged]
+
+    def _mark_dirty(self, start_addr, end_addr):
+        for tracker in self._dirty_trackers:
+            tracker.mark_range(start_addr, end_addr)
+        for tracker in self._private_dirty_trackers:
+            tracker.mark_range(start_addr, end_addr)
+
+    # ---------------------------------------------------------------------------
+
+    def get_page_hashes(self, page_size=DEFAULT_PAGE_SIZE):
+        """
+        Returns the content hashes of all pages. On the first call all pages
+        are hashed, after that only the pages that changed in between.
+        """
+        if self._page_hashes is None:
+            self._page_hashes = PageHashes(self, page_size)
+        elif self._page_hashes.page_size != page_size:
+            raise ValueError(f"Page hashes are build with page size ${self._page_hashes.page_size:04x}")
+        return self._page_hashes.update()
+
+    def ram_hash(self):
+        """ Hex digest of the whole memory, e.g. to compare machine states """
+        self.get_page_hashes()
+        return self._page_hashes.get_memory_hash()
+
+    def diff_pages(self, other):
+        """
+        Returns the start addresses of all pages that are different to 'other':
+        a Memory() instance, a list of page hashes or a memory image (bytes-like)
+        """
+        hashes = self.get_page_hashes()
+        page_size = self._page_hashes.page_size
+        if isinstance(other, Memory):
+            other_hashes = other.get_page_hashes(page_size)
+        elif isinstance(other, list):
+            other_hashes = other
+        else:
+            other_hashes = hash_pages(other, page_size)
+        return diff_hashes(hashes, other_hashes, page_size)
+
+    def disable_page_hashes(self):
+        if self._page_hashes is not None:
+            self._page_hashes.close()
+            self._page_hashes = None
+
+    # ---------------------------------------------------------------------------
+
+    def iter_find(self, pattern, start_addr=0x0000, end_addr=0xffff, mask=None):
+        """
+        Yields the start address of every (overlapping) match of 'pattern'
+        that lies completely between start_addr and end_addr (inclusive).
+        See compile_pattern() for wildcards and masks.
+
+        The backing store is searched directly: Read callbacks are not called
+        and no CPU cycles are used. It's zero-copy, except for the list backend.
+        """
+        regex = compile_pattern(pattern, mask)
+        haystack = self._backend.get_memoryview()
+        for match in regex.finditer(haystack, start_addr, end_addr + 1):
+            yield match.start()
+
+    def find(self, pattern, start_addr=0x0000, end_addr=0xffff, mask=None):
+        """
+        Returns the address of the first match or None
+        """
+        return next(self.iter_find(pattern, start_addr, end_addr, mask), None)
+
+    def find_all(self, pattern, start_addr=0x0000, end_addr=0xffff, mask=None):
+        return list(self.iter_find(pattern, start_addr, end_addr, mask))
+
+    def find_word(self, word, start_addr=0x0000, end_addr=0xffff):
+        """ Search a 16-bit word (6809 is Big-Endian) """
+        return self.find(word.to_bytes(2, "big"), start_addr, end_addr)
+
+    def find_all_words(self, word, start_addr=0x0000, end_addr=0xffff):
+        return self.find_all(word.to_bytes(2, "big"), start_addr, end_addr)
+
+    def tobytes(self, start=0x0000, end=None):
+        """
+        Returns a copy of the backing store from start to end (exclusive) as bytes.
+        Read callbacks are not called.
+        """
+        return self._backend.tobytes(start, end)
+
+    def numpy_view(self):
+        """
+        Returns a numpy.uint8 array of the whole memory for vectorised analysis
+        e.g.: numpy.bincount(memory.numpy_view()[0x0400:0x0600])
+        Shares the data with the CPU without a copy, so it's always up-to-date.
+        Not possible with the list backend, use e.g.: Memory(cfg, backend="numpy")
+        """
+        return self._backend.get_numpy_array()
+
+    # ---------------------------------------------------------------------------
+
     def load(self, address, data):
+        """
+        Copy 'data' into the memory with one slice assignment.
+        'data' may be a str, a list/tuple of ints or any bytes-like object
+        (bytes, bytearray, memoryview, mmap...)
+        """
         if isinstance(data, str):
             data = [ord(c) for c in data]
 
-        log.debug("ROM load at $%04x: %s", address,
-                  ", ".join("$%02x" % i for i in data)
-                  )
-        for ea, datum in enumerate(data, address):
-            try:
-                self._mem[ea] = datum
-            except OverflowError as err:
-                raise OverflowError(
-                    f"{err} - datum=${datum:x} ea=${ea:04x}"
-                    f" (load address was: ${address:04x} - data length: {len(data):d}Bytes)"
-                )
+        size = len(data)
+        end = address + size
+        if end > self.INTERNAL_SIZE:
+            raise OverflowError(
+                f"Can't load {size:d}Bytes at ${address:04x}:"
+                f" end address ${end - 1:x} is outside the memory (${self.INTERNAL_SIZE - 1:04x})"
+            )
+
+        try:
+            self._mem[address:end] = self._backend.block(data)
+        except OverflowError as err:
+            for ea, datum in enumerate(data, address):
+                if not 0x00 <= datum <= 0xff:
+                    raise OverflowError(
+                        f"{err} - datum=${datum:x} ea=${ea:04x}"
+                        f" (load address was: ${address:04x} - data length: {size:d}Bytes)"
+                    )
+            raise
+
+        if self._dirty_trackers or self._private_dirty_trackers:
+            self._mark_dirty(address, end - 1)
+
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("ROM load at $%04x: %s", address,
+                      ", ".join("$%02x" % i for i in self._mem[address:end])
+                      )
 
     def load_file(self, romfile):
         data = romfile.get_data()
         self.load(romfile.address, data)
         log.critical("Load ROM file %r to $%04x", romfile.filepath, romfile.address)
 
+    def load_image(self, filepath, address=None, fmt=None):
+        """
+        Load a raw, DECB .BIN or Motorola S-record image file.
+        The file is memory mapped and every segment is copied
+        with a single slice assignment.
+
+        'fmt' is one of "raw", "decb" or "srec" and will be guessed
+        from the file extension if not given. A raw image needs a 'address'.
+
+        Returns the exec/start address, if the image format stores one.
+        """
+        if fmt is None:
+            fmt = guess_format(filepath)
+
+        with open(filepath, "rb") as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as err:  # e.g.: mmap of a empty file
+                raise ImageFormatError(f"Can't map image file {filepath!r}: {err}")
+            with mapped:
+                segments = iter_segments(mapped, fmt, address)
+                try:
+                    exec_address = load_segments(segments, self.load)
+                except Exception as err:
+                    # The traceback frames still hold memoryviews of the mapped file,
+                    # release them: Otherwise closing the mmap raises a BufferError
+                    while err is not None:
+                        traceback.clear_frames(err.__traceback__)
+                        err = err.__context__
+                    raise
+                finally:
+                    segments.close()
+
+        log.critical("Load %s image %r (exec address: %r)", fmt, filepath, exec_address)
+        return exec_address
+
     # ---------------------------------------------------------------------------
 
     def read_byte(self, address):
@@ -287,6 +668,11 @@ class Memory:
             msg2 = f"{msg}: ${address:x}"
             log.warning(msg2)
 #             raise RuntimeError(msg2)
+            return
+
+        if address in self._dirty_marks:
+            for bitmap, index, mask in self._dirty_marks[address]:
+                bitmap[index] |= mask
 
     def write_word(self, address, word):
         assert word >= 0, f"Write negative word hex:{word:04x} dez:{word:d} to ${address:04x}"
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - memory backing stores
+    ==============================
+
+    The backing store of Memory._mem is pluggable. Every backend creates
+    a object that supports 'store[address]' read/write with ints and slice
+    assignment. The CPU use it directly, the backend is only used for bulk
+    operations like load().
+
+    The default is a bytearray: It supports the buffer protocol, so
+    snapshots, memoryviews and numpy arrays need no conversion of every
+    byte. The single byte access of the CPU is nearly as fast as with a
+    list: "MC6809 memory-benchmark" with CPython 3.11 shows a list only
+    ~15% faster, but a list needs a copy for every bulk operation.
+    Run the benchmark to compare the backends on the current interpreter
+    (e.g. PyPy) and select one with Memory(cfg, backend=...) or the
+    config attribute MEMORY_BACKEND.
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import array
+import mmap
+
+from MC6809.components.memory_shared import SharedMemoryRAM, shared_memory
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class MemoryBackend:
+    name = None
+
+    def __init__(self, size):
+        self.size = size
+        self.mem = self.create(size)
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def create(self, size):
+        raise NotImplementedError
+
+    def block(self, data):
+        """
+        Convert 'data' into a object that can be slice assigned to self.mem
+        Raise OverflowError if a list/tuple contains values outside of 0-255.
+        """
+        try:
+            return memoryview(data)  # any bytes-like object: bytes, mmap...
+        except TypeError:
+            return array.array("B", data)  # e.g.: list of ints
+
+    def get_memoryview(self):
+        """ Returns a (read only) memoryview of the whole memory, without copy if possible """
+        view = memoryview(self.mem)
+        if hasattr(view, "toreadonly"):
+            return view.toreadonly()
+        # Python < 3.8 has no memoryview.toreadonly(): return a read only copy
+        view.release()
+        return memoryview(bytes(self.mem))
+
+    def tobytes(self, start=0, end=None):
+        return bytes(self.mem[start:end])
+
+    def get_numpy_array(self):
+        """ Returns a numpy.uint8 array that shares the memory with self.mem """
+        if numpy is None:
+            raise RuntimeError("numpy is not installed!")
+        return numpy.frombuffer(self.mem, dtype=numpy.uint8)
+
+    def close(self):
+        pass
+
+
+class ArrayBackend(MemoryBackend):
+    name = "array"
+
+    def create(self, size):
+        return array.array("B", bytes(size))  # unsigned char
+
+    def block(self, data):
+        block = array.array("B")
+        try:
+            block.frombytes(data)  # fast path for all bytes-like objects
+        except TypeError:
+            block.extend(data)  # e.g.: list of ints
+        return block
+
+    def tobytes(self, start=0, end=None):
+        return self.mem[start:end].tobytes()
+
+
+class BytearrayBackend(MemoryBackend):
+    name = "bytearray"
+
+    def create(self, size):
+        return bytearray(size)
+
+
+class ListBackend(MemoryBackend):
+    name = "list"
+
+    def create(self, size):
+        return [0x00] * size
+
+    def block(self, data):
+        block = super().block(data)
+        if isinstance(block, memoryview):
+            return block.tobytes()  # Iterating over bytes is faster than over a memoryview
+        return block
+
+    def tobytes(self, start=0, end=None):
+        return bytes(bytearray(self.mem[start:end]))  # faster than bytes(list)
+
+    def get_memoryview(self):
+        return memoryview(bytes(self.mem))  # A list doesn't support the buffer protocol -> copy
+
+    def get_numpy_array(self):
+        raise RuntimeError(f"No zero-copy numpy array possible with the {self.name!r} memory backend!")
+
+
+class MmapBackend(MemoryBackend):
+    """ Anonymous memory map """
+    name = "mmap"
+
+    def create(self, size):
+        return mmap.mmap(-1, size)
+
+    def close(self):
+        self.mem.close()
+
+
+class SharedMemoryBackend(MemoryBackend):
+    """ multiprocessing.shared_memory, see: memory_shared.py """
+    name = "shared_memory"
+
+    @classmethod
+    def is_available(cls):
+        return shared_memory is not None
+
+    def create(self, size):
+        self.shared_memory = SharedMemoryRAM(size)
+        return self.shared_memory.buf
+
+    def close(self):
+        self.shared_memory.close()
+
+
+class NumpyBackend(MemoryBackend):
+    """
+    numpy.uint8 array, accessed via a memoryview, so that the CPU will
+    get normal Python ints (numpy scalars would wrap around in arithmetic)
+    The array itself is self.array e.g. for vectorised analysis.
+    """
+    name = "numpy"
+
+    @classmethod
+    def is_available(cls):
+        return numpy is not None
+
+    def create(self, size):
+        self.array = numpy.zeros(size, dtype=numpy.uint8)
+        return memoryview(self.array)
+
+    def get_numpy_array(self):
+        return self.array
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (
+        ArrayBackend, BytearrayBackend, ListBackend, MmapBackend, SharedMemoryBackend, NumpyBackend
+    )
+}
+
+DEFAULT_BACKEND = BytearrayBackend.name  # see module docstring
+
+
+def get_available_backends():
+    return [name for name, backend in BACKENDS.items() if backend.is_available()]
+
+
+def get_backend(name=None):
+    """
+    >>> get_backend("bytearray")
+    <class 'MC6809.components.memory_backends.BytearrayBackend'>
+    >>> get_backend("foobar")
+    Traceback (most recent call last):
+    ...
+    ValueError: Unknown memory backend 'foobar'
+    """
+    if name is None:
+        name = DEFAULT_BACKEND
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown memory backend {name!r}")
+    if not backend.is_available():
+        raise RuntimeError(f"Memory backend {name!r} is not available!")
+    return backend
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - out-of-process memory bus
+    ==================================
+
+    Forward memory accesses of address ranges to a (slow) device model
+    that runs in a other process. The three queues of Memory() are used:
+
+        write_bus_queue         CPU -> device: batches of posted writes
+        read_bus_request_queue  CPU -> device: read requests
+        read_bus_response_queue device -> CPU: read responses
+
+    Writes are posted: They are collected and send as one batch. Every write
+    is stamped with the CPU cycles, so the device model can replay the timing.
+    A read request contains the number of the last send write batch, so the
+    device applies all previous writes before the read will be answered.
+
+    Reads can be pipelined with MemoryBusClient.prefetch(): The requests are
+    send without waiting for the responses.
+
+    With 'sync_cycles' the client works in deferred synchronisation mode:
+    Writes are only flushed if the oldest pending write is older than
+    'sync_cycles' CPU cycles (or the batch is full) and a read of a address
+    that was answered less than 'sync_cycles' ago, returns the cached value
+    and requests a refresh in the background.
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import logging
+import multiprocessing
+import queue
+
+
+log = logging.getLogger("MC6809")
+
+
+class MemoryBusClient:
+    """
+    The CPU side of the bus. Created by Memory() if the bus queues are given.
+    """
+
+    def __init__(self, memory, read_bus_request_queue, read_bus_response_queue, write_bus_queue,
+                 batch_size=64, sync_cycles=None, timeout=5):
+        self.memory = memory
+        self.read_bus_request_queue = read_bus_request_queue
+        self.read_bus_response_queue = read_bus_response_queue
+        self.write_bus_queue = write_bus_queue
+
+        self.batch_size = batch_size
+        self.sync_cycles = sync_cycles  # None -> synchronous reads
+        self.timeout = timeout
+
+        self.batch_no = 0  # number of the last send write batch
+        self.pending_writes = []
+        self.request_id = 0
+        self.requested = {}  # request id -> address of all outstanding read requests
+        self.cache = {}  # address -> (cycles, value) of answered reads
+
+        self.read_count = 0
+        self.write_count = 0
+        self.round_trips = 0
+
+    def add_range(self, start_addr, end_addr=None):
+        """ Forward all byte reads/writes of the given address range to the bus """
+        self.memory.add_read_byte_callback(self.read_byte, start_addr, end_addr)
+        self.memory.add_write_byte_callback(self.write_byte, start_addr, end_addr)
+
+    # ---------------------------------------------------------------------------
+
+    def write_byte(self, cycles, last_op_address, address, value):
+        self.write_count += 1
+        self.cache.pop(address, None)
+        for request_id, requested_address in self.requested.items():
+            if requested_address == address:
+                self.requested[request_id] = None  # answer is outdated by this write
+        pending_writes = self.pending_writes
+        pending_writes.append((cycles, address, value))
+
+        if len(pending_writes) >= self.batch_size:
+            self.flush()
+        elif self.sync_cycles is not None and cycles - pending_writes[0][0] >= self.sync_cycles:
+            self.flush()
+
+    def flush(self):
+        """ Send all pending writes as one batch """
+        if self.pending_writes:
+            self.batch_no += 1
+            self.write_bus_queue.put((self.batch_no, self.pending_writes))
+            self.pending_writes = []
+
+    # ---------------------------------------------------------------------------
+
+    def _request(self, cycles, address):
+        self.request_id += 1
+        self.requested[self.request_id] = address
+        self.read_bus_request_queue.put((self.request_id, self.batch_no, cycles, address))
+        return self.request_id
+
+    def _receive(self, block):
+        """ Store one read response into the cache, returns the request id """
+        request_id, cycles, value = self.read_bus_response_queue.get(block=block, timeout=self.timeout)
+        address = self.requested.pop(request_id)
+        if address is not None:
+            self.cache[address] = (cycles, value)
+        return request_id
+
+    def _receive_all(self):
+        while self.requested:
+            try:
+                self._receive(block=False)
+            except queue.Empty:
+                return
+
+    def prefetch(self, start_addr, end_addr=None, cycles=None):
+        """
+        Pipelined reads: Send read requests without waiting for the responses.
+        The answers are used by the next read_byte() calls.
+        """
+        if cycles is None:
+            cycles = self.memory.cpu.cycles
+        if end_addr is None:
+            end_addr = start_addr
+        self.flush()
+        outstanding = set(self.requested.values())
+        for address in range(start_addr, end_addr + 1):
+            if address not in outstanding:
+                self._request(cycles, address)
+
+    def read_byte(self, cycles, last_op_address, address):
+        self.read_count += 1
+
+        if self.sync_cycles is not None:
+            self._receive_all()
+            try:
+                cache_cycles, value = self.cache[address]
+            except KeyError:
+                pass
+            else:
+                if cycles - cache_cycles <= self.sync_cycles:
+                    if address not in self.requested.values():
+                        self.flush()
+                        self._request(cycles, address)  # refresh in the background
+                    return value
+
+        self.flush()
+        for request_id, requested_address in self.requested.items():
+            if requested_address == address:
+                break  # wait for the already pipelined request
+        else:
+            request_id = self._request(cycles, address)
+
+        self.round_trips += 1
+        while self._receive(block=True) != request_id:
+            pass
+        return self.cache[address][1]
+
+    # ---------------------------------------------------------------------------
+
+    def shutdown(self):
+        """ Send all pending writes and stop the device process """
+        self.flush()
+        self.read_bus_request_queue.put((None, self.batch_no, None, None))
+
+    def get_stats(self):
+        return {
+            "reads": self.read_count,
+            "writes": self.write_count,
+            "write_batches": self.batch_no,
+            "round_trips": self.round_trips,
+        }
+
+
+def run_bus_device(device, read_bus_request_queue, read_bus_response_queue, write_bus_queue, idle_timeout=0.05):
+    """
+    The device side of the bus: Serve requests until the client shut down.
+    'device' must have the methods:
+        read_byte(cycles, address) -> byte
+        write_byte(cycles, address, value)
+    """
+    applied_batch_no = 0
+
+    def apply_batch(block):
+        nonlocal applied_batch_no
+        batch_no, writes = write_bus_queue.get(block=block)
+        for cycles, address, value in writes:
+            device.write_byte(cycles, address, value)
+        applied_batch_no = batch_no
+
+    while True:
+        try:
+            request_id, batch_no, cycles, address = read_bus_request_queue.get(timeout=idle_timeout)
+        except queue.Empty:
+            # Apply posted writes while idle
+            try:
+                while True:
+                    apply_batch(block=False)
+            except queue.Empty:
+                pass
+            continue
+
+        while applied_batch_no < batch_no:
+            apply_batch(block=True)
+
+        if request_id is None:
+            log.info("Bus device %r shut down.", device)
+            return
+
+        value = device.read_byte(cycles, address)
+        read_bus_response_queue.put((request_id, cycles, value))
+
+
+def _bus_process(device_factory, read_bus_request_queue, read_bus_response_queue, write_bus_queue):
+    run_bus_device(device_factory(), read_bus_request_queue, read_bus_response_queue, write_bus_queue)
+
+
+def start_bus_process(device_factory, context=None):
+    """
+    Start 'device_factory()' in a new process.
+    Returns the process and the queue kwargs for Memory(), e.g.:
+
+        process, bus_queues = start_bus_process(MyDevice)
+        memory = Memory(cfg, **bus_queues)
+        memory.bus.add_range(0xff00, 0xff3f)
+    """
+    if context is None:
+        context = multiprocessing.get_context()
+    bus_queues = {
+        "read_bus_request_queue": context.Queue(),
+        "read_bus_response_queue": context.Queue(),
+        "write_bus_queue": context.Queue(),
+    }
+    process = context.Process(
+        target=_bus_process,
+        args=(device_factory,) + tuple(bus_queues.values()),
+        name="MC6809-Bus-Device",
+        daemon=True,
+    )
+    process.start()
+    return process, bus_queues
+
+
+class RAMBusDevice:
+    """
+    A simple stand-in device: plain RAM that stores the cycles of the last write
+    """
+
+    def __init__(self, size=0x10000):
+        self.ram = bytearray(size)
+        self.last_write_cycles = 0
+
+    def read_byte(self, cycles, address):
+        return self.ram[address]
+
+    def write_byte(self, cycles, address, value):
+        self.last_write_cycles = cycles
+        self.ram[address] = value
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - incremental per-page memory hashes
+    ===========================================
+
+    Keep a content hash for every page of the memory. A DirtyTracker marks
+    the changed pages, only these are hashed again on the next request.
+    So a hash of the whole memory and the list of different pages between
+    two machines (or a machine and a snapshot) costs time proportional to
+    the changed pages:
+
+        memory.ram_hash()
+        memory.diff_pages(other_memory)
+
+    Only changes via write_byte()/write_word() and load() are seen.
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import hashlib
+
+
+DEFAULT_PAGE_SIZE = 0x100
+DIGEST_SIZE = 16
+
+
+def hash_page(data):
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+
+def hash_pages(data, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Returns the hashes of all pages of a memory image, e.g. from a snapshot
+
+    >>> hashes = hash_pages(bytes(0x300))
+    >>> len(hashes), hashes[0] == hashes[2]
+    (3, True)
+    """
+    data = memoryview(data)
+    return [hash_page(data[start:start + page_size]) for start in range(0, len(data), page_size)]
+
+
+def diff_hashes(hashes, other_hashes, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Returns the start addresses of all different pages
+
+    >>> diff_hashes(hash_pages(bytes(0x300)), hash_pages(bytes(0x200) + b"X" + bytes(0xff)))
+    [512]
+    """
+    if len(hashes) != len(other_hashes):
+        raise ValueError(f"Different memory sizes: {len(hashes):d} != {len(other_hashes):d} pages")
+    return [
+        page * page_size
+        for page, (page_hash, other_page_hash) in enumerate(zip(hashes, other_hashes))
+        if page_hash != other_page_hash
+    ]
+
+
+class PageHashes:
+    def __init__(self, memory, page_size=DEFAULT_PAGE_SIZE):
+        self.memory = memory
+        self.page_size = page_size
+        self.tracker = memory.add_dirty_tracking(0x0000, memory.INTERNAL_SIZE - 1, page_size, private=True)
+        self.hashes = hash_pages(memory.tobytes(), page_size)
+        self.memory_hash = None
+        self.rehashed = 0  # number of lazy recomputed pages
+
+    def close(self):
+        self.memory.remove_dirty_tracking(self.tracker)
+
+    def update(self):
+        """ Rehash all dirty pages and returns the list of all page hashes """
+        spans = self.tracker.collect()
+        if spans:
+            hashes = self.hashes
+            page_size = self.page_size
+            tobytes = self.memory.tobytes
+            for start, end in spans:
+                data = memoryview(tobytes(start, end + 1))  # one copy for all pages of the span
+                for offset in range(0, len(data), page_size):
+                    hashes[(start + offset) // page_size] = hash_page(data[offset:offset + page_size])
+                    self.rehashed += 1
+            self.memory_hash = None
+        return self.hashes
+
+    def get_memory_hash(self):
+        """ A hash of the whole memory, build from the page hashes """
+        hashes = self.update()
+        if self.memory_hash is None:
+            self.memory_hash = hashlib.blake2b(b"".join(hashes), digest_size=DIGEST_SIZE * 2).hexdigest()
+        return self.memory_hash
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - shared memory backed RAM
+    =================================
+
+    Put the emulated memory into a multiprocessing.shared_memory block,
+    so that other processes (memory viewer, screen renderer, metrics
+    exporter...) can read the guest memory at their own pace, without
+    competing with the CPU for the GIL.
+
+    The CPU process publish a layout descriptor (a JSON serializable dict)
+    and a observer attach the memory read-only with it, e.g.:
+
+        memory = Memory(cfg, shared_memory=True)
+        layout = memory.get_shared_memory_layout()  # send it to the observer
+
+        # in the observer process:
+        view = SharedMemoryView(layout)
+        screen = view.get(0x0400, 0x0600)
+
+    Needs Python 3.8 or newer.
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import logging
+
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+
+log = logging.getLogger("MC6809")
+
+
+LAYOUT_VERSION = 1
+
+
+def _assert_shared_memory():
+    if shared_memory is None:
+        raise RuntimeError("multiprocessing.shared_memory needs Python 3.8 or newer!")
+
+
+class SharedMemoryRAM:
+    """
+    Owner of the shared memory block. Memory() use self.buf as backing store.
+    """
+
+    def __init__(self, size, name=None):
+        _assert_shared_memory()
+        self.size = size
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.buf = self.shm.buf[:size]  # The block may be bigger (page size)
+        log.info("Create shared memory %r with %i Bytes", self.shm.name, size)
+
+    def get_layout(self, memory):
+        cfg = memory.cfg
+        return {
+            "version": LAYOUT_VERSION,
+            "name": self.shm.name,
+            "size": self.size,
+            "format": "B",  # unsigned char per address
+            "word_order": "big",  # 6809 is Big-Endian
+            "ram": [cfg.RAM_START, cfg.RAM_END],
+            "rom": [cfg.ROM_START, cfg.ROM_END],
+            "cfg": cfg.__class__.__name__,
+        }
+
+    def close(self):
+        """ Release and destroy the shared memory block """
+        self.buf.release()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedMemoryView:
+    """
+    Read-only access to the memory of a CPU in a other process.
+    Reads go directly to the shared memory: no callbacks, no CPU cycles.
+    """
+
+    def __init__(self, layout):
+        _assert_shared_memory()
+        if layout["version"] != LAYOUT_VERSION:
+            raise ValueError(f"Unsupported shared memory layout version: {layout['version']!r}")
+        self.layout = layout
+
+        try:
+            self.shm = shared_memory.SharedMemory(name=layout["name"], track=False)
+        except TypeError:  # Python < 3.13
+            self.shm = shared_memory.SharedMemory(name=layout["name"])
+            # Only the creator should unlink the block at exit:
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+
+        self.mem = self.shm.buf[:layout["size"]].toreadonly()
+
+    def read_byte(self, address):
+        return self.mem[address]
+
+    def read_word(self, address):
+        return (self.mem[address] << 8) + self.mem[address + 1]
+
+    def get(self, start, end):
+        """ Returns a copy of the memory from start to end (exclusive) as bytes """
+        return self.mem[start:end].tobytes()
+
+    def close(self):
+        self.mem.release()
+        self.shm.close()
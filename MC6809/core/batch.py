@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - process pool batch runner
+    ==================================
+
+    Run many independent emulation jobs (see MC6809.core.jobs for the job
+    format) on all CPU cores. Every worker process creates its machine
+    once, at its first chunk, and runs the optional 'setup_job'
+    (e.g. load a program image).
+    The warm state is snapshot and restored before every job, so a job
+    never sees the changes of a previous job.
+
+        runner = BatchRunner(setup_job={"load": [...]})
+        for result in runner.run(iter_jobs("jobs.jsonl")):
+            ...  # in order of completion, result["index"] is the job number
+        runner.get_stats()
+
+    The jobs are send in chunks to the workers and only a limited number
+    of chunks are in flight. So a huge job list is read lazily and the
+    results are streamed back as they finish.
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import json
+import logging
+import os
+import pathlib
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from MC6809.components.cpu6809 import CPU
+from MC6809.components.memory import Memory
+from MC6809.core.configs import BaseConfig
+from MC6809.core.jobs import JobError, run_job
+
+
+log = logging.getLogger("MC6809")
+
+
+CFG_DICT = {
+    "verbosity": None,
+    "trace": None,
+}
+
+
+class BatchConfig(BaseConfig):
+    RAM_START = 0x0000
+    RAM_END = 0x7FFF
+
+    ROM_START = 0x8000
+    ROM_END = 0xFFFF
+
+
+def create_cpu():
+    """
+    A plain 64KB machine. The default bytearray memory backend restores a snapshot fastest.
+    """
+    cfg = BatchConfig(CFG_DICT)
+    memory = Memory(cfg)
+    return CPU(memory, cfg)
+
+
+def iter_jobs(path):
+    """
+    Yields the jobs of a JSON lines file ("-" is stdin)
+    or of all *.json files (one job per file) of a directory, sorted by name.
+    Invalid JSON is yielded as JobError, the runner reports it as the
+    error result of this job.
+    """
+    if path == "-":
+        lines = sys.stdin
+    else:
+        path = pathlib.Path(path)
+        if path.is_dir():
+            for job_path in sorted(path.glob("*.json")):
+                yield _load_job(job_path.read_text(), job_path.name)
+            return
+        lines = path.open()
+
+    try:
+        for line_no, line in enumerate(lines, start=1):
+            line = line.strip()
+            if line:
+                yield _load_job(line, f"line {line_no:d}")
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+
+
+def _load_job(text, source):
+    """
+    >>> _load_job('{"start": 4096}', "line 1")
+    {'start': 4096}
+    >>> print(_load_job('{"start": ', "line 2"))
+    Invalid JSON in line 2: Expecting value: line 1 column 11 (char 10)
+    """
+    try:
+        return json.loads(text)
+    except ValueError as err:
+        return JobError(f"Invalid JSON in {source}: {err}")
+
+
+_worker_state = None  # (setup job, cpu, warm snapshot) of a worker process
+
+
+def _get_worker_state(setup_job):
+    """
+    Create the machine of this worker process at the first chunk
+    and again only if a other 'setup_job' is used.
+    """
+    global _worker_state
+    if _worker_state is None or _worker_state[0] != setup_job:
+        cpu = create_cpu()
+        if setup_job:
+            run_job(cpu, setup_job)
+        _worker_state = (setup_job, cpu, cpu.get_snapshot())
+    return _worker_state[1:]
+
+
+def _run_chunk(setup_job, chunk):
+    cpu, snapshot = _get_worker_state(setup_job)
+    results = []
+    for index, job in chunk:
+        cpu.set_snapshot(snapshot)
+        try:
+            if isinstance(job, JobError):  # e.g.: invalid JSON, see: iter_jobs()
+                raise job
+            result = run_job(cpu, job)
+        except Exception as err:
+            result = {
+                "error": f"{err.__class__.__name__}: {err}",
+                "traceback": traceback.format_exc(),
+            }
+        result["index"] = index
+        result["worker"] = os.getpid()
+        results.append(result)
+    return results
+
+
+class BatchRunner:
+    def __init__(self, workers=None, setup_job=None, chunk_size=16, max_chunks_per_worker=4):
+        self.workers = workers or os.cpu_count() or 1
+        self.setup_job = setup_job
+        self.chunk_size = chunk_size
+        self.max_in_flight = self.workers * max_chunks_per_worker
+
+        self.jobs = 0
+        self.errors = 0
+        self.cycles = []  # CPU cycles per successful job
+        self.duration = 0.0
+        self.worker_pids = set()
+
+    def _iter_chunks(self, jobs):
+        chunk = []
+        for index, job in enumerate(jobs):
+            chunk.append((index, job))
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _account(self, results):
+        for result in results:
+            self.jobs += 1
+            self.worker_pids.add(result["worker"])
+            if "error" in result:
+                self.errors += 1
+            else:
+                self.cycles.append(result["cycles"])
+            yield result
+
+    def run(self, jobs):
+        """
+        Run all 'jobs' (any iterable) and yields the results as they finish.
+        """
+        start_time = time.perf_counter()
+        chunks = self._iter_chunks(jobs)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = set()
+            for chunk in chunks:
+                in_flight.add(executor.submit(_run_chunk, self.setup_job, chunk))
+                if len(in_flight) >= self.max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from self._account(future.result())
+                    self.duration = time.perf_counter() - start_time
+
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from self._account(future.result())
+                self.duration = time.perf_counter() - start_time
+
+    def get_stats(self):
+        cycles = self.cycles
+        return {
+            "jobs": self.jobs,
+            "errors": self.errors,
+            "workers": len(self.worker_pids),
+            "duration": self.duration,
+            "jobs_per_sec": self.jobs / self.duration if self.duration else None,
+            "cycles_total": sum(cycles),
+            "cycles_min": min(cycles) if cycles else None,
+            "cycles_mean": sum(cycles) / len(cycles) if cycles else None,
+            "cycles_max": max(cycles) if cycles else None,
+        }
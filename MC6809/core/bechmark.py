@@ -14,6 +14,7 @@ import logging
 import string
 import time
 
+from MC6809.components.memory_backends import DEFAULT_BACKEND, get_available_backends, get_backend
 from MC6809.tests.test_6809_program import Test6809_Program
 from MC6809.utils.humanize import locale_format_number
 
@@ -77,3 +78,51 @@ def run_benchmark(loops, multiply):
         f" {locale_format_number(total_cycles)} CPU cycles."
     )
     print("\tavg.: %s CPU cycles/sec" % locale_format_number(total_cycles / total_duration))
+
+
+def _bench_memory_backend(backend_name, loops):
+    backend = get_backend(backend_name)(0x10000)
+    mem = backend.mem
+    addresses = range(0x0000, 0xffff)
+
+    start_time = time.time()
+    for __ in range(loops):
+        for address in addresses:
+            mem[address]
+    read_duration = time.time() - start_time
+
+    start_time = time.time()
+    for __ in range(loops):
+        for address in addresses:
+            mem[address] = address & 0xff
+    write_duration = time.time() - start_time
+
+    start_time = time.time()
+    for __ in range(loops):
+        for address in addresses:
+            (mem[address] << 8) + mem[address + 1]
+    word_duration = time.time() - start_time
+
+    backend.close()
+    return read_duration, write_duration, word_duration
+
+
+def run_memory_benchmark(loops):
+    """
+    Compare the memory backing stores on the current interpreter.
+    Returns the name of the fastest one.
+    """
+    print(f"\nMemory backend benchmark with {loops:d} loops over 64KBytes:\n")
+    print(f"{'backend':>15} {'read':>10} {'write':>10} {'word read':>10} {'total':>10}")
+
+    results = {}
+    for backend_name in get_available_backends():
+        durations = _bench_memory_backend(backend_name, loops)
+        results[backend_name] = sum(durations)
+        columns = " ".join(f"{duration:9.3f}s" for duration in (*durations, results[backend_name]))
+        print(f"{backend_name:>15} {columns}")
+
+    fastest = min(results, key=results.get)
+    print("-" * 79)
+    print(f"Fastest backend: {fastest!r} (current default: {DEFAULT_BACKEND!r})")
+    return fastest
@@ -28,6 +28,24 @@ from http.server import BaseHTTPRequestHandler, HTTPServer
 log = logging.getLogger("MC6809")
 
 
+def read_memory(cpu, start, end):
+    """
+    Read the bytes from 'start' to 'end' (inclusive) like the CPU does:
+    The read byte callbacks are called, e.g. of a memory mapped I/O.
+    """
+    return bytes(map(cpu.memory.read_byte, range(start, end + 1)))
+
+
+def write_memory(cpu, start, end, data):
+    """
+    Write 'data' from 'start' to at most 'end' (inclusive) like the CPU does:
+    The write byte middleware/callbacks are called and the ROM is protected.
+    """
+    write_byte = cpu.memory.write_byte
+    for address, value in zip(range(start, end + 1), data):
+        write_byte(address, value)
+
+
 class ControlHandler(BaseHTTPRequestHandler):
 
     def __init__(self, request, client_address, server, cpu):
@@ -56,6 +74,22 @@ class ControlHandler(BaseHTTPRequestHandler):
         msg = f"{self.client_address[0]} - - [{self.log_date_time_string()}] {format % args}\n"
         log.critical(msg)
 
+    def call_cpu(self, func, *args):
+        """
+        Call func(*args) in the CPU thread if the CPU runs in a CPUThread,
+        so the request never races with the running CPU.
+        """
+        cpu_thread = self.cpu._cpu_thread
+        if cpu_thread is None:
+            return func(*args)
+        return cpu_thread.execute(func, *args).result()
+
+    def read_memory(self, start, end):
+        return self.call_cpu(read_memory, self.cpu, start, end)
+
+    def write_memory(self, start, end, data):
+        self.call_cpu(write_memory, self.cpu, start, end, data)
+
     def dispatch(self, urls):
         for r, f in list(urls.items()):
             m = re.match(r, self.path)
@@ -150,7 +184,7 @@ class ControlHandler(BaseHTTPRequestHandler):
             end = int(e)
         else:
             end = addr
-        self.response("".join(chr(self.cpu.read_byte(x)) for x in range(addr, end + 1)))
+        self.response(self.read_memory(addr, end))
 
     def get_memory(self, m):
         addr = int(m.group(1), 16)
@@ -159,18 +193,21 @@ class ControlHandler(BaseHTTPRequestHandler):
             end = int(e, 16)
         else:
             end = addr
-        self.response(json.dumps(list(map(self.cpu.read_byte, list(range(addr, end + 1))))))
+        self.response(json.dumps(list(self.read_memory(addr, end))))
 
     def get_status(self, m):
-        data = {
+        data = self.call_cpu(self._get_status)
+        log.critical("status dict: %s", repr(data))
+        json_string = json.dumps(data)
+        self.response(json_string)
+
+    def _get_status(self):
+        return {
             "cpu": self.cpu.get_info,
             "cc": self.cpu.get_cc_info(),
             "pc": self.cpu.program_counter.get(),
             "cycle_count": self.cpu.cycles,
         }
-        log.critical("status dict: %s", repr(data))
-        json_string = json.dumps(data)
-        self.response(json_string)
 
     def post_memory(self, m):
         addr = int(m.group(1))
@@ -180,8 +217,7 @@ class ControlHandler(BaseHTTPRequestHandler):
         else:
             end = addr
         data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
-        for i, a in enumerate(range(addr, end + 1)):
-            self.cpu.write_byte(a, data[i])
+        self.write_memory(addr, end, data)
         self.response("")
 
     def post_memory_raw(self, m):
@@ -192,8 +228,7 @@ class ControlHandler(BaseHTTPRequestHandler):
         else:
             end = addr
         data = self.rfile.read(int(self.headers["Content-Length"]))
-        for i, a in enumerate(range(addr, end + 1)):
-            self.cpu.write_byte(a, data[i])
+        self.write_memory(addr, end, data)
         self.response("")
 
     def post_debug(self, m):
@@ -205,11 +240,11 @@ class ControlHandler(BaseHTTPRequestHandler):
 
     def post_quit(self, m):
         log.critical("Quit CPU from controller server.")
-        self.cpu.quit()
+        self.call_cpu(self.cpu.quit)
         self.response_html(headline="CPU running")
 
     def post_reset(self, m):
-        self.cpu.reset()
+        self.call_cpu(self.cpu.reset)
         self.response_html(headline="CPU reset")
 
 
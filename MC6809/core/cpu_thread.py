@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - run the CPU in its own thread
+    ======================================
+
+    The CPUThread runs the CPU in slices of 'slice_cycles' CPU cycles.
+    Other threads control it only via commands: They are put into a queue
+    and executed by the CPU thread between two slices. So a command never
+    races with a running instruction and the hot loop has no extra check.
+    Every command returns a concurrent.futures.Future:
+
+        cpu_thread = CPUThread(cpu)
+        cpu_thread.start()
+        cpu_thread.pause().result()
+        data = cpu_thread.read(0x0400, 0x05ff).result()
+        cpu_thread.add_breakpoint(0x1234)
+        cpu_thread.resume()
+        cpu_thread.wait_paused(timeout=5)  # e.g.: the breakpoint was hit
+        cpu_thread.stop()
+
+    Breakpoints are read callbacks on the address: The opcode fetch from
+    the address stops the CPU before the instruction is executed. So they
+    cost nothing on other addresses. The opcode fetch is detected via
+    cpu.last_op_address, a operand fetch from the address doesn't stop.
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+from MC6809.core.jobs import get_registers
+
+
+log = logging.getLogger("MC6809")
+
+
+class BreakpointHit(Exception):
+    def __init__(self, address):
+        super().__init__(f"Breakpoint at ${address:04x}")
+        self.address = address
+
+
+class CPUThreadStopped(RuntimeError):
+    pass
+
+
+class CPUThread(threading.Thread):
+    def __init__(self, cpu, slice_cycles=10000, paused=False):
+        super().__init__(name="MC6809-CPU", daemon=True)
+        self.cpu = cpu
+        self.slice_cycles = slice_cycles
+        self.commands = queue.Queue()  # not SimpleQueue: new in Python 3.7
+
+        self.running = True
+        self.paused = paused
+        self.paused_event = threading.Event()
+        if paused:
+            self.paused_event.set()
+        self.error = None
+
+        self.breakpoints = {}  # address: previous read byte callback or None
+        self.breakpoint_hits = 0
+        self.last_breakpoint = None
+        self._skip_breakpoint = None  # continue from this breakpoint address
+
+        cpu._cpu_thread = self
+
+    ####
+    # Public API, thread safe: Returns Future instances
+
+    def execute(self, func, *args):
+        """
+        Call func(*args) in the CPU thread, between two slices.
+        """
+        future = Future()
+        if not self.running:
+            future.set_exception(CPUThreadStopped("CPU thread is stopped"))
+        else:
+            self.commands.put((func, args, future))
+        return future
+
+    def pause(self):
+        return self.execute(self._pause)
+
+    def resume(self):
+        return self.execute(self._resume)
+
+    def step(self, count=1):
+        """ Run 'count' instructions (only while paused). Returns the registers. """
+        return self.execute(self._step, count)
+
+    def read(self, start, end):
+        """ Returns the memory from 'start' to 'end' (inclusive) as bytes """
+        return self.execute(self._read, start, end)
+
+    def write(self, address, data):
+        return self.execute(self.cpu.memory.load, address, data)
+
+    def get_registers(self):
+        return self.execute(get_registers, self.cpu)
+
+    def snapshot(self):
+        return self.execute(self.cpu.get_snapshot)
+
+    def restore(self, data):
+        return self.execute(self.cpu.set_snapshot, data)
+
+    def reset(self):
+        return self.execute(self.cpu.reset)
+
+    def add_breakpoint(self, address):
+        return self.execute(self._add_breakpoint, address)
+
+    def remove_breakpoint(self, address):
+        return self.execute(self._remove_breakpoint, address)
+
+    def stop(self, timeout=None):
+        future = self.execute(self._shutdown)
+        self.join(timeout)
+        return future
+
+    def wait_paused(self, timeout=None):
+        """ Wait until the CPU is paused, e.g. by a breakpoint """
+        return self.paused_event.wait(timeout)
+
+    ####
+    # Executed in the CPU thread
+
+    def _pause(self):
+        self.paused = True
+        self.paused_event.set()
+
+    def _resume(self):
+        self._skip_current_breakpoint()
+        self.paused = False
+        self.paused_event.clear()
+
+    def _shutdown(self):
+        self.running = False
+
+    def _read(self, start, end):
+        return self.cpu.memory.tobytes(start, end + 1)
+
+    def _skip_current_breakpoint(self):
+        pc = self.cpu.program_counter.value
+        if pc in self.breakpoints:
+            self._skip_breakpoint = pc
+
+    def _step(self, count):
+        if not self.paused:
+            raise RuntimeError("Step is only possible while the CPU is paused")
+        self._skip_current_breakpoint()
+        try:
+            self.cpu.step(count)
+        except BreakpointHit as hit:
+            self._hit(hit)
+        return get_registers(self.cpu)
+
+    def _breakpoint_callback(self, cycles, last_op_address, address):
+        cpu = self.cpu
+        if last_op_address == address:  # opcode fetch, see: get_and_call_next_op()
+            if address == self._skip_breakpoint:
+                self._skip_breakpoint = None
+            else:
+                cpu.cycles -= 1  # the fetch will be done again after the resume
+                raise BreakpointHit(address)
+
+        callback = self.breakpoints[address]
+        if callback is not None:
+            return callback(cycles, last_op_address, address)
+        return cpu.memory._mem[address]
+
+    def _add_breakpoint(self, address):
+        callbacks = self.cpu.memory._read_byte_callbacks
+        if address not in self.breakpoints:
+            self.breakpoints[address] = callbacks.get(address)
+            callbacks[address] = self._breakpoint_callback
+
+    def _remove_breakpoint(self, address):
+        callback = self.breakpoints.pop(address)
+        callbacks = self.cpu.memory._read_byte_callbacks
+        if callback is None:
+            del callbacks[address]
+        else:
+            callbacks[address] = callback
+
+    def _hit(self, hit):
+        log.info("CPU stopped: %s", hit)
+        self.breakpoint_hits += 1
+        self.last_breakpoint = hit.address
+        self._pause()
+
+    def _process_commands(self):
+        commands = self.commands
+        while self.running:
+            try:
+                func, args, future = commands.get(block=self.paused)
+            except queue.Empty:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = func(*args)
+            except Exception as err:
+                future.set_exception(err)
+            else:
+                future.set_result(result)
+
+    def _cancel_commands(self):
+        while True:
+            try:
+                __, __, future = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            if future.set_running_or_notify_cancel():
+                future.set_exception(CPUThreadStopped("CPU thread is stopped"))
+
+    def run(self):
+        cpu = self.cpu
+        try:
+            while self.running and cpu.running:
+                self._process_commands()
+                if self.paused or not self.running:
+                    continue
+                try:
+                    cpu.run_for_cycles(self.slice_cycles)
+                except BreakpointHit as hit:
+                    self._hit(hit)
+        except Exception as err:
+            log.exception("CPU thread failed")
+            self.error = err
+        finally:
+            self.running = False
+            self.paused_event.set()
+            self._cancel_commands()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - fork server for pre-booted machines
+    ============================================
+
+    Boot a machine once, park it and serve every job in a os.fork() child:
+    The child inherit the warm CPU, memory and all caches copy-on-write,
+    runs the job, send the result back over the connection and exit.
+    The parked machine is never changed by a job.
+
+    Jobs are send as one JSON line over a local Unix socket, the result is
+    the answer as one JSON line. See MC6809.core.jobs for the job format.
+
+        cpu = ...  # create the machine
+        run_job(cpu, boot_job)  # e.g.: boot the ROM up to the BASIC prompt
+        server = ForkServer("/tmp/mc6809.sock", cpu)
+        server.serve_forever()
+
+        # In a other process:
+        result = submit_job("/tmp/mc6809.sock", job)
+
+    Needs a POSIX system (os.fork and AF_UNIX sockets).
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import traceback
+
+from MC6809.core.jobs import run_job
+
+
+log = logging.getLogger("MC6809")
+
+
+class JobRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handle one job. Runs in the forked child process.
+    """
+
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            job = json.loads(line)
+            result = run_job(self.server.cpu, job)
+        except Exception as err:
+            log.exception("Job failed")
+            result = {
+                "error": f"{err.__class__.__name__}: {err}",
+                "traceback": traceback.format_exc(),
+            }
+        self.wfile.write(json.dumps(result).encode("UTF-8") + b"\n")
+
+
+class ForkServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """
+    Serve jobs on the Unix socket 'socket_path' with forks of the parked 'cpu'
+    """
+
+    def __init__(self, socket_path, cpu, max_children=40):
+        self.cpu = cpu
+        self.max_children = max_children
+        self.jobs_started = 0
+
+        try:
+            mode = os.stat(socket_path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError(f"Socket path {socket_path!r} exists and is not a socket")
+            os.unlink(socket_path)  # left over from a previous run
+        super().__init__(socket_path, JobRequestHandler)
+        log.info("Fork server listen on %r", socket_path)
+
+    def process_request(self, request, client_address):
+        self.jobs_started += 1
+        super().process_request(request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def submit_job(socket_path, job, timeout=None):
+    """
+    Send 'job' to a fork server and wait for the result.
+    Raise RuntimeError if the job failed.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        with sock.makefile("rwb") as f:
+            f.write(json.dumps(job).encode("UTF-8") + b"\n")
+            f.flush()
+            line = f.readline()
+
+    if not line:
+        raise RuntimeError("Fork server closed the connection without a result")
+    result = json.loads(line)
+    if "error" in result:
+        raise RuntimeError(f"Job failed: {result['error']}\n{result['traceback']}")
+    return result
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - emulation jobs
+    =======================
+
+    A job is a JSON serializable dict, that describe one run of a (warm)
+    machine, e.g.:
+
+        {
+            "load": [{"address": 0x1000, "data": "8e0400..."}],  # hex strings
+            "registers": {"X": 0x0400, "A": 0x42},
+            "start": 0x1000,  # PC (default: don't change the PC)
+            "end": 0x1020,  # stop at the opcode fetch from this address
+            "max_cycles": 1000000,  # stop after this CPU cycles
+            # Without "end" and "max_cycles" the CPU will not run at all.
+            "dump": [[0x0400, 0x040f]],  # memory ranges (end inclusive) for the result
+        }
+
+    The job runs with cpu.run_for_cycles(), so the scheduled events are
+    dispatched. "end" is a read callback, that raises JobEnd on the opcode
+    fetch, like the sentinel return address of a guest call. So there is
+    no extra check per instruction.
+
+    The result is a JSON serializable dict, too:
+
+        {
+            "stopped": "end",  # or "max_cycles" or None (not run)
+            "cycles": 1234,  # used CPU cycles
+            "registers": {"X": ..., "Y": ..., ...},
+            "dump": [{"address": 0x0400, "data": "2a2a..."}],
+        }
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+from MC6809.components.MC6809data.MC6809_op_data import (
+    REG_A,
+    REG_B,
+    REG_CC,
+    REG_D,
+    REG_DP,
+    REG_PC,
+    REG_S,
+    REG_U,
+    REG_X,
+    REG_Y,
+)
+
+
+DEFAULT_MAX_CYCLES = 10000000
+
+JOB_KEYS = ("load", "registers", "start", "end", "max_cycles", "dump")
+REGISTERS = (REG_X, REG_Y, REG_U, REG_S, REG_PC, REG_A, REG_B, REG_D, REG_DP, REG_CC)
+
+STOPPED_END = "end"
+STOPPED_MAX_CYCLES = "max_cycles"
+
+
+class JobError(ValueError):
+    pass
+
+
+class JobEnd(Exception):
+    """ The opcode fetch from the "end" address of a job """
+    pass
+
+
+def validate_job(job):
+    """
+    >>> validate_job({"start": 0x1000, "end": 0x1010})
+    >>> validate_job({"foo": 1})
+    Traceback (most recent call last):
+    ...
+    MC6809.core.jobs.JobError: Unknown job keys: foo
+    >>> validate_job({"registers": {"Z": 1}})
+    Traceback (most recent call last):
+    ...
+    MC6809.core.jobs.JobError: Unknown register: 'Z'
+    """
+    if not isinstance(job, dict):
+        raise JobError(f"Job must be a dict, not: {type(job).__name__}")
+    unknown = sorted(set(job) - set(JOB_KEYS))
+    if unknown:
+        raise JobError(f"Unknown job keys: {', '.join(unknown)}")
+    for name in job.get("registers", {}):
+        if name not in REGISTERS:
+            raise JobError(f"Unknown register: {name!r}")
+
+
+def get_registers(cpu):
+    return {
+        REG_X: cpu.index_x.value,
+        REG_Y: cpu.index_y.value,
+        REG_U: cpu.user_stack_pointer.value,
+        REG_S: cpu.system_stack_pointer.value,
+        REG_PC: cpu.program_counter.value,
+        REG_A: cpu.accu_a.value,
+        REG_B: cpu.accu_b.value,
+        REG_DP: cpu.direct_page.value,
+        REG_CC: cpu.get_cc_value(),
+    }
+
+
+def _run(cpu, end, max_cycles):
+    """
+    Run until the opcode fetch from 'end' (if not None) or for 'max_cycles'.
+    Returns STOPPED_END or STOPPED_MAX_CYCLES
+    """
+    program_counter = cpu.program_counter
+    if end is None:
+        cpu.run_for_cycles(max_cycles)
+        return STOPPED_MAX_CYCLES
+    if program_counter.value == end:
+        return STOPPED_END
+
+    memory = cpu.memory
+    read_byte_callbacks = memory._read_byte_callbacks
+    old_callback = read_byte_callbacks.get(end)
+
+    def end_callback(cycles, last_op_address, address):
+        if last_op_address == address:  # opcode fetch, see: cpu.get_and_call_next_op()
+            raise JobEnd()
+        if old_callback is not None:
+            return old_callback(cycles, last_op_address, address)
+        return memory._mem[address]
+
+    read_byte_callbacks[end] = end_callback
+    try:
+        cpu.run_for_cycles(max_cycles)
+    except JobEnd:
+        cpu.cycles -= 1  # The opcode fetch from 'end'
+        return STOPPED_END
+    finally:
+        if old_callback is None:
+            del read_byte_callbacks[end]
+        else:
+            read_byte_callbacks[end] = old_callback
+
+    if program_counter.value == end:  # arrived with the last instruction of the budget
+        return STOPPED_END
+    return STOPPED_MAX_CYCLES
+
+
+def run_job(cpu, job):
+    """
+    Run one job on 'cpu' and returns the result dict.
+    """
+    validate_job(job)
+    memory = cpu.memory
+
+    for segment in job.get("load", ()):
+        memory.load(segment["address"], bytes.fromhex(segment["data"]))
+
+    for name, value in job.get("registers", {}).items():
+        if name == REG_CC:
+            cpu.set_cc(value)
+        else:
+            cpu.register_str2object[name].set(value)
+
+    if "start" in job:
+        cpu.program_counter.set(job["start"])
+
+    end = job.get("end")
+    start_cycles = cpu.cycles
+
+    if end is None and "max_cycles" not in job:
+        stopped = None
+    else:
+        stopped = _run(cpu, end, job.get("max_cycles", DEFAULT_MAX_CYCLES))
+
+    return {
+        "stopped": stopped,
+        "cycles": cpu.cycles - start_cycles,
+        "registers": get_registers(cpu),
+        "dump": [
+            {"address": start, "data": memory.tobytes(start, end + 1).hex()}
+            for start, end in job.get("dump", ())
+        ],
+    }
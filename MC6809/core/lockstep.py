@@ -0,0 +1,626 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - NumPy lockstep engine
+    ==============================
+
+    Run the same 6809 routine on many machines ("lanes") at once, e.g. a
+    CRC over thousands of different buffers. The registers of all lanes
+    are NumPy arrays and every lane has its own RAM, so one decoded
+    instruction is executed for all lanes with a few array operations.
+
+    Lanes diverge at conditional branches. The engine executes the
+    instruction at the PC of the most running lanes, only for the lanes at
+    this PC. The other lanes wait until they are the majority or until
+    the others reach them again, e.g. after a if-block. (Executing the
+    lowest PC first re-converge more strictly, but the CRC32 routine has
+    two loop back branches and only 18% lane utilisation with it, vs. 52%.)
+    The lane utilisation (executed lanes / running lanes) is in get_stats().
+
+        engine = LockstepEngine(lanes=1000)
+        engine.load(0x0100, code)  # same code for all lanes
+        for lane, data in enumerate(buffers):
+            engine.load_lane(lane, 0x1000, data)
+        engine.set_register(REG_X, lengths)  # one value per lane (or a int)
+        engine.run(start=0x0100, end=0x0116)
+        engine.get_register(REG_D)  # numpy array with one value per lane
+
+    Notes:
+        * The code must be the same in all lanes: It is decoded from the
+          memory of the first executed lane.
+        * Only a subset of the opcodes is supported, see SUPPORTED_INSTRUCTIONS.
+          e.g.: no interrupts, no SWI, no MUL/DAA.
+        * No CPU cycles are counted, only executed instructions.
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import logging
+
+from MC6809.components.MC6809data.MC6809_op_data import (
+    BYTE,
+    DIRECT,
+    DIRECT_WORD,
+    EXTENDED,
+    EXTENDED_WORD,
+    IMMEDIATE,
+    IMMEDIATE_WORD,
+    INDEXED,
+    INDEXED_WORD,
+    INHERENT,
+    OP_DATA,
+    REG_A,
+    REG_B,
+    REG_CC,
+    REG_D,
+    REG_DP,
+    REG_PC,
+    REG_S,
+    REG_U,
+    REG_X,
+    REG_Y,
+    RELATIVE,
+    RELATIVE_WORD,
+    WORD,
+)
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+log = logging.getLogger("MC6809")
+
+
+# CC bits:
+CC_C = 0x01
+CC_V = 0x02
+CC_Z = 0x04
+CC_N = 0x08
+CC_H = 0x20
+
+CC_NZV = CC_N | CC_Z | CC_V
+CC_NZVC = CC_NZV | CC_C
+CC_HNZVC = CC_H | CC_NZVC
+
+REGISTER_WIDTH = {
+    REG_A: 8, REG_B: 8, REG_DP: 8, REG_CC: 8,
+    REG_D: 16, REG_X: 16, REG_Y: 16, REG_U: 16, REG_S: 16, REG_PC: 16,
+}
+
+# Register numbers of the EXG/TFR postbyte:
+EXG_TFR_REGISTERS = {
+    0x0: REG_D, 0x1: REG_X, 0x2: REG_Y, 0x3: REG_U, 0x4: REG_S, 0x5: REG_PC,
+    0x8: REG_A, 0x9: REG_B, 0xa: REG_CC, 0xb: REG_DP,
+}
+INDEX_REGISTERS = (REG_X, REG_Y, REG_U, REG_S)
+
+# Branch condition, by the packed CC values of the lanes:
+BRANCH_CONDITIONS = {
+    "BEQ": lambda cc: (cc & CC_Z) != 0,
+    "BNE": lambda cc: (cc & CC_Z) == 0,
+    "BHS": lambda cc: (cc & CC_C) == 0,  # alias BCC
+    "BLO": lambda cc: (cc & CC_C) != 0,  # alias BCS
+    "BMI": lambda cc: (cc & CC_N) != 0,
+    "BPL": lambda cc: (cc & CC_N) == 0,
+    "BVS": lambda cc: (cc & CC_V) != 0,
+    "BVC": lambda cc: (cc & CC_V) == 0,
+    "BHI": lambda cc: (cc & (CC_C | CC_Z)) == 0,
+    "BLS": lambda cc: (cc & (CC_C | CC_Z)) != 0,
+    "BGE": lambda cc: ((cc >> 3) & 1) == ((cc >> 1) & 1),
+    "BLT": lambda cc: ((cc >> 3) & 1) != ((cc >> 1) & 1),
+    "BGT": lambda cc: ((cc & CC_Z) == 0) & (((cc >> 3) & 1) == ((cc >> 1) & 1)),
+    "BLE": lambda cc: ((cc & CC_Z) != 0) | (((cc >> 3) & 1) != ((cc >> 1) & 1)),
+}
+
+SUPPORTED_INSTRUCTIONS = (
+    "ADD", "AND", "ASR", "BRA", "BRN", "BSR", "CLR", "CMP", "DEC", "EOR", "EXG",
+    "INC", "JMP", "JSR", "LD", "LEA", "LSL", "LSR", "NOP", "OR", "PSH", "PUL",
+    "ROL", "ROR", "RTS", "ST", "SUB", "TFR",
+) + tuple(BRANCH_CONDITIONS)
+
+# Push order of PSHS/PSHU postbyte bits, pull is the reverse order.
+# bit 6 is the "other" stack pointer: U for PSHS and S for PSHU
+PUSH_ORDER = (
+    (0x80, REG_PC), (0x40, None), (0x20, REG_Y), (0x10, REG_X),
+    (0x08, REG_DP), (0x04, REG_B), (0x02, REG_A), (0x01, REG_CC),
+)
+
+
+def signed8(x):
+    return x - 0x100 if x > 0x7f else x
+
+
+def signed16(x):
+    return x - 0x10000 if x > 0x7fff else x
+
+
+def nz_8(r):
+    return ((r >> 4) & CC_N) | ((r & 0xff) == 0) * CC_Z
+
+
+def nz_16(r):
+    return ((r >> 12) & CC_N) | ((r & 0xffff) == 0) * CC_Z
+
+
+def nzvc_8(a, b, r):
+    return nz_8(r) | (((a ^ b ^ r ^ (r >> 1)) >> 6) & CC_V) | ((r >> 8) & CC_C)
+
+
+def nzvc_16(a, b, r):
+    return nz_16(r) | (((a ^ b ^ r ^ (r >> 1)) >> 14) & CC_V) | ((r >> 16) & CC_C)
+
+
+class LockstepEngine:
+    def __init__(self, lanes, memory_size=0x10000):
+        if numpy is None:
+            raise RuntimeError("numpy is not installed!")
+
+        self.lanes = lanes
+        self.memory = numpy.zeros((lanes, memory_size), dtype=numpy.uint8)
+        self.registers = {
+            name: numpy.zeros(lanes, dtype=numpy.int64)
+            for name in (REG_A, REG_B, REG_DP, REG_X, REG_Y, REG_U, REG_S, REG_PC)
+        }
+        self.cc = numpy.zeros(lanes, dtype=numpy.int64)
+
+        self.ops = self._build_ops()
+
+        self.steps = 0  # executed instructions for all selected lanes
+        self.lane_ops = 0  # executed instructions of all lanes
+        self.lane_slots = 0  # sum of running lanes of all steps
+
+    def _build_ops(self):
+        ops = {}
+        for instr_name, instr_data in OP_DATA.items():
+            if instr_name not in SUPPORTED_INSTRUCTIONS:
+                continue
+            if instr_name in BRANCH_CONDITIONS:
+                func = self.instruction_branch
+            else:
+                func = getattr(self, f"instruction_{instr_name}")
+            for mnemonic_data in instr_data["mnemonic"].values():
+                for opcode, op_data in mnemonic_data["ops"].items():
+                    ops[opcode] = (
+                        func, instr_name, op_data["addr_mode"], mnemonic_data["register"],
+                        mnemonic_data["read_from_memory"], mnemonic_data["write_to_memory"],
+                    )
+        return ops
+
+    ####
+    # Setup and results
+
+    def load(self, address, data):
+        """ Load 'data' into the memory of all lanes """
+        self.memory[:, address:address + len(data)] = numpy.frombuffer(bytes(data), dtype=numpy.uint8)
+
+    def load_lane(self, lane, address, data):
+        self.memory[lane, address:address + len(data)] = numpy.frombuffer(bytes(data), dtype=numpy.uint8)
+
+    def get_register(self, name, idx=slice(None)):
+        if name == REG_D:
+            return (self.registers[REG_A][idx] << 8) | self.registers[REG_B][idx]
+        elif name == REG_CC:
+            return self.cc[idx]
+        return self.registers[name][idx]
+
+    def set_register(self, name, value, idx=slice(None)):
+        """ 'value' is a int for all lanes or a array with one value per lane """
+        if name == REG_D:
+            self.registers[REG_A][idx] = (value >> 8) & 0xff
+            self.registers[REG_B][idx] = value & 0xff
+        elif name == REG_CC:
+            self.cc[idx] = value & 0xff
+        elif REGISTER_WIDTH[name] == 8:
+            self.registers[name][idx] = value & 0xff
+        else:
+            self.registers[name][idx] = value & 0xffff
+
+    def get_stats(self):
+        return {
+            "lanes": self.lanes,
+            "steps": self.steps,
+            "lane_ops": self.lane_ops,
+            "utilisation": self.lane_ops / self.lane_slots if self.lane_slots else 0.0,
+        }
+
+    ####
+    # Memory access for the lanes 'idx'
+
+    def read_byte(self, idx, ea):
+        return self.memory[idx, ea].astype(numpy.int64)
+
+    def read_word(self, idx, ea):
+        memory = self.memory
+        return (memory[idx, ea].astype(numpy.int64) << 8) | memory[idx, (ea + 1) & 0xffff]
+
+    def write_byte(self, idx, ea, value):
+        self.memory[idx, ea] = value & 0xff
+
+    def write_word(self, idx, ea, value):
+        self.memory[idx, ea] = (value >> 8) & 0xff
+        self.memory[idx, (ea + 1) & 0xffff] = value & 0xff
+
+    def _set_flags(self, idx, mask, flags):
+        self.cc[idx] = (self.cc[idx] & ~mask) | flags
+
+    def _push(self, idx, stack_pointer, name):
+        sp = self.registers[stack_pointer]
+        value = self.get_register(name, idx)
+        if REGISTER_WIDTH[name] == 8:
+            ea = (sp[idx] - 1) & 0xffff
+            self.write_byte(idx, ea, value)
+        else:
+            ea = (sp[idx] - 2) & 0xffff
+            self.write_word(idx, ea, value)
+        sp[idx] = ea
+
+    def _pull(self, idx, stack_pointer, name):
+        sp = self.registers[stack_pointer]
+        ea = sp[idx]
+        if REGISTER_WIDTH[name] == 8:
+            self.set_register(name, self.read_byte(idx, ea), idx)
+            sp[idx] = (ea + 1) & 0xffff
+        else:
+            self.set_register(name, self.read_word(idx, ea), idx)
+            sp[idx] = (ea + 2) & 0xffff
+
+    ####
+    # Run
+
+    def _get_ea_indexed(self, idx, code, pc):
+        """ Returns the effective addresses of the lanes and the new PC """
+        postbyte = int(code[pc])
+        pc += 1
+        index_register = self.registers[INDEX_REGISTERS[(postbyte >> 5) & 3]]
+
+        if not postbyte & 0x80:  # 5 bit offset
+            offset = postbyte & 0x1f
+            if offset > 0xf:
+                offset -= 0x20
+            return (index_register[idx] + offset) & 0xffff, pc
+
+        addr_mode = postbyte & 0x0f
+        if addr_mode == 0x0:  # ,R+
+            ea = index_register[idx]
+            index_register[idx] = (ea + 1) & 0xffff
+        elif addr_mode == 0x1:  # ,R++
+            ea = index_register[idx]
+            index_register[idx] = (ea + 2) & 0xffff
+        elif addr_mode == 0x2:  # ,-R
+            ea = (index_register[idx] - 1) & 0xffff
+            index_register[idx] = ea
+        elif addr_mode == 0x3:  # ,--R
+            ea = (index_register[idx] - 2) & 0xffff
+            index_register[idx] = ea
+        elif addr_mode == 0x4:  # ,R
+            ea = index_register[idx]
+        elif addr_mode == 0x5:  # B,R
+            b = self.registers[REG_B][idx]
+            ea = index_register[idx] + b - ((b & 0x80) << 1)
+        elif addr_mode == 0x6:  # A,R
+            a = self.registers[REG_A][idx]
+            ea = index_register[idx] + a - ((a & 0x80) << 1)
+        elif addr_mode == 0x8:  # 8 bit offset
+            ea = index_register[idx] + signed8(int(code[pc]))
+            pc += 1
+        elif addr_mode == 0x9:  # 16 bit offset
+            ea = index_register[idx] + signed16((int(code[pc]) << 8) | int(code[pc + 1]))
+            pc += 2
+        elif addr_mode == 0xb:  # D,R
+            ea = index_register[idx] + self.get_register(REG_D, idx)
+        elif addr_mode == 0xc:  # 8 bit offset,PC
+            ea = pc + 1 + signed8(int(code[pc]))
+            pc += 1
+        elif addr_mode == 0xd:  # 16 bit offset,PC
+            ea = pc + 2 + signed16((int(code[pc]) << 8) | int(code[pc + 1]))
+            pc += 2
+        elif addr_mode == 0xf:  # [address]
+            ea = (int(code[pc]) << 8) | int(code[pc + 1])
+            pc += 2
+        else:
+            raise NotImplementedError(f"Indexed addressing mode ${postbyte:02x} is not supported")
+
+        ea = ea & 0xffff
+        if postbyte & 0x10:  # indirect
+            ea = self.read_word(idx, ea)
+        return ea, pc
+
+    def execute(self, idx, address):
+        """ Execute the instruction at 'address' for the lanes 'idx' """
+        code = self.memory[idx[0]]
+        pc = address
+        opcode = int(code[pc])
+        pc += 1
+        if opcode in (0x10, 0x11):
+            opcode = (opcode << 8) | int(code[pc])
+            pc += 1
+        try:
+            func, instr_name, addr_mode, register, read_from_memory, write_to_memory = self.ops[opcode]
+        except KeyError:
+            raise NotImplementedError(f"Opcode ${opcode:02x} at ${address:04x} is not supported")
+
+        ea = m = None
+        if addr_mode == INHERENT:
+            pass
+        elif addr_mode == IMMEDIATE:
+            m = int(code[pc])
+            pc += 1
+        elif addr_mode == IMMEDIATE_WORD:
+            m = (int(code[pc]) << 8) | int(code[pc + 1])
+            pc += 2
+        elif addr_mode in (DIRECT, DIRECT_WORD):
+            ea = (self.registers[REG_DP][idx] << 8) | int(code[pc])
+            pc += 1
+        elif addr_mode in (EXTENDED, EXTENDED_WORD):
+            ea = (int(code[pc]) << 8) | int(code[pc + 1])
+            pc += 2
+        elif addr_mode in (INDEXED, INDEXED_WORD):
+            ea, pc = self._get_ea_indexed(idx, code, pc)
+        elif addr_mode == RELATIVE:
+            ea = (pc + 1 + signed8(int(code[pc]))) & 0xffff
+            pc += 1
+        elif addr_mode == RELATIVE_WORD:
+            ea = (pc + 2 + ((int(code[pc]) << 8) | int(code[pc + 1]))) & 0xffff
+            pc += 2
+        else:
+            raise NotImplementedError(f"Addressing mode {addr_mode} is not supported")
+
+        self.registers[REG_PC][idx] = pc
+
+        if ea is not None:
+            if read_from_memory == BYTE:
+                m = self.read_byte(idx, ea)
+            elif read_from_memory == WORD:
+                m = self.read_word(idx, ea)
+
+        result = func(idx, instr_name, register, ea, m)
+
+        if write_to_memory == BYTE:
+            self.write_byte(idx, ea, result)
+        elif write_to_memory == WORD:
+            self.write_word(idx, ea, result)
+
+    def run(self, start=None, end=None, max_steps=None):
+        """
+        Run all lanes until their PC reached 'end'.
+        Returns the number of lanes that are still running (after 'max_steps').
+        """
+        pc = self.registers[REG_PC]
+        if start is not None:
+            pc[:] = start
+
+        running = numpy.arange(self.lanes)
+        if end is not None:
+            running = running[pc != end]
+
+        # https://wiki.python.org/moin/PythonSpeed/PerformanceTips#Avoiding_dots...
+        execute = self.execute
+        steps = 0
+        while running.size:
+            if max_steps is not None and steps >= max_steps:
+                break
+
+            running_pcs = pc[running]
+            address = int(running_pcs[0])
+            if (running_pcs == address).all():  # all lanes run in lockstep
+                idx = running
+            else:
+                addresses, counts = numpy.unique(running_pcs, return_counts=True)
+                address = int(addresses[counts.argmax()])
+                idx = running[running_pcs == address]
+            count = idx.size
+
+            execute(idx, address)
+
+            steps += 1
+            self.lane_ops += count
+            self.lane_slots += running.size
+
+            if end is not None and (pc[idx] == end).any():
+                running = running[pc[running] != end]
+
+        self.steps += steps
+        return int(running.size)
+
+    ####
+    # Instructions: called with the selected lanes 'idx'. 'm' and 'ea' are
+    # a int (same for all lanes) or a array.
+    # A returned value is written to 'ea' if the op data has 'write_to_memory'
+
+    def instruction_NOP(self, idx, instr_name, register, ea, m):
+        pass
+
+    def instruction_LD(self, idx, instr_name, register, ea, m):
+        self.set_register(register, m, idx)
+        if REGISTER_WIDTH[register] == 8:
+            self._set_flags(idx, CC_NZV, nz_8(m))
+        else:
+            self._set_flags(idx, CC_NZV, nz_16(m))
+
+    def instruction_ST(self, idx, instr_name, register, ea, m):
+        value = self.get_register(register, idx)
+        if REGISTER_WIDTH[register] == 8:
+            self._set_flags(idx, CC_NZV, nz_8(value))
+        else:
+            self._set_flags(idx, CC_NZV, nz_16(value))
+        return value
+
+    def _logic(self, idx, register, r):
+        self.set_register(register, r, idx)
+        self._set_flags(idx, CC_NZV, nz_8(r))
+
+    def instruction_AND(self, idx, instr_name, register, ea, m):
+        if register == REG_CC:  # ANDCC
+            self.cc[idx] &= m
+        else:
+            self._logic(idx, register, self.registers[register][idx] & m)
+
+    def instruction_OR(self, idx, instr_name, register, ea, m):
+        if register == REG_CC:  # ORCC
+            self.cc[idx] |= m
+        else:
+            self._logic(idx, register, self.registers[register][idx] | m)
+
+    def instruction_EOR(self, idx, instr_name, register, ea, m):
+        self._logic(idx, register, self.registers[register][idx] ^ m)
+
+    def instruction_ADD(self, idx, instr_name, register, ea, m):
+        a = self.get_register(register, idx)
+        r = a + m
+        self.set_register(register, r, idx)
+        if REGISTER_WIDTH[register] == 8:
+            self._set_flags(idx, CC_HNZVC, nzvc_8(a, m, r) | (((a ^ m ^ r) & 0x10) << 1))
+        else:
+            self._set_flags(idx, CC_NZVC, nzvc_16(a, m, r))
+
+    def _subtract(self, idx, register, m):
+        a = self.get_register(register, idx)
+        r = a - m
+        if REGISTER_WIDTH[register] == 8:
+            self._set_flags(idx, CC_NZVC, nzvc_8(a, m, r))
+        else:
+            self._set_flags(idx, CC_NZVC, nzvc_16(a, m, r))
+        return r
+
+    def instruction_SUB(self, idx, instr_name, register, ea, m):
+        self.set_register(register, self._subtract(idx, register, m), idx)
+
+    def instruction_CMP(self, idx, instr_name, register, ea, m):
+        self._subtract(idx, register, m)
+
+    def _unary(self, idx, register, m, func):
+        """ Call 'func' with the register or memory value, return the memory value to write """
+        if register is None:
+            return func(idx, m) & 0xff
+        self.registers[register][idx] = func(idx, self.registers[register][idx]) & 0xff
+
+    def _lsl(self, idx, a):
+        r = a << 1
+        self._set_flags(idx, CC_NZVC, nzvc_8(a, a, r))
+        return r
+
+    def _lsr(self, idx, a):
+        r = a >> 1
+        self._set_flags(idx, CC_N | CC_Z | CC_C, ((r == 0) * CC_Z) | (a & CC_C))
+        return r
+
+    def _asr(self, idx, a):
+        r = (a >> 1) | (a & 0x80)
+        self._set_flags(idx, CC_N | CC_Z | CC_C, nz_8(r) | (a & CC_C))
+        return r
+
+    def _rol(self, idx, a):
+        r = (a << 1) | (self.cc[idx] & CC_C)
+        self._set_flags(idx, CC_NZVC, nzvc_8(a, a, r))
+        return r
+
+    def _ror(self, idx, a):
+        r = (a >> 1) | ((self.cc[idx] & CC_C) << 7)
+        self._set_flags(idx, CC_N | CC_Z | CC_C, nz_8(r) | (a & CC_C))
+        return r
+
+    def _inc(self, idx, a):
+        r = (a + 1) & 0xff
+        self._set_flags(idx, CC_NZV, nz_8(r) | (r == 0x80) * CC_V)
+        return r
+
+    def _dec(self, idx, a):
+        r = (a - 1) & 0xff
+        self._set_flags(idx, CC_NZV, nz_8(r) | (r == 0x7f) * CC_V)
+        return r
+
+    def _clr(self, idx, a):
+        self._set_flags(idx, CC_NZVC, CC_Z)
+        return 0
+
+    def instruction_LSL(self, idx, instr_name, register, ea, m):
+        return self._unary(idx, register, m, self._lsl)
+
+    def instruction_LSR(self, idx, instr_name, register, ea, m):
+        return self._unary(idx, register, m, self._lsr)
+
+    def instruction_ASR(self, idx, instr_name, register, ea, m):
+        return self._unary(idx, register, m, self._asr)
+
+    def instruction_ROL(self, idx, instr_name, register, ea, m):
+        return self._unary(idx, register, m, self._rol)
+
+    def instruction_ROR(self, idx, instr_name, register, ea, m):
+        return self._unary(idx, register, m, self._ror)
+
+    def instruction_INC(self, idx, instr_name, register, ea, m):
+        return self._unary(idx, register, m, self._inc)
+
+    def instruction_DEC(self, idx, instr_name, register, ea, m):
+        return self._unary(idx, register, m, self._dec)
+
+    def instruction_CLR(self, idx, instr_name, register, ea, m):
+        if register is None:
+            self._clr(idx, m)
+            return 0
+        self._unary(idx, register, m, self._clr)
+
+    def instruction_LEA(self, idx, instr_name, register, ea, m):
+        self.registers[register][idx] = ea
+        if register in (REG_X, REG_Y):  # LEAU and LEAS don't affect the Z flag
+            self._set_flags(idx, CC_Z, (ea == 0) * CC_Z)
+
+    def _get_exg_tfr_registers(self, m):
+        try:
+            reg1 = EXG_TFR_REGISTERS[m >> 4]
+            reg2 = EXG_TFR_REGISTERS[m & 0xf]
+        except KeyError:
+            raise NotImplementedError(f"EXG/TFR postbyte ${m:02x} is not supported")
+        if REGISTER_WIDTH[reg1] != REGISTER_WIDTH[reg2]:
+            raise NotImplementedError(f"EXG/TFR between {reg1} and {reg2} is not supported")
+        return reg1, reg2
+
+    def instruction_EXG(self, idx, instr_name, register, ea, m):
+        reg1, reg2 = self._get_exg_tfr_registers(m)
+        value1 = self.get_register(reg1, idx).copy()
+        self.set_register(reg1, self.get_register(reg2, idx), idx)
+        self.set_register(reg2, value1, idx)
+
+    def instruction_TFR(self, idx, instr_name, register, ea, m):
+        reg1, reg2 = self._get_exg_tfr_registers(m)
+        self.set_register(reg2, self.get_register(reg1, idx), idx)
+
+    def instruction_PSH(self, idx, instr_name, register, ea, m):
+        other_stack_pointer = REG_U if register == REG_S else REG_S
+        for bit, name in PUSH_ORDER:
+            if m & bit:
+                self._push(idx, register, name or other_stack_pointer)
+
+    def instruction_PUL(self, idx, instr_name, register, ea, m):
+        other_stack_pointer = REG_U if register == REG_S else REG_S
+        for bit, name in reversed(PUSH_ORDER):
+            if m & bit:
+                self._pull(idx, register, name or other_stack_pointer)
+
+    def instruction_branch(self, idx, instr_name, register, ea, m):
+        condition = BRANCH_CONDITIONS[instr_name](self.cc[idx])
+        pc = self.registers[REG_PC]
+        pc[idx] = numpy.where(condition, ea, pc[idx])
+
+    def instruction_BRA(self, idx, instr_name, register, ea, m):
+        self.registers[REG_PC][idx] = ea
+
+    def instruction_BRN(self, idx, instr_name, register, ea, m):
+        pass
+
+    instruction_JMP = instruction_BRA
+
+    def instruction_BSR(self, idx, instr_name, register, ea, m):
+        self._push(idx, REG_S, REG_PC)
+        self.registers[REG_PC][idx] = ea
+
+    instruction_JSR = instruction_BSR
+
+    def instruction_RTS(self, idx, instr_name, register, ea, m):
+        self._pull(idx, REG_S, REG_PC)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - host many machines in one thread
+    =========================================
+
+    The MachineScheduler runs N machines round-robin: In every round every
+    machine runs 'quantum' * weight CPU cycles. The budget is a absolute
+    cycles target per machine, so the overshoot of the last instruction
+    of a slice is taken from the next slice and the cycle shares stay
+    exact over many rounds.
+
+        scheduler = MachineScheduler(quantum=10000)
+        scheduler.add(cpu1, name="board 1")
+        scheduler.add(cpu2, name="board 2", weight=2)  # gets twice the cycles
+        scheduler.run(rounds=100)
+        scheduler.get_stats()
+
+    A machine is finished, if its CPU is stopped via cpu.quit().
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import logging
+import time
+
+
+log = logging.getLogger("MC6809")
+
+
+class Machine:
+    def __init__(self, cpu, name, weight):
+        self.cpu = cpu
+        self.name = name
+        self.weight = weight
+        self.target_cycles = cpu.cycles
+        self.cycles = 0  # CPU cycles run by the scheduler
+        self.run_time = 0.0
+        self.slices = 0
+
+    @property
+    def finished(self):
+        return not self.cpu.running
+
+    def __repr__(self):
+        return f"<Machine {self.name!r} weight={self.weight:d} cycles={self.cycles:d}>"
+
+
+class MachineScheduler:
+    def __init__(self, quantum=10000):
+        self.quantum = quantum
+        self.machines = []
+        self.rounds = 0
+
+    def add(self, cpu, name=None, weight=1):
+        if weight < 1:
+            raise ValueError(f"Weight must be >= 1, not: {weight!r}")
+        if name is None:
+            name = f"machine {len(self.machines):d}"
+        if any(machine.name == name for machine in self.machines):
+            raise ValueError(f"Machine {name!r} exists already")
+        if any(machine.cpu is cpu for machine in self.machines):
+            raise ValueError("CPU exists already")
+        machine = Machine(cpu, name, weight)
+        self.machines.append(machine)
+        return machine
+
+    def remove(self, name):
+        for machine in self.machines:
+            if machine.name == name:
+                self.machines.remove(machine)
+                return machine
+        raise KeyError(name)
+
+    def run_round(self):
+        """
+        Run one slice of every not finished machine.
+        Returns the number of machines that ran.
+        """
+        clock = time.perf_counter
+        quantum = self.quantum
+        count = 0
+        for machine in self.machines:
+            if machine.finished:
+                continue
+            machine.target_cycles += quantum * machine.weight
+
+            start_time = clock()
+            machine.cycles += machine.cpu.run_until(machine.target_cycles)
+            machine.run_time += clock() - start_time
+            machine.slices += 1
+            count += 1
+        self.rounds += 1
+        return count
+
+    def run(self, rounds=None):
+        """
+        Run 'rounds' rounds or until all machines are finished.
+        """
+        done = 0
+        while rounds is None or done < rounds:
+            if not self.run_round():
+                log.info("All machines are finished after %i rounds.", self.rounds)
+                break
+            done += 1
+
+    def get_stats(self):
+        """
+        The throughput of every machine and its share of all run cycles.
+        """
+        total_cycles = sum(machine.cycles for machine in self.machines)
+        stats = {}
+        for machine in self.machines:
+            stats[machine.name] = {
+                "weight": machine.weight,
+                "cycles": machine.cycles,
+                "slices": machine.slices,
+                "run_time": machine.run_time,
+                "cycles_per_sec": machine.cycles / machine.run_time if machine.run_time else None,
+                "share": machine.cycles / total_cycles if total_cycles else None,
+                "finished": machine.finished,
+            }
+        return stats
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - deterministic record/replay of device I/O
+    ==================================================
+
+    The Recorder logs every value returned by a read byte/word callback of
+    the memory, every cpu.irq() call and every change of the interrupt lines
+    (cpu.assert_interrupt() and cpu.release_interrupt()), stamped with the
+    CPU cycles, into
+    a compact binary log. The Replayer feeds the values back into a machine
+    without the real devices: A read callback is only a lookup in the log,
+    write callbacks are dropped. So a replay is reproducible and faster than
+    the live emulation.
+
+        recorder = Recorder(cpu)
+        recorder.start()
+        ...  # run the machine
+        log_data = recorder.stop()
+
+        replayer = Replayer(other_cpu, log_data)
+        replayer.run()  # stops at the cycles of recorder.stop()
+
+    Notes:
+        * Read/write middleware must be deterministic, they are not recorded.
+        * cpu.irq() must be called between instructions (e.g. from a sync
+          callback) to be replayed at the same point. Interrupt line
+          changes are replayed at the next instruction boundary.
+
+    Log format: A header (magic and version) followed by the events:
+
+        1 Byte  event type (EVENT_*)
+        4 Bytes CPU cycles since the previous event
+        2 Bytes address
+        2 Bytes value
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import logging
+import struct
+from collections import namedtuple
+
+
+log = logging.getLogger("MC6809")
+
+
+MAGIC = b"6809IO"
+VERSION = 1
+HEADER = struct.Struct(">6sH")
+EVENT = struct.Struct(">BIHH")
+
+EVENT_READ_BYTE = 1
+EVENT_READ_WORD = 2
+EVENT_IRQ = 3
+EVENT_END = 4
+EVENT_SKIP = 5  # Only cycles, if more than MAX_CYCLES_DELTA passed between two events
+EVENT_ASSERT_INTERRUPT = 6  # value is the interrupt line
+EVENT_RELEASE_INTERRUPT = 7
+
+MAX_CYCLES_DELTA = 0xffffffff
+
+Event = namedtuple("Event", "type cycles address value")
+
+
+class ReplayError(RuntimeError):
+    """ The replayed machine does something else than the recorded one """
+    pass
+
+
+def iter_events(data):
+    """
+    Yields all Event() of a log, with the absolute CPU cycles
+
+    >>> data = HEADER.pack(MAGIC, VERSION) + EVENT.pack(EVENT_READ_BYTE, 10, 0xff00, 0x42)
+    >>> list(iter_events(data))
+    [Event(type=1, cycles=10, address=65280, value=66)]
+    """
+    data = memoryview(data)
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"No MC6809 I/O log (magic: {magic!r})")
+    if version != VERSION:
+        raise ValueError(f"Unsupported I/O log version: {version:d}")
+
+    cycles = 0
+    for event_type, cycles_delta, address, value in EVENT.iter_unpack(data[HEADER.size:]):
+        cycles += cycles_delta
+        if event_type != EVENT_SKIP:
+            yield Event(event_type, cycles, address, value)
+
+
+class Recorder:
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.memory = cpu.memory
+        self.log = bytearray(HEADER.pack(MAGIC, VERSION))
+        self.last_cycles = 0
+        self.originals = None
+
+    def _add(self, event_type, cycles, address, value):
+        cycles_delta = cycles - self.last_cycles
+        while cycles_delta > MAX_CYCLES_DELTA:
+            self.log += EVENT.pack(EVENT_SKIP, MAX_CYCLES_DELTA, 0, 0)
+            cycles_delta -= MAX_CYCLES_DELTA
+        self.log += EVENT.pack(event_type, cycles_delta, address, value)
+        self.last_cycles = cycles
+
+    def _wrap_read(self, callback, event_type):
+        def recording_callback(cycles, last_op_address, address):
+            value = callback(cycles, last_op_address, address)
+            self._add(event_type, cycles, address, value)
+            return value
+        return recording_callback
+
+    def _wrap_callbacks(self, callbacks_dict, event_type):
+        wrappers = {}  # one wrapper per callback function
+        originals = dict(callbacks_dict)
+        for address, callback in originals.items():
+            if callback not in wrappers:
+                wrappers[callback] = self._wrap_read(callback, event_type)
+            callbacks_dict[address] = wrappers[callback]
+        return originals
+
+    def _irq(self):
+        self._add(EVENT_IRQ, self.cpu.cycles, 0, 0)
+        self.originals["irq"]()
+
+    def _assert_interrupt(self, line):
+        self._add(EVENT_ASSERT_INTERRUPT, self.cpu.cycles, 0, line)
+        self.originals["assert_interrupt"](line)
+
+    def _release_interrupt(self, line):
+        self._add(EVENT_RELEASE_INTERRUPT, self.cpu.cycles, 0, line)
+        self.originals["release_interrupt"](line)
+
+    def start(self):
+        """
+        Record all existing read callbacks, cpu.irq() calls
+        and interrupt line changes.
+        """
+        self.last_cycles = self.cpu.cycles
+        self.originals = {
+            "read_byte": self._wrap_callbacks(self.memory._read_byte_callbacks, EVENT_READ_BYTE),
+            "read_word": self._wrap_callbacks(self.memory._read_word_callbacks, EVENT_READ_WORD),
+            "irq": self.cpu.irq,
+            "assert_interrupt": self.cpu.assert_interrupt,
+            "release_interrupt": self.cpu.release_interrupt,
+        }
+        self.cpu.irq = self._irq
+        self.cpu.assert_interrupt = self._assert_interrupt
+        self.cpu.release_interrupt = self._release_interrupt
+
+    def stop(self):
+        """
+        Stop recording and returns the log as bytes
+        """
+        self._add(EVENT_END, self.cpu.cycles, 0, 0)
+        self.memory._read_byte_callbacks.update(self.originals["read_byte"])
+        self.memory._read_word_callbacks.update(self.originals["read_word"])
+        # the bound methods of the class are used again:
+        del self.cpu.irq
+        del self.cpu.assert_interrupt
+        del self.cpu.release_interrupt
+        self.originals = None
+        return bytes(self.log)
+
+
+class Replayer:
+    def __init__(self, cpu, data):
+        self.cpu = cpu
+        self.memory = cpu.memory
+        self.events = list(iter_events(data))
+        self.position = 0
+        self.irq_count = 0
+        self.interrupt_line_changes = 0
+
+        if not self.events or self.events[-1].type != EVENT_END:
+            raise ValueError("I/O log is incomplete: no end event")
+        self.end_cycles = self.events[-1].cycles
+
+    def _next_event(self, event_type, cycles, address):
+        event = self.events[self.position]
+        if event.type != event_type or event.cycles != cycles or event.address != address:
+            raise ReplayError(
+                f"Replay diverged at event {self.position:d}: expected {event},"
+                f" got type={event_type:d} at cycles={cycles:d} address=${address:04x}"
+            )
+        self.position += 1
+        return event.value
+
+    def _read_byte(self, cycles, last_op_address, address):
+        return self._next_event(EVENT_READ_BYTE, cycles, address)
+
+    def _read_word(self, cycles, last_op_address, address):
+        return self._next_event(EVENT_READ_WORD, cycles, address)
+
+    def _ignore_write(self, cycles, last_op_address, address, value):
+        pass
+
+    def install(self):
+        """
+        Replace the devices: All recorded addresses read from the log
+        and all write callbacks are dropped.
+        """
+        memory = self.memory
+        for event in self.events:
+            if event.type == EVENT_READ_BYTE:
+                memory._read_byte_callbacks[event.address] = self._read_byte
+            elif event.type == EVENT_READ_WORD:
+                memory._read_word_callbacks[event.address] = self._read_word
+        for callbacks_dict in (memory._write_byte_callbacks, memory._write_word_callbacks):
+            for address in callbacks_dict:
+                callbacks_dict[address] = self._ignore_write
+
+    def run(self):
+        """
+        Run the CPU until the recorded end cycles.
+        """
+        self.install()
+        cpu = self.cpu
+        events = self.events
+
+        # https://wiki.python.org/moin/PythonSpeed/PerformanceTips#Avoiding_dots...
+        get_and_call_next_op = cpu.get_and_call_next_op
+        scheduler = cpu.scheduler
+
+        end_cycles = self.end_cycles
+        while cpu.cycles < end_cycles:
+            event = events[self.position]
+            if cpu.cycles >= event.cycles:
+                if event.type == EVENT_IRQ:
+                    if cpu.cycles != event.cycles:
+                        raise ReplayError(f"Replay diverged: IRQ at {event.cycles:d} but CPU at {cpu.cycles:d}")
+                    self.position += 1
+                    self.irq_count += 1
+                    cpu.irq()
+                    continue
+                elif event.type == EVENT_ASSERT_INTERRUPT:
+                    self.position += 1
+                    self.interrupt_line_changes += 1
+                    cpu.assert_interrupt(event.value)
+                    continue
+                elif event.type == EVENT_RELEASE_INTERRUPT:
+                    self.position += 1
+                    self.interrupt_line_changes += 1
+                    cpu.release_interrupt(event.value)
+                    continue
+            if cpu.cycles >= scheduler.next_due:
+                scheduler.dispatch(cpu.cycles)
+            get_and_call_next_op()
+
+        if cpu.cycles != end_cycles:
+            raise ReplayError(f"Replay diverged: ends at cycles {cpu.cycles:d} and not at {end_cycles:d}")
+        self.position += 1  # the end event
+        return self.get_stats()
+
+    def get_stats(self):
+        return {
+            "events": self.position,
+            "irqs": self.irq_count,
+            "interrupt_line_changes": self.interrupt_line_changes,
+            "cycles": self.end_cycles,
+        }
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - rewind ring buffer
+    ===========================
+
+    Take a checkpoint every 'interval' CPU cycles into a bounded ring.
+    A checkpoint stores the registers and only the memory pages that
+    are changed since the previous checkpoint, found via a dirty tracker
+    over the whole address space. The oldest checkpoint is merged into
+    a full base image, if the ring is full or the memory budget is used up.
+
+    Restore to a checkpoint writes back only the pages that are changed
+    after it: Walk backwards through the ring and take the newest version
+    of every page, or the base image version.
+
+        rewind = Rewind(cpu, interval=100000, max_checkpoints=64)
+        rewind.attach()  # checkpoint via CPU sync callback
+        ...
+        rewind.restore(-10)  # go back 10 checkpoints
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import logging
+from collections import deque, namedtuple
+
+
+log = logging.getLogger("MC6809")
+
+
+Checkpoint = namedtuple("Checkpoint", "cycles registers pages size")
+
+
+class Rewind:
+    def __init__(self, cpu, interval=100000, max_checkpoints=64, max_bytes=None, page_size=0x100):
+        """
+        interval: CPU cycles between two checkpoints (used by attach())
+        max_checkpoints: ring size
+        max_bytes: memory budget for the page copies of all checkpoints (None: unlimited)
+        """
+        self.cpu = cpu
+        self.memory = cpu.memory
+        self.interval = interval
+        self.max_checkpoints = max_checkpoints
+        self.max_bytes = max_bytes
+        self.page_size = page_size
+
+        self.tracker = self.memory.add_dirty_tracking(
+            0x0000, self.memory.INTERNAL_SIZE - 1, page_size, private=True
+        )
+
+        # The state of the oldest restorable point:
+        self.base_cycles = cpu.cycles
+        self.base_registers = cpu.get_snapshot(ram=False)
+        self.base_ram = bytearray(self.memory.tobytes())
+
+        self.checkpoints = deque()
+        self.size = 0  # bytes of all page copies in the ring
+        self.evicted = 0
+        self.restored = 0
+
+        self.event = None  # the sync callback event, see attach()
+
+    def attach(self):
+        """ Take a checkpoint every self.interval cycles while the CPU runs """
+        if self.event is None:
+            self.event = self.cpu.add_sync_callback(self.interval, self._sync_callback)
+
+    def _sync_callback(self, cycles_since_last_call):
+        self.checkpoint()
+
+    def close(self):
+        if self.event is not None:
+            self.event.cancel()
+            self.event = None
+        self.memory.remove_dirty_tracking(self.tracker)
+
+    def __len__(self):
+        """ Number of restorable points, including the base """
+        return len(self.checkpoints) + 1
+
+    # ---------------------------------------------------------------------------
+
+    def _iter_pages(self, spans):
+        page_size = self.page_size
+        for start, end in spans:
+            yield from range(start, end + 1, page_size)
+
+    def checkpoint(self):
+        tobytes = self.memory.tobytes
+        page_size = self.page_size
+        pages = {
+            page: tobytes(page, page + page_size)
+            for page in self._iter_pages(self.tracker.collect())
+        }
+        size = page_size * len(pages)
+        self.checkpoints.append(Checkpoint(
+            cycles=self.cpu.cycles,
+            registers=self.cpu.get_snapshot(ram=False),
+            pages=pages,
+            size=size,
+        ))
+        self.size += size
+        self._evict()
+
+    def _over_budget(self):
+        if len(self.checkpoints) > self.max_checkpoints:
+            return True
+        return self.max_bytes is not None and self.size > self.max_bytes
+
+    def _evict(self):
+        checkpoints = self.checkpoints
+        while checkpoints and self._over_budget():
+            oldest = checkpoints.popleft()
+            page_size = self.page_size
+            base_ram = self.base_ram
+            for page, data in oldest.pages.items():
+                base_ram[page:page + page_size] = data
+            self.base_cycles = oldest.cycles
+            self.base_registers = oldest.registers
+            self.size -= oldest.size
+            self.evicted += 1
+
+    # ---------------------------------------------------------------------------
+
+    def get_cycles(self):
+        """ CPU cycles of all restorable points, oldest first (index 0 is the base) """
+        return [self.base_cycles] + [checkpoint.cycles for checkpoint in self.checkpoints]
+
+    def restore(self, index=-1):
+        """
+        Restore the CPU to a point from get_cycles(), e.g. -1 is the newest one.
+        All newer checkpoints are dropped.
+        """
+        count = len(self)
+        if not -count <= index < count:
+            raise IndexError(f"No rewind checkpoint {index:d} (there are {count:d})")
+        if index < 0:
+            index += count
+
+        checkpoints = self.checkpoints
+        # All pages changed after the target: from newer checkpoints and not yet collected
+        changed = set(self._iter_pages(self.tracker.collect()))
+        while len(checkpoints) > index:
+            changed.update(checkpoints.pop().pages)
+
+        load = self.memory.load
+        page_size = self.page_size
+        for checkpoint in reversed(checkpoints):
+            if not changed:
+                break
+            for page in changed.intersection(checkpoint.pages):
+                load(page, checkpoint.pages[page])
+            changed.difference_update(checkpoint.pages)
+
+        base_ram = memoryview(self.base_ram)
+        for page in changed:
+            load(page, base_ram[page:page + page_size])
+        base_ram.release()
+
+        self.tracker.collect()  # The restore itself is not a change
+        self.size = sum(checkpoint.size for checkpoint in checkpoints)
+
+        if checkpoints:
+            self.cpu.set_snapshot(checkpoints[-1].registers)
+        else:
+            self.cpu.set_snapshot(self.base_registers)
+        self.restored += 1
+
+    def rewind_cycles(self, cycles):
+        """
+        Restore the newest checkpoint that is at least 'cycles' CPU cycles old.
+        Falls back to the oldest point, if the ring doesn't reach back so far.
+        """
+        target_cycles = self.cpu.cycles - cycles
+        all_cycles = self.get_cycles()
+        for index in range(len(all_cycles) - 1, -1, -1):
+            if all_cycles[index] <= target_cycles:
+                break
+        self.restore(index)
+        return self.cpu.cycles
+
+    def get_stats(self):
+        return {
+            "checkpoints": len(self.checkpoints),
+            "bytes": self.size,
+            "evicted": self.evicted,
+            "restored": self.restored,
+        }
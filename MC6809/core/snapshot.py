@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - binary CPU snapshots
+    =============================
+
+    A snapshot is a fixed struct header with all registers and the interrupt
+    state, followed by the raw RAM bytes (optional compressed):
+
+        offset size
+        0      4    magic b"6809"
+        4      1    format version
+        5      1    flags (FLAG_*)
+        6      1    compression (COMPRESSION_*)
+        7      1    wait state (0, WAIT_SYNC or WAIT_CWAI)
+        8      10   X, Y, U, S, PC (16 bit, Big-Endian)
+        18     4    A, B, DP, CC (8 bit)
+        22     1    interrupt lines (incl. a latched NMI)
+        23     1    reserved
+        24     8    CPU cycles (64 bit)
+        32     4    size of the uncompressed RAM
+        36     ...  RAM
+
+    A snapshot taken while SYNC or CWAI waits for a interrupt is restored
+    waiting, too. The scheduled events of the CPU keep their distance to
+    the CPU cycles, e.g. a timer fires in time after a rewind. The interrupt statistics (cpu.interrupt_counts) are
+    not stored.
+
+    Without compression, creating and restoring a snapshot is only one copy
+    of the backing store: ~10 microseconds with the bytearray (the default),
+    array, mmap and numpy memory backends. The list backend needs a
+    conversion of every byte (~1 ms).
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import mmap
+import struct
+import zlib
+from collections import namedtuple
+
+
+try:
+    import lzma
+except ImportError:  # Python build without liblzma
+    lzma = None
+
+
+MAGIC = b"6809"
+VERSION = 2
+
+FLAG_RAM = 0x01  # The RAM is stored after the header
+FLAG_IRQ_ENABLED = 0x02  # cpu.irq_enabled, used by cpu.irq()
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_LZMA = 2
+COMPRESSION_NAMES = {
+    None: COMPRESSION_NONE,
+    "zlib": COMPRESSION_ZLIB,
+    "lzma": COMPRESSION_LZMA,
+}
+
+HEADER = struct.Struct(">4sBBBB5H4BBxQI")
+
+SnapshotHeader = namedtuple(
+    "SnapshotHeader",
+    "magic version flags compression wait_state x y u s pc a b dp cc interrupt_lines cycles ram_size"
+)
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def _compress(compression, data):
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compress(data)
+    elif compression == COMPRESSION_LZMA:
+        if lzma is None:
+            raise SnapshotError("lzma is not available in this Python build!")
+        return lzma.compress(data)
+    return data
+
+
+def _decompress(compression, data):
+    if compression == COMPRESSION_NONE:
+        return data
+    elif compression == COMPRESSION_ZLIB:
+        return zlib.decompress(data)
+    elif compression == COMPRESSION_LZMA:
+        if lzma is None:
+            raise SnapshotError("lzma is not available in this Python build!")
+        return lzma.decompress(data)
+    raise SnapshotError(f"Unknown snapshot compression: {compression!r}")
+
+
+def pack_snapshot(cpu, ram=True, compression=None):
+    """
+    Returns the registers (and the RAM) of 'cpu' as bytes.
+    compression: None, "zlib" or "lzma"
+    """
+    try:
+        compression = COMPRESSION_NAMES[compression]
+    except KeyError:
+        raise SnapshotError(f"Unknown snapshot compression: {compression!r}")
+
+    if ram:
+        flags = FLAG_RAM
+        ram_data = cpu.memory.tobytes()
+        ram_size = len(ram_data)
+        ram_data = _compress(compression, ram_data)
+    else:
+        flags = 0
+        ram_data = b""
+        ram_size = 0
+
+    if cpu.irq_enabled:
+        flags |= FLAG_IRQ_ENABLED
+
+    header = HEADER.pack(
+        MAGIC, VERSION, flags, compression, cpu.wait_state,
+        cpu.index_x.value, cpu.index_y.value,
+        cpu.user_stack_pointer.value, cpu.system_stack_pointer.value,
+        cpu.program_counter.value,
+        cpu.accu_a.value, cpu.accu_b.value,
+        cpu.direct_page.value, cpu.get_cc_value(),
+        cpu.interrupt_lines,
+        cpu.cycles, ram_size,
+    )
+    return header + ram_data
+
+
+def unpack_header(data):
+    """
+    >>> header = unpack_header(b"6809\\x02\\x00\\x00\\x00" + bytes(28))
+    >>> header.version, header.pc, header.cycles
+    (2, 0, 0)
+    >>> unpack_header(b"foobar")
+    Traceback (most recent call last):
+    ...
+    MC6809.core.snapshot.SnapshotError: Snapshot is too small: 6 Bytes
+    """
+    if len(data) < HEADER.size:
+        raise SnapshotError(f"Snapshot is too small: {len(data):d} Bytes")
+    header = SnapshotHeader(*HEADER.unpack_from(data))
+    if header.magic != MAGIC:
+        raise SnapshotError(f"No MC6809 snapshot (magic: {header.magic!r})")
+    if header.version != VERSION:
+        raise SnapshotError(f"Unsupported snapshot version: {header.version:d}")
+    return header
+
+
+def restore_snapshot(cpu, data):
+    """
+    Set the registers, the interrupt state (and the RAM, if stored)
+    of 'cpu' from 'data'
+    'data' may be any bytes-like object, e.g. a mmap. Returns the header.
+    """
+    data = memoryview(data)
+    header = unpack_header(data)
+
+    if header.flags & FLAG_RAM:
+        ram_data = _decompress(header.compression, data[HEADER.size:])
+        if len(ram_data) != header.ram_size:
+            raise SnapshotError(
+                f"Wrong RAM size: {len(ram_data):d} Bytes, expected: {header.ram_size:d} Bytes"
+            )
+        cpu.memory.load(address=0x0000, data=ram_data)
+
+    cpu.index_x.set(header.x)
+    cpu.index_y.set(header.y)
+    cpu.user_stack_pointer.set(header.u)
+    cpu.system_stack_pointer.set(header.s)
+    cpu.program_counter.set(header.pc)
+    cpu.accu_a.set(header.a)
+    cpu.accu_b.set(header.b)
+    cpu.direct_page.set(header.dp)
+    cpu.set_cc(header.cc)
+    cpu.scheduler.shift(header.cycles - cpu.cycles)
+    cpu.cycles = header.cycles
+
+    cpu.wait_state = header.wait_state
+    cpu.irq_enabled = bool(header.flags & FLAG_IRQ_ENABLED)
+    cpu.interrupt_lines = header.interrupt_lines
+    if header.interrupt_lines:
+        cpu.scheduler.request_poll()  # deliver them at the next instruction boundary
+    return header
+
+
+def save_snapshot(cpu, filepath, compression=None):
+    data = pack_snapshot(cpu, compression=compression)
+    with open(filepath, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def load_snapshot(cpu, filepath):
+    """
+    Restore a snapshot file. The file is mapped into memory, so a
+    uncompressed RAM will be copied only once: into the backing store.
+    """
+    with open(filepath, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            data = memoryview(mapped)
+            try:
+                return restore_snapshot(cpu, data)
+            finally:
+                data.release()
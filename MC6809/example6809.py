@@ -26,6 +26,7 @@ import string
 import time
 
 from MC6809.components.cpu6809 import CPU
+from MC6809.components.mc6809_guest_call import GuestRoutine
 from MC6809.components.memory import Memory
 from MC6809.core.configs import BaseConfig
 
@@ -44,22 +45,67 @@ class Config(BaseConfig):
     ROM_END = 0xFFFF
 
 
+# ZIP 32-bit CRC: U = start address, X = end address + 1 -> CRC in X/D
+CRC32_ROUTINE = bytes([
+    #                              0100|           .ORG  $100
+    #                              0100|    CRCHH: EQU   $ED
+    #                              0100|    CRCHL: EQU   $B8
+    #                              0100|    CRCLH: EQU   $83
+    #                              0100|    CRCLL: EQU   $20
+    #                              0100| CRCINITH: EQU   $FFFF
+    #                              0100| CRCINITL: EQU   $FFFF
+    #                              0100|                            ; CRC 32 bit in DP (4 bytes)
+    #                              0100|      CRC: EQU   $80
+    0x34, 0x10,  # 0100|           PSHS  x          ; end address +1 to TOS
+    0xCC, 0xFF, 0xFF,  # 0102|           LDD   #CRCINITL
+    0xDD, 0x82,  # 0105|           STD   crc+2
+    0x8E, 0xFF, 0xFF,  # 0107|           LDX   #CRCINITH
+    0x9F, 0x80,  # 010A|           STX   crc
+    #                              010C|                            ; d/x contains the CRC
+    #                              010C|       BL:
+    0xE8, 0xC0,  # 010C|           EORB  ,u+        ; XOR with lowest byte
+    0x10, 0x8E, 0x00, 0x08,  # 010E|           LDY   #8         ; bit counter
+    #                              0112|       RL:
+    0x1E, 0x01,  # 0112|           EXG   d,x
+    #                              0114|      RL1:
+    0x44,  # 0114|           LSRA             ; shift CRC right, beginning with high word
+    0x56,  # 0115|           RORB
+    0x1E, 0x01,  # 0116|           EXG   d,x
+    0x46,  # 0118|           RORA             ; low word
+    0x56,  # 0119|           RORB
+    0x24, 0x12,  # 011A|           BCC   cl
+    #                              011C|                            ; CRC=CRC XOR polynomic
+    0x88, 0x83,  # 011C|           EORA  #CRCLH     ; apply CRC polynomic low word
+    0xC8, 0x20,  # 011E|           EORB  #CRCLL
+    0x1E, 0x01,  # 0120|           EXG   d,x
+    0x88, 0xED,  # 0122|           EORA  #CRCHH     ; apply CRC polynomic high word
+    0xC8, 0xB8,  # 0124|           EORB  #CRCHL
+    0x31, 0x3F,  # 0126|           LEAY  -1,y       ; bit count down
+    0x26, 0xEA,  # 0128|           BNE   rl1
+    0x1E, 0x01,  # 012A|           EXG   d,x        ; CRC: restore correct order
+    0x27, 0x04,  # 012C|           BEQ   el         ; leave bit loop
+    #                              012E|       CL:
+    0x31, 0x3F,  # 012E|           LEAY  -1,y       ; bit count down
+    0x26, 0xE0,  # 0130|           BNE   rl         ; bit loop
+    #                              0132|       EL:
+    0x11, 0xA3, 0xE4,  # 0132|           CMPU  ,s         ; end address reached?
+    0x26, 0xD5,  # 0135|           BNE   bl         ; byte loop
+    0xDD, 0x82,  # 0137|           STD   crc+2      ; CRC low word
+    0x9F, 0x80,  # 0139|           STX   crc        ; CRC high word
+    0x32, 0x62,  # 013B|           LEAS  2,s        ; drop the end address
+    0x39,  # 013D|           RTS
+])
+
+
 class MC6809Example:
     def __init__(self):
         cfg = Config(CFG_DICT)
         memory = Memory(cfg)
         self.cpu = CPU(memory, cfg)
+        self.cpu.system_stack_pointer.set(0x4000)
 
-    def cpu_test_run(self, start, end, mem):
-        assert isinstance(mem, bytearray), "given mem is not a bytearray!"
-
-        print("memory load at $%x: %s", start,
-              ", ".join("$%x" % i for i in mem)
-              )
-        self.cpu.memory.load(start, mem)
-        if end is None:
-            end = start + len(mem)
-        self.cpu.test_run(start, end)
+        # Load the routine once, call it like a Python function:
+        self.crc32_routine = GuestRoutine(self.cpu, address=0x0100, code=CRC32_ROUTINE)
 
     def crc32(self, data):
         """
@@ -68,61 +114,11 @@ class MC6809Example:
         """
         data_address = 0x1000  # position of the test data
         self.cpu.memory.load(data_address, data)  # write test data into RAM
-        self.cpu.index_x.set(data_address + len(data))  # end address
-        addr_hi, addr_lo = divmod(data_address, 0x100)  # start address
-
-        self.cpu_test_run(start=0x0100, end=None, mem=bytearray([
-            #                              0100|           .ORG  $100
-            0x10, 0xCE, 0x40, 0x00,  # 0100|           LDS   #$4000
-            #                              0104|    CRCHH: EQU   $ED
-            #                              0104|    CRCHL: EQU   $B8
-            #                              0104|    CRCLH: EQU   $83
-            #                              0104|    CRCLL: EQU   $20
-            #                              0104| CRCINITH: EQU   $FFFF
-            #                              0104| CRCINITL: EQU   $FFFF
-            #                              0104|                            ; CRC 32 bit in DP (4 bytes)
-            #                              0104|      CRC: EQU   $80
-            0xCE, addr_hi, addr_lo,  # 0104|           LDU   #....      ; start address in u
-            0x34, 0x10,  # 010C|           PSHS  x          ; end address +1 to TOS
-            0xCC, 0xFF, 0xFF,  # 010E|           LDD   #CRCINITL
-            0xDD, 0x82,  # 0111|           STD   crc+2
-            0x8E, 0xFF, 0xFF,  # 0113|           LDX   #CRCINITH
-            0x9F, 0x80,  # 0116|           STX   crc
-            #                              0118|                            ; d/x contains the CRC
-            #                              0118|       BL:
-            0xE8, 0xC0,  # 0118|           EORB  ,u+        ; XOR with lowest byte
-            0x10, 0x8E, 0x00, 0x08,  # 011A|           LDY   #8         ; bit counter
-            #                              011E|       RL:
-            0x1E, 0x01,  # 011E|           EXG   d,x
-            #                              0120|      RL1:
-            0x44,  # 0120|           LSRA             ; shift CRC right, beginning with high word
-            0x56,  # 0121|           RORB
-            0x1E, 0x01,  # 0122|           EXG   d,x
-            0x46,  # 0124|           RORA             ; low word
-            0x56,  # 0125|           RORB
-            0x24, 0x12,  # 0126|           BCC   cl
-            #                              0128|                            ; CRC=CRC XOR polynomic
-            0x88, 0x83,  # 0128|           EORA  #CRCLH     ; apply CRC polynomic low word
-            0xC8, 0x20,  # 012A|           EORB  #CRCLL
-            0x1E, 0x01,  # 012C|           EXG   d,x
-            0x88, 0xED,  # 012E|           EORA  #CRCHH     ; apply CRC polynomic high word
-            0xC8, 0xB8,  # 0130|           EORB  #CRCHL
-            0x31, 0x3F,  # 0132|           LEAY  -1,y       ; bit count down
-            0x26, 0xEA,  # 0134|           BNE   rl1
-            0x1E, 0x01,  # 0136|           EXG   d,x        ; CRC: restore correct order
-            0x27, 0x04,  # 0138|           BEQ   el         ; leave bit loop
-            #                              013A|       CL:
-            0x31, 0x3F,  # 013A|           LEAY  -1,y       ; bit count down
-            0x26, 0xE0,  # 013C|           BNE   rl         ; bit loop
-            #                              013E|       EL:
-            0x11, 0xA3, 0xE4,  # 013E|           CMPU  ,s         ; end address reached?
-            0x26, 0xD5,  # 0141|           BNE   bl         ; byte loop
-            0xDD, 0x82,  # 0143|           STD   crc+2      ; CRC low word
-            0x9F, 0x80,  # 0145|           STX   crc        ; CRC high word
-        ]))
-        d = self.cpu.accu_d.value
-        x = self.cpu.index_x.value
-        crc32 = x * 0x10000 + d
+        registers = self.crc32_routine({
+            "U": data_address,  # start address
+            "X": data_address + len(data),  # end address
+        })
+        crc32 = registers.x * 0x10000 + registers.d
         return crc32 ^ 0xFFFFFFFF
 
     def compare_crc32(self, data):
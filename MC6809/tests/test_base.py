@@ -147,8 +147,7 @@ def print_cpu_state_data(state):
     print(f"cpu state data {state.__class__.__name__!r} (ID:{id(state):d}):")
     for k, v in sorted(state.items()):
         if k == "RAM":
-            # v = ",".join(["$%x" % i for i in v])
-            print("\tSHA from RAM:", hashlib.sha224(repr(v)).hexdigest())
+            print("\tSHA from RAM:", hashlib.sha224(v).hexdigest())
             continue
         if isinstance(v, int):
             v = f"${v:x}"
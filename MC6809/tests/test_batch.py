@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import json
+import pathlib
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from MC6809.cli import cli
+from MC6809.core import batch
+from MC6809.core.batch import BatchRunner, iter_jobs
+from MC6809.tests.test_jobs import FILL_PROGRAM, get_fill_job
+
+
+SETUP_JOB = {"load": [{"address": 0x1000, "data": FILL_PROGRAM}]}
+
+
+def get_job(value):
+    return {
+        "registers": {"A": value},
+        "start": 0x1000,
+        "end": 0x100a,
+        "dump": [[0x0400, 0x0411]],
+    }
+
+
+class BatchRunnerTestCase(unittest.TestCase):
+    def test_run(self):
+        runner = BatchRunner(workers=2, setup_job=SETUP_JOB, chunk_size=3)
+        jobs = [get_job(value) for value in range(20)]
+        jobs.insert(5, {"foo": "bar"})  # a invalid job
+        jobs.insert(10, {"start": 0x1000, "dump": [[0x0400, 0x0401]]})  # only dump: memory is clean
+        results = list(runner.run(iter(jobs)))
+
+        self.assertEqual(sorted(result["index"] for result in results), list(range(22)))
+        results = {result["index"]: result for result in results}
+        self.assertIn("Unknown job keys: foo", results[5]["error"])
+        self.assertEqual(results[10]["dump"], [{"address": 0x0400, "data": "0000"}])
+        self.assertEqual(results[21]["dump"][0]["data"], "13" * 0x10 + "0000")
+        for index, result in results.items():
+            if index not in (5, 10):
+                self.assertEqual(result["stopped"], "end")
+
+        stats = runner.get_stats()
+        self.assertEqual(stats["jobs"], 22)
+        self.assertEqual(stats["errors"], 1)
+        self.assertLessEqual(stats["workers"], 2)
+        self.assertGreater(stats["jobs_per_sec"], 0)
+        self.assertEqual(stats["cycles_min"], 0)
+        self.assertEqual(stats["cycles_max"], results[0]["cycles"])
+
+    def test_worker_state(self):
+        self.addCleanup(setattr, batch, "_worker_state", batch._worker_state)
+        batch._worker_state = None
+        results = batch._run_chunk(SETUP_JOB, [(0, get_job(1))])
+        self.assertEqual(results[0]["stopped"], "end")
+        cpu, snapshot = batch._get_worker_state(SETUP_JOB)
+
+        batch._run_chunk(SETUP_JOB, [(1, get_job(2))])
+        self.assertIs(batch._get_worker_state(SETUP_JOB)[0], cpu)  # created only once
+
+        results = batch._run_chunk(None, [(2, get_job(3))])  # a other setup: a new machine
+        self.assertIsNot(batch._get_worker_state(None)[0], cpu)
+        self.assertEqual(results[0]["dump"][0]["data"], "00" * 0x12)  # no fill program loaded
+
+    def test_iter_jobs(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_path = pathlib.Path(temp_dir)
+            jobs_file = temp_path / "jobs.jsonl"
+            jobs_file.write_text("\n".join(json.dumps(get_job(value)) for value in range(3)) + "\n\n")
+            self.assertEqual(list(iter_jobs(str(jobs_file))), [get_job(value) for value in range(3)])
+
+            jobs_dir = temp_path / "jobs"
+            jobs_dir.mkdir()
+            for value in (2, 1):
+                (jobs_dir / f"job{value:d}.json").write_text(json.dumps(get_job(value)))
+            self.assertEqual(list(iter_jobs(str(jobs_dir))), [get_job(1), get_job(2)])
+
+    def test_invalid_json(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            jobs_file = pathlib.Path(temp_dir, "jobs.jsonl")
+            jobs_file.write_text(
+                json.dumps(get_job(1)) + "\n" + '{"start": 4096, ' + "\n" + json.dumps(get_job(2)) + "\n"
+            )
+            runner = BatchRunner(workers=1, setup_job=SETUP_JOB)
+            results = list(runner.run(iter_jobs(str(jobs_file))))
+
+        results = {result["index"]: result for result in results}
+        self.assertEqual(sorted(results), [0, 1, 2])
+        self.assertIn("JobError: Invalid JSON in line 2:", results[1]["error"])
+        self.assertEqual(results[0]["stopped"], "end")
+        self.assertEqual(results[2]["stopped"], "end")
+        self.assertEqual(runner.get_stats()["errors"], 1)
+
+
+class BatchCLITestCase(unittest.TestCase):
+    def test_batch(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            jobs_path = pathlib.Path(temp_dir, "jobs.jsonl")
+            results_path = pathlib.Path(temp_dir, "results.jsonl")
+            jobs_path.write_text("".join(json.dumps(get_fill_job(value)) + "\n" for value in range(5)))
+            result = CliRunner().invoke(
+                cli, ["batch", str(jobs_path), "--workers", "2", "--output", str(results_path)]
+            )
+            self.assertEqual(result.exit_code, 0, msg=f"{result.output}\n{result.exception!r}")
+            results = [json.loads(line) for line in results_path.read_text().splitlines()]
+
+        self.assertEqual(sorted(result["index"] for result in results), list(range(5)))
+        self.assertIn("5 jobs (0 errors)", result.output)
+        self.assertIn("jobs/sec", result.output)
+        self.assertIn("CPU cycles per job: min", result.output)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import unittest
+
+from MC6809.components.mc6809_tools import BurstController
+from MC6809.tests.test_base import BaseCPUTestCase
+
+
+class BurstControllerTestCase(unittest.TestCase):
+    def _run(self, controller, runs, ops_per_sec, overhead=0.0):
+        if controller.history:
+            outer, inner = controller.history[-1].outer, controller.history[-1].inner
+        else:
+            outer, inner = controller.split(1000)
+        durations = []
+        for __ in range(runs):
+            ops = outer * inner
+            duration = ops / ops_per_sec + overhead
+            durations.append(duration)
+            outer, inner = controller.update(ops, duration)
+        return durations
+
+    def test_load_change(self):
+        controller = BurstController(target_time=0.02)
+        durations = self._run(controller, runs=20, ops_per_sec=100000)
+        self.assertAlmostEqual(durations[-1], 0.02, delta=0.0005)
+
+        # The machine gets 4 times slower, e.g. a other process needs the CPU:
+        durations = self._run(controller, runs=20, ops_per_sec=25000)
+        self.assertGreater(durations[0], 0.05)
+        self.assertAlmostEqual(durations[-1], 0.02, delta=0.0005)
+        for previous, duration in zip(durations[5:], durations[6:]):  # no oscillation
+            self.assertLess(abs(duration - 0.02), abs(previous - 0.02) + 0.0005)
+
+    def test_overhead(self):
+        controller = BurstController(target_time=0.01)
+        durations = self._run(controller, runs=30, ops_per_sec=200000, overhead=0.004)
+        self.assertAlmostEqual(durations[-1], 0.01, delta=0.0002)
+        stats = controller.get_stats()
+        self.assertEqual(stats["runs"], 30)
+        self.assertEqual(stats["target_time"], 0.01)
+        self.assertLess(stats["integral"], 0)  # the offset is removed by the integral
+
+    def test_limits(self):
+        controller = BurstController(target_time=1.0, min_ops=50, max_ops=5000)
+        self.assertEqual(controller.update(ops=1000, duration=0.001), (50, 100))
+        controller = BurstController(target_time=0.001, min_ops=50, max_ops=5000)
+        self.assertEqual(controller.update(ops=1000, duration=1.0), (1, 50))
+        self.assertEqual(controller.update(ops=50, duration=0), (1, 100))
+
+
+class CPURunTestCase(BaseCPUTestCase):
+    def test_run(self):
+        self.cpu.memory.load(0x4000, [
+            0x30, 0x01,  # 4000 LEAX 1,X
+            0x20, 0xFC,  # 4002 BRA $4000
+        ])
+        self.cpu.program_counter.set(0x4000)
+        for __ in range(20):
+            self.cpu.run(max_run_time=0.005)
+        stats = self.cpu.burst_controller.get_stats()
+        self.assertEqual(stats["runs"], 20)
+        self.assertLess(stats["last_duration"], 0.05)
+        self.assertEqual(
+            (self.cpu.outer_burst_op_count, self.cpu.inner_burst_op_count),
+            (stats["outer"], stats["inner"]),
+        )
@@ -56,7 +56,9 @@ class CLITestCase(unittest.TestCase):
         self.assert_contains_members([
             "cli [OPTIONS] COMMAND [ARGS]...",
             "Commands:",
+            "batch ", " Run emulation jobs",
             "benchmark ", " Run a MC6809 emulation benchmark",
+            "memory-benchmark ", " Compare the speed of the memory backing stores",
             "profile ", " Profile the MC6809 emulation benchmark",
         ], result.output)
 
@@ -91,6 +93,14 @@ class CLITestCase(unittest.TestCase):
         errors = ["Error", "Traceback"]
         self.assert_not_contains_members(errors, result.output)
 
+    def test_run_memory_benchmark(self):
+        result = self._invoke("memory-benchmark", "--loops", "1")
+        self.assert_contains_members([
+            "Memory backend benchmark with 1 loops",
+            "list ", "array ", "bytearray ",
+            "Fastest backend: ",
+        ], result.output)
+
     def test_run_profile(self):
         result = self._invoke("profile", "--loops", "1", "--multiply", "1")
         self.assert_contains_members([
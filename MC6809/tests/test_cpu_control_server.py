@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+from MC6809.core.cpu_control_server import read_memory, write_memory
+from MC6809.tests.test_base import BaseCPUTestCase
+
+
+class ControlServerMemoryTestCase(BaseCPUTestCase):
+    def test_read_memory(self):
+        self.cpu.memory.load(0x0400, b"\x01\x02\x03")
+        self.cpu.memory.add_read_byte_callback(lambda cycles, last_op_address, address: 0xAA, 0x0401)
+        self.assertEqual(read_memory(self.cpu, 0x0400, 0x0402), b"\x01\xAA\x03")
+
+    def test_write_memory(self):
+        written = []
+        self.cpu.memory.add_write_byte_callback(
+            lambda cycles, last_op_address, address, value: written.append((address, value)), 0x0401
+        )
+        write_memory(self.cpu, 0x0400, 0x0402, [0x01, 0x02, 0x03, 0x04])  # the 4th byte is after 'end'
+        self.assertEqual(written, [(0x0401, 0x02)])
+        self.assertEqual(self.cpu.memory.tobytes(0x0400, 0x0404), b"\x01\x00\x03\x00")
+
+    def test_write_memory_rom(self):
+        write_memory(self.cpu, 0x7FFF, 0x8000, b"\x01\x02")
+        self.assertEqual(self.cpu.memory.tobytes(0x7FFF, 0x8001), b"\x01\x00")  # ROM is protected
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import unittest
+
+from MC6809.components.cpu6809 import CPU
+from MC6809.components.memory import Memory
+from MC6809.core.cpu_thread import CPUThread, CPUThreadStopped
+from MC6809.tests import test_config
+from MC6809.tests.test_base import BaseCPUTestCase
+
+
+COUNTER_PROGRAM = [
+    0x30, 0x01,  # 4000 LEAX 1,X
+    0x20, 0xFC,  # 4002 BRA $4000
+]
+TIMEOUT = 10
+
+
+class CPUThreadTestCase(unittest.TestCase):
+    def setUp(self):
+        cfg = test_config.TestCfg(BaseCPUTestCase.UNITTEST_CFG_DICT)
+        self.cpu = CPU(Memory(cfg), cfg)
+        self.cpu.memory.load(0x4000, COUNTER_PROGRAM)
+        self.cpu.program_counter.set(0x4000)
+        self.cpu.running = True
+        self.cpu_thread = CPUThread(self.cpu, slice_cycles=1000)
+        self.cpu_thread.start()
+
+    def tearDown(self):
+        self.cpu_thread.stop(timeout=TIMEOUT)
+        self.assertFalse(self.cpu_thread.is_alive())
+        self.assertIsNone(self.cpu_thread.error)
+
+    def test_pause_resume(self):
+        self.cpu_thread.pause().result(TIMEOUT)
+        self.assertTrue(self.cpu_thread.wait_paused(0))
+        cycles = self.cpu.cycles
+        registers = self.cpu_thread.get_registers().result(TIMEOUT)
+        self.assertEqual(self.cpu_thread.get_registers().result(TIMEOUT), registers)
+        self.assertEqual(self.cpu.cycles, cycles)
+        self.assertIn(registers["PC"], (0x4000, 0x4002))
+
+        self.cpu_thread.resume().result(TIMEOUT)
+        self.cpu_thread.pause().result(TIMEOUT)
+        self.assertGreater(self.cpu.cycles, cycles)
+
+    def test_step(self):
+        self.cpu_thread.pause().result(TIMEOUT)
+        self.cpu_thread.execute(self.cpu.program_counter.set, 0x4000).result(TIMEOUT)
+        x = self.cpu.index_x.value
+        registers = self.cpu_thread.step(4).result(TIMEOUT)
+        self.assertEqual(registers["X"], (x + 2) & 0xffff)
+        self.assertEqual(registers["PC"], 0x4000)
+
+        self.cpu_thread.resume().result(TIMEOUT)
+        with self.assertRaises(RuntimeError):
+            self.cpu_thread.step(1).result(TIMEOUT)
+
+    def test_read_write(self):
+        self.cpu_thread.write(0x0400, b"\x01\x02\x03").result(TIMEOUT)
+        self.assertEqual(self.cpu_thread.read(0x0400, 0x0402).result(TIMEOUT), b"\x01\x02\x03")
+
+    def test_snapshot(self):
+        self.cpu_thread.pause().result(TIMEOUT)
+        data = self.cpu_thread.snapshot().result(TIMEOUT)
+        x = self.cpu.index_x.value
+        self.cpu_thread.step(20).result(TIMEOUT)
+        self.assertNotEqual(self.cpu.index_x.value, x)
+        self.cpu_thread.restore(data).result(TIMEOUT)
+        self.assertEqual(self.cpu.index_x.value, x)
+
+    def test_breakpoint(self):
+        cpu_thread = self.cpu_thread
+        cpu_thread.add_breakpoint(0x4002).result(TIMEOUT)
+        self.assertTrue(cpu_thread.wait_paused(TIMEOUT))
+        self.assertEqual(cpu_thread.last_breakpoint, 0x4002)
+        self.assertEqual(self.cpu.program_counter.value, 0x4002)  # stopped before the BRA
+        x = self.cpu.index_x.value
+
+        # resume skips the breakpoint once, the next loop stops again:
+        cpu_thread.resume().result(TIMEOUT)
+        self.assertTrue(cpu_thread.wait_paused(TIMEOUT))
+        self.assertEqual(cpu_thread.breakpoint_hits, 2)
+        self.assertEqual(self.cpu.index_x.value, (x + 1) & 0xffff)
+
+        registers = cpu_thread.step(3).result(TIMEOUT)  # BRA, LEAX and stop at the breakpoint
+        self.assertEqual(registers["PC"], 0x4002)
+        self.assertEqual(registers["X"], (x + 2) & 0xffff)
+        self.assertEqual(cpu_thread.breakpoint_hits, 3)
+
+        # the memory can be read normally
+        self.assertEqual(cpu_thread.read(0x4000, 0x4003).result(TIMEOUT), bytes(COUNTER_PROGRAM))
+
+        cpu_thread.remove_breakpoint(0x4002).result(TIMEOUT)
+        self.assertNotIn(0x4002, self.cpu.memory._read_byte_callbacks)
+        cpu_thread.resume().result(TIMEOUT)
+        cpu_thread.pause().result(TIMEOUT)
+        self.assertEqual(cpu_thread.breakpoint_hits, 3)
+
+    def test_breakpoint_on_operand(self):
+        cpu_thread = self.cpu_thread
+        cpu_thread.add_breakpoint(0x4001).result(TIMEOUT)  # the post byte of LEAX
+        cpu_thread.pause().result(TIMEOUT)
+        registers = cpu_thread.step(10).result(TIMEOUT)
+        self.assertEqual(cpu_thread.breakpoint_hits, 0)
+        self.assertIn(registers["PC"], (0x4000, 0x4002))  # only complete instructions
+
+    def test_stop(self):
+        self.cpu_thread.stop(timeout=TIMEOUT)
+        self.assertFalse(self.cpu_thread.is_alive())
+        with self.assertRaises(CPUThreadStopped):
+            self.cpu_thread.read(0, 1).result(TIMEOUT)
+
+    def test_command_error(self):
+        def fail():
+            raise ValueError("Boom")
+        with self.assertRaises(ValueError):
+            self.cpu_thread.execute(fail).result(TIMEOUT)
+        self.assertTrue(self.cpu_thread.is_alive())
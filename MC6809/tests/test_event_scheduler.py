@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import unittest
+
+from MC6809.components.event_scheduler import NEVER, EventScheduler
+from MC6809.tests.test_base import BaseCPUTestCase
+
+
+LOOP_PROGRAM = [
+    0x7C, 0x04, 0x00,  # 4000 INC $0400
+    0x30, 0x01,  # 4003 LEAX 1,X
+    0x20, 0xF9,  # 4005 BRA $4000
+]
+MAX_OP_CYCLES = 20  # incl. the cycles of the memory accesses
+
+
+class EventSchedulerTestCase(unittest.TestCase):
+    def test_order(self):
+        scheduler = EventScheduler()
+        calls = []
+        for due in (30, 10, 20, 10):
+            scheduler.schedule(due, lambda cycles, due=due: calls.append(due))
+        self.assertEqual(len(scheduler), 4)
+        scheduler.dispatch(25)
+        self.assertEqual(calls, [10, 10, 20])
+        self.assertEqual(scheduler.next_due, 30)
+
+    def test_cancel(self):
+        scheduler = EventScheduler()
+        calls = []
+        first = scheduler.schedule(10, calls.append)
+        second = scheduler.schedule(20, calls.append, period=10)
+        first.cancel()
+        self.assertEqual(scheduler.next_due, 20)
+        scheduler.dispatch(40)
+        self.assertEqual(calls, [40])
+        self.assertEqual(scheduler.next_due, 50)
+        second.cancel()
+        self.assertEqual(scheduler.next_due, NEVER)
+        self.assertEqual(len(scheduler), 0)
+
+    def test_periodic_catch_up(self):
+        scheduler = EventScheduler()
+        calls = []
+        event = scheduler.schedule(10, calls.append, period=10)
+        scheduler.dispatch(30)  # due at 10, 20 and 30: called once
+        self.assertEqual(calls, [30])
+        self.assertEqual(event.due, 40)
+        scheduler.dispatch(10**9 + 5)  # skips all missed periods in one step
+        self.assertEqual(calls, [30, 10**9 + 5])
+        self.assertEqual(event.due, 10**9 + 10)
+        self.assertEqual(scheduler.dispatched, 2)
+
+    def test_cancel_in_callback(self):
+        scheduler = EventScheduler()
+        calls = []
+
+        def callback(cycles):
+            calls.append(cycles)
+            event.cancel()
+
+        event = scheduler.schedule(10, callback, period=10)
+        scheduler.dispatch(100)
+        self.assertEqual(calls, [100])
+
+    def test_shift(self):
+        scheduler = EventScheduler()
+        calls = []
+        scheduler.schedule(100, calls.append)
+        event = scheduler.schedule(50, calls.append, period=50)
+        scheduler.schedule(70, calls.append).cancel()
+        scheduler.shift(-40)
+        self.assertEqual(scheduler.next_due, 10)
+        self.assertEqual(len(scheduler), 2)
+        scheduler.dispatch(60)
+        self.assertEqual(calls, [60, 60])  # periodic (10 and 60 caught up) and once at 60
+        self.assertEqual(event.due, 110)
+
+    def test_invalid_period(self):
+        with self.assertRaises(ValueError):
+            EventScheduler().schedule(10, print, period=0)
+
+
+class CPUEventTestCase(BaseCPUTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cpu.memory.load(0x4000, LOOP_PROGRAM)
+        self.cpu.program_counter.set(0x4000)
+        self.cpu.outer_burst_op_count = 10
+
+    def test_one_shot(self):
+        calls = []
+        self.cpu.schedule_event(101, lambda cycles: calls.append((cycles, self.cpu.cycles)))
+        self.cpu.burst_run()
+        self.assertEqual(len(calls), 1)
+        cycles, cpu_cycles = calls[0]
+        self.assertEqual(cycles, cpu_cycles)
+        self.assertGreaterEqual(cycles, 101)
+        self.assertLess(cycles, 101 + MAX_OP_CYCLES)  # at the next instruction boundary
+
+    def test_periodic(self):
+        calls = []
+        event = self.cpu.schedule_event(100, calls.append, period=100)
+        self.cpu.burst_run()
+        self.assertEqual(len(calls), self.cpu.cycles // 100)
+        for number, cycles in enumerate(calls, start=1):
+            self.assertGreaterEqual(cycles, number * 100)
+            self.assertLess(cycles, number * 100 + MAX_OP_CYCLES)
+
+        event.cancel()
+        self.cpu.burst_run()
+        self.assertEqual(len(calls), self.cpu.cycles // 200)
+
+    def test_sync_callback(self):
+        calls = []
+        event = self.cpu.add_sync_callback(250, calls.append)
+        self.cpu.burst_run()
+        self.assertGreater(len(calls), 5)
+        for cycles_since_last_call in calls:
+            self.assertGreater(cycles_since_last_call, 250 - MAX_OP_CYCLES)
+            self.assertLess(cycles_since_last_call, 250 + MAX_OP_CYCLES)
+
+        # periodic without drift:
+        self.assertEqual(len(calls), self.cpu.cycles // 250)
+        self.assertGreaterEqual(sum(calls), len(calls) * 250)
+        self.assertLess(sum(calls), len(calls) * 250 + MAX_OP_CYCLES)
+
+        # The returned event stays valid:
+        self.assertEqual(len(self.cpu.scheduler), 1)
+        event.cancel()
+        call_count = len(calls)
+        self.cpu.burst_run()
+        self.assertEqual(len(calls), call_count)
+        self.assertEqual(len(self.cpu.scheduler), 0)
+
+    def test_many_events(self):
+        calls = []
+        for number in range(1000):
+            self.cpu.schedule_event(1000000 + number, calls.append)
+        self.cpu.burst_run()
+        self.assertEqual(calls, [])
+        self.assertEqual(len(self.cpu.scheduler), 1000)
+
+
+class CPURunTestCase(BaseCPUTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cpu.memory.load(0x4000, LOOP_PROGRAM)
+        self.cpu.program_counter.set(0x4000)
+
+    def test_step(self):
+        cycles = self.cpu.step(3)
+        self.assertEqual(cycles, self.cpu.cycles)
+        self.assertEqual(self.cpu.index_x.value, 1)
+        self.assertEqualHex(self.cpu.program_counter.value, 0x4000)
+        self.cpu.step()
+        self.assertEqualHex(self.cpu.program_counter.value, 0x4003)
+
+    def test_run_for_cycles(self):
+        cycles = self.cpu.run_for_cycles(14914)
+        self.assertEqual(cycles, self.cpu.cycles)
+        self.assertGreaterEqual(cycles, 14914)
+        self.assertLess(cycles, 14914 + MAX_OP_CYCLES)
+        self.assertEqual(len(self.cpu.scheduler), 0)  # the end event is removed
+
+        self.assertEqual(self.cpu.run_for_cycles(0), 0)
+
+    def test_run_until_cycles(self):
+        for frame in range(1, 6):
+            self.cpu.run_until(frame * 1000)
+            self.assertGreaterEqual(self.cpu.cycles, frame * 1000)
+            self.assertLess(self.cpu.cycles, frame * 1000 + MAX_OP_CYCLES)  # no drift
+
+        self.assertEqual(self.cpu.run_until(0), 0)  # already reached
+
+    def test_run_until_max_cycles(self):
+        cycles = self.cpu.run_until(100000, max_cycles=500)
+        self.assertGreaterEqual(cycles, 500)
+        self.assertLess(cycles, 500 + MAX_OP_CYCLES)
+
+    def test_run_until_predicate(self):
+        x = self.cpu.index_x
+        self.cpu.run_until(lambda: x.value == 10)
+        self.assertEqual(x.value, 10)
+        self.assertEqualHex(self.cpu.program_counter.value, 0x4005)
+
+        cycles = self.cpu.run_until(lambda: False, max_cycles=100)
+        self.assertGreaterEqual(cycles, 100)
+        self.assertLess(cycles, 100 + MAX_OP_CYCLES)
+
+    def test_events_in_run(self):
+        calls = []
+        self.cpu.schedule_event(100, calls.append, period=100)
+        self.cpu.run_for_cycles(1000)
+        self.assertEqual(len(calls), 10)
+        self.cpu.step(100)
+        self.cpu.run_until(lambda: len(calls) == 20)
+        self.assertGreaterEqual(self.cpu.cycles, 2000)
+        self.assertLess(self.cpu.cycles, 2000 + MAX_OP_CYCLES)
+
+    def test_event_scheduled_in_run(self):
+        calls = []
+
+        def callback(cycles):
+            calls.append(cycles)
+            self.cpu.schedule_event(10, calls.append)
+
+        self.cpu.schedule_event(100, callback)
+        self.cpu.run_for_cycles(1000)
+        self.assertEqual(len(calls), 2)
+        self.assertGreaterEqual(calls[1], calls[0] + 10)
+        self.assertLess(calls[1], calls[0] + 10 + MAX_OP_CYCLES)
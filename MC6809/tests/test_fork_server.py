@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+from MC6809.core.jobs import run_job
+from MC6809.tests.test_base import BaseCPUTestCase
+from MC6809.tests.test_jobs import FILL_PROGRAM, get_fill_job
+
+
+@unittest.skipUnless(hasattr(os, "fork") and hasattr(socket, "AF_UNIX"), "Needs os.fork and Unix sockets")
+class ForkServerTestCase(BaseCPUTestCase):
+    def setUp(self):
+        from MC6809.core.fork_server import ForkServer  # POSIX only
+
+        super().setUp()
+        # "Boot" the machine: load the program and set a marker
+        run_job(self.cpu, {
+            "load": [{"address": 0x1000, "data": FILL_PROGRAM}, {"address": 0x0400, "data": "ff"}],
+        })
+        self.boot_cycles = self.cpu.cycles
+
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="MC6809_")
+        self.socket_path = os.path.join(self.temp_dir.name, "fork_server.sock")
+        self.server = ForkServer(self.socket_path, self.cpu)
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05})
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def test_jobs(self):
+        from MC6809.core.fork_server import submit_job
+
+        for value in (0x01, 0x02):
+            job = {"registers": {"A": value}, "start": 0x1000, "end": 0x100a, "dump": [[0x0400, 0x0400]]}
+            result = submit_job(self.socket_path, job, timeout=10)
+            self.assertEqual(result["dump"], [{"address": 0x0400, "data": f"{value:02x}"}])
+
+        # The parked machine is unchanged:
+        self.assertEqual(self.cpu.memory.tobytes(0x0400, 0x0401), b"\xff")
+        self.assertEqual(self.cpu.cycles, self.boot_cycles)
+        self.assertEqual(self.server.jobs_started, 2)
+
+    def test_parallel_jobs(self):
+        from MC6809.core.fork_server import submit_job
+
+        results = {}
+
+        def submit(value):
+            results[value] = submit_job(self.socket_path, get_fill_job(value), timeout=10)
+
+        threads = [threading.Thread(target=submit, args=(value,)) for value in range(1, 5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for value, result in results.items():
+            self.assertEqual(result["dump"][0]["data"], f"{value:02x}" * 0x10 + "0000")
+
+    def test_job_error(self):
+        from MC6809.core.fork_server import submit_job
+
+        with self.assertRaisesRegex(RuntimeError, "JobError: Unknown job keys: foo"):
+            submit_job(self.socket_path, {"foo": 1}, timeout=10)
+
+    def test_existing_socket_path(self):
+        from MC6809.core.fork_server import ForkServer
+
+        stale_path = os.path.join(self.temp_dir.name, "stale.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(stale_path)  # the socket file is left over after close
+        server = ForkServer(stale_path, self.cpu)
+        server.server_close()
+        self.assertFalse(os.path.exists(stale_path))
+
+        file_path = os.path.join(self.temp_dir.name, "no.sock")
+        with open(file_path, "w") as f:
+            f.write("foo")
+        with self.assertRaisesRegex(FileExistsError, "exists and is not a socket"):
+            ForkServer(file_path, self.cpu)
+        with open(file_path) as f:
+            self.assertEqual(f.read(), "foo")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import binascii
+
+from MC6809.components.mc6809_guest_call import GUEST_RETURN_ADDRESS, GuestRoutine, MemoizedRoutine
+from MC6809.example6809 import CRC32_ROUTINE
+from MC6809.tests.test_base import BaseCPUTestCase
+
+
+CRC16_ROUTINE = [
+    # U = data address, X = number of bytes, D = 0 -> CRC16 in D
+    0xA8, 0xC0,  # BL: EORA  ,u+  ; fetch byte and XOR into CRC high byte
+    0x10, 0x8E, 0x00, 0x08,  # LDY   #8  ; rotate loop counter
+    0x58,  # RL: ASLB  ; shift CRC left, first low
+    0x49,  # ROLA  ; and than high byte
+    0x24, 0x04,  # BCC   cl  ; Justify or ...
+    0x88, 0x10,  # EORA  #CRCH  ; CRC=CRC XOR polynomic, high
+    0xC8, 0x21,  # EORB  #CRCL  ; and low byte
+    0x31, 0x3F,  # CL: LEAY  -1,y  ; shift loop (8 bits)
+    0x26, 0xF4,  # BNE   rl
+    0x30, 0x1F,  # LEAX  -1,x  ; byte loop
+    0x26, 0xEA,  # BNE   bl
+    0x39,  # RTS
+]
+
+
+class GuestCallTestCase(BaseCPUTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cpu.system_stack_pointer.set(0x4000)
+        self.crc16 = GuestRoutine(self.cpu, address=0x0100, code=CRC16_ROUTINE)
+
+    def _crc16(self, data):
+        self.cpu.memory.load(0x1000, data)
+        return self.crc16({"U": 0x1000, "X": len(data), "D": 0}).d
+
+    def test_crc16(self):
+        self.assertEqualHexWord(self._crc16(b"Z"), 0xfbbf)
+        self.assertEqualHexWord(self._crc16(b"DragonPy works?!?"), 0xA30D)
+
+    def test_crc32(self):
+        GuestRoutine(self.cpu, address=0x0200, code=CRC32_ROUTINE)
+        for data in (b"a09", b"DragonPy test!"):
+            self.cpu.memory.load(0x1000, data)
+            registers = self.cpu.call(0x0200, {"U": 0x1000, "X": 0x1000 + len(data)})
+            crc32 = (registers.x * 0x10000 + registers.d) ^ 0xFFFFFFFF
+            self.assertEqual(crc32, binascii.crc32(data))
+
+    def test_registers(self):
+        self.cpu.program_counter.set(0x1234)
+        registers = self.crc16({"U": 0x1000, "X": 1, "D": 0, "DP": 0x12})
+        self.assertEqualHexWord(registers.u, 0x1001)
+        self.assertEqualHexWord(registers.x, 0x0000)
+        self.assertEqualHexWord(registers.s, 0x4000)  # balanced stack
+        self.assertEqualHexByte(registers.dp, 0x12)
+        self.assertEqualHexWord(self.cpu.program_counter.value, 0x1234)  # restored
+        self.assertNotIn(GUEST_RETURN_ADDRESS, self.cpu.memory._read_byte_callbacks)
+
+    def test_cycles(self):
+        self.cpu.memory.load(0x1000, b"Z")
+        self.cpu.cycles = 0
+        self.crc16({"U": 0x1000, "X": 1, "D": 0})
+        call_cycles = self.cpu.cycles
+
+        self.cpu.cycles = 0
+        self.cpu.user_stack_pointer.set(0x1000)
+        self.cpu.index_x.set(1)
+        self.cpu.accu_d.set(0)
+        self.cpu_test_run(start=0x0100, end=0x0100 + len(CRC16_ROUTINE) - 1, mem=CRC16_ROUTINE)
+        # push the return address + fetch RTS + pull the return address + RTS cycles
+        self.assertEqual(call_cycles - self.cpu.cycles, 2 + 1 + 2 + 5)
+
+    def test_max_cycles(self):
+        GuestRoutine(self.cpu, address=0x0300, code=[0x20, 0xFE])  # BRA *
+        self.cpu.system_stack_pointer.set(0x4000)
+        self.cpu.cycles = 0
+        with self.assertRaisesRegex(RuntimeError, "doesn't return after 1000 cycles"):
+            self.cpu.call(0x0300, max_cycles=1000)
+        self.assertNotIn(GUEST_RETURN_ADDRESS, self.cpu.memory._read_byte_callbacks)
+        self.assertEqualHexWord(self.cpu.system_stack_pointer.value, 0x4000)
+        self.assertGreaterEqual(self.cpu.cycles, 1000)
+        self.assertLess(self.cpu.cycles, 1000 + 4)  # BRA: 3 cycles + opcode fetch
+
+
+class MemoizedRoutineTestCase(BaseCPUTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cpu.system_stack_pointer.set(0x4000)
+        self.crc16 = MemoizedRoutine(
+            self.cpu, address=0x0100, code=CRC16_ROUTINE,
+            reads=[(0x1000, 0x10ff)], max_size=2,
+        )
+
+    def _crc16(self, data):
+        self.cpu.memory.load(0x1000, data)
+        return self.crc16({"U": 0x1000, "X": len(data), "D": 0}).d
+
+    def test_hits(self):
+        self.assertEqualHexWord(self._crc16(b"Z"), 0xfbbf)
+        cycles = self.cpu.cycles
+        self.assertEqualHexWord(self._crc16(b"Z"), 0xfbbf)
+        self.assertEqual(self.crc16.get_stats(), {
+            "size": 1, "hits": 1, "misses": 1, "evictions": 0, "invalidations": 0,
+        })
+        self.assertEqualHexWord(self.cpu.user_stack_pointer.value, 0x1001)  # output registers are set
+        self.assertGreater(self.cpu.cycles - cycles, 100)  # cycles of the real call are added
+
+    def test_read_range(self):
+        self._crc16(b"Z")
+        self.assertEqualHexWord(self._crc16(b"Y"), 0xcbdc)  # Other memory content
+        self.assertEqual(self.crc16.get_stats()["misses"], 2)
+
+    def test_lru_eviction(self):
+        for data in (b"A", b"B", b"A", b"C", b"B"):
+            self._crc16(data)
+        self.assertEqual(self.crc16.get_stats(), {
+            "size": 2, "hits": 1, "misses": 4, "evictions": 2, "invalidations": 0,
+        })
+
+    def test_writes(self):
+        routine = MemoizedRoutine(self.cpu, address=0x0200, code=[
+            0xA7, 0x84,  # STA ,X
+            0x39,  # RTS
+        ], writes=[(0x2000, 0x2000)])
+        routine({"A": 0x42, "X": 0x2000})
+        self.cpu.memory.load(0x2000, [0x00])
+        routine({"A": 0x42, "X": 0x2000})
+        self.assertEqual(routine.get_stats()["hits"], 1)
+        self.assertEqualHexByte(self.cpu.memory.read_byte(0x2000), 0x42)
+
+    def test_code_change(self):
+        self._crc16(b"Z")
+        self.cpu.memory.write_byte(0x0100 + len(CRC16_ROUTINE) - 1, 0x39)  # same RTS again
+        self._crc16(b"Z")
+        self.assertEqual(self.crc16.get_stats(), {
+            "size": 1, "hits": 0, "misses": 2, "evictions": 0, "invalidations": 1,
+        })
+        self.crc16.close()
+
+    def test_code_change_after_host_collect(self):
+        routine = MemoizedRoutine(self.cpu, address=0x0200, code=[
+            0x86, 0x01,  # LDA #1
+            0x39,  # RTS
+        ])
+        self.cpu.memory.add_dirty_tracking(0x0000, 0x7fff)  # e.g. of a GUI
+        self.assertEqual(routine().a, 1)
+        self.cpu.memory.write_byte(0x0201, 0x02)  # patch: LDA #2
+        self.assertIn((0x0200, 0x02ff), self.cpu.memory.collect_dirty())
+        self.assertEqual(routine().a, 2)
+        self.assertEqual(routine.get_stats()["invalidations"], 1)
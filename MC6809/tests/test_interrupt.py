@@ -0,0 +1,420 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import warnings
+
+from MC6809.components.cpu6809 import CPU, CPUTypeAssert
+from MC6809.components.event_scheduler import NEVER
+from MC6809.components.mc6809_interrupt import FIRQ_LINE, IRQ_LINE, NMI_LINE, SWI, SWI2, SWI3, WAIT_SYNC
+from MC6809.components.memory import Memory
+from MC6809.core import record_replay
+from MC6809.tests import test_config
+from MC6809.tests.test_base import BaseCPUTestCase
+
+
+MAIN_LOOP = [
+    0x30, 0x01,  # 1000 LEAX 1,X
+    0x20, 0xFC,  # 1002 BRA $1000
+]
+IRQ_HANDLER = [
+    0x7C, 0x05, 0x00,  # 2000 INC $0500
+    0xB7, 0xFF, 0x10,  # 2003 STA $FF10 ; acknowledge: release the IRQ line
+    0x3B,  # 2006 RTI
+]
+FIRQ_HANDLER = [
+    0x7C, 0x05, 0x01,  # 2100 INC $0501
+    0xB7, 0xFF, 0x11,  # 2103 STA $FF11 ; acknowledge: release the FIRQ line
+    0x3B,  # 2106 RTI
+]
+NMI_HANDLER = [
+    0x7C, 0x05, 0x02,  # 2200 INC $0502
+    0x3B,  # 2203 RTI
+]
+
+
+class InterruptTestCase(BaseCPUTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cpu = self._create_cpu()
+
+    def _create_cpu(self, CPUClass=CPU):
+        cfg = test_config.TestCfg(self.UNITTEST_CFG_DICT)
+        cpu = CPUClass(Memory(cfg), cfg)
+        memory = cpu.memory
+        memory.load(0x1000, MAIN_LOOP)
+        memory.load(0x2000, IRQ_HANDLER)
+        memory.load(0x2100, FIRQ_HANDLER)
+        memory.load(0x2200, NMI_HANDLER)
+        memory.load(cpu.IRQ_VECTOR, [0x20, 0x00])
+        memory.load(cpu.FIRQ_VECTOR, [0x21, 0x00])
+        memory.load(cpu.NMI_VECTOR, [0x22, 0x00])
+        memory.add_write_byte_callback(
+            lambda cycles, last_op_address, address, value: cpu.release_interrupt(IRQ_LINE), 0xff10
+        )
+        memory.add_write_byte_callback(
+            lambda cycles, last_op_address, address, value: cpu.release_interrupt(FIRQ_LINE), 0xff11
+        )
+        cpu.system_stack_pointer.set(0x7000)
+        cpu.set_cc(0x00)
+        cpu.program_counter.set(0x1000)
+        return cpu
+
+    def assertHandled(self, irq, firq, nmi):
+        self.assertEqual(self.cpu.get_interrupt_counts(), {"IRQ": irq, "FIRQ": firq, "NMI": nmi})
+        self.assertMemory(0x0500, [irq, firq, nmi])
+
+    def test_no_poll_without_lines(self):
+        self.assertEqual(self.cpu.scheduler.next_due, NEVER)
+        self.cpu.step(10)
+        self.assertEqual(self.cpu.scheduler.dispatched, 0)
+
+    def test_irq(self):
+        self.cpu.step(2)
+        self.cpu.assert_interrupt(IRQ_LINE)
+        self.assertEqual(self.cpu.scheduler.next_due, 0)
+        self.cpu.step()  # deliver after the next instruction
+        self.assertEqualHex(self.cpu.program_counter.value, 0x2000)
+        self.assertEqual(self.cpu.I, 1)
+        self.assertEqual(self.cpu.E, 1)
+        self.assertEqual(self.cpu.system_stack_pointer.value, 0x7000 - 12)  # entire state
+
+        self.cpu.step(3)  # INC, STA (release), RTI
+        self.assertEqualHex(self.cpu.program_counter.value, 0x1002)
+        self.assertEqual(self.cpu.I, 0)
+        self.assertEqual(self.cpu.interrupt_lines, 0)
+        self.assertEqual(self.cpu.scheduler.next_due, NEVER)  # no more polling
+        self.cpu.step(10)
+        self.assertHandled(irq=1, firq=0, nmi=0)
+
+    def test_irq_masked(self):
+        self.cpu.set_cc(0x10)  # I
+        self.cpu.assert_interrupt(IRQ_LINE)
+        self.cpu.step(10)
+        self.assertHandled(irq=0, firq=0, nmi=0)
+
+        self.cpu.memory.load(0x1000, [0x1C, 0xEF])  # ANDCC #$EF
+        self.cpu.program_counter.set(0x1000)
+        self.cpu.step()
+        self.assertEqualHex(self.cpu.program_counter.value, 0x2000)
+        self.cpu.step(3)
+        self.assertHandled(irq=1, firq=0, nmi=0)
+
+    def test_level_triggered(self):
+        self.cpu.memory.load(0x2003, [0x12, 0x12, 0x12])  # NOP: don't release the line
+        self.cpu.assert_interrupt(IRQ_LINE)
+        self.cpu.step(1 + 5 * 5)  # LEAX + 5 x 5 handler ops (INC, 3 x NOP, RTI)
+        self.assertEqual(self.cpu.interrupt_counts[IRQ_LINE], 6)
+        self.assertEqual(self.cpu.index_x.value, 1)  # the main loop is starved
+
+        self.cpu.release_interrupt(IRQ_LINE)
+        self.cpu.step(10)
+        self.assertEqual(self.cpu.interrupt_counts[IRQ_LINE], 6)
+        self.assertGreater(self.cpu.index_x.value, 0)
+
+    def test_firq(self):
+        self.cpu.assert_interrupt(FIRQ_LINE)
+        self.cpu.step()
+        self.assertEqualHex(self.cpu.program_counter.value, 0x2100)
+        self.assertEqual((self.cpu.E, self.cpu.F, self.cpu.I), (0, 1, 1))
+        self.assertEqual(self.cpu.system_stack_pointer.value, 0x7000 - 3)  # only PC and CC
+        self.cpu.step(3)
+        self.assertEqual(self.cpu.system_stack_pointer.value, 0x7000)
+        self.assertEqual(self.cpu.get_cc_value(), 0x00)
+        self.assertHandled(irq=0, firq=1, nmi=0)
+
+    def test_priority(self):
+        self.cpu.assert_interrupt(IRQ_LINE)
+        self.cpu.assert_interrupt(FIRQ_LINE)
+        self.cpu.nmi()
+        self.cpu.step()
+        self.assertEqualHex(self.cpu.program_counter.value, 0x2200)
+        self.cpu.step(2)  # INC, RTI
+        self.assertEqualHex(self.cpu.program_counter.value, 0x2100)
+        self.cpu.step(3)  # INC, STA, RTI
+        self.assertEqualHex(self.cpu.program_counter.value, 0x2000)
+        self.cpu.step(3)
+        self.assertHandled(irq=1, firq=1, nmi=1)
+        self.assertEqual(self.cpu.interrupt_lines, 0)
+
+    def test_nmi_not_masked(self):
+        self.cpu.set_cc(0x50)  # F and I
+        self.cpu.nmi()
+        self.cpu.release_interrupt(NMI_LINE)  # the edge is latched
+        self.cpu.step(10)
+        self.assertHandled(irq=0, firq=0, nmi=1)
+
+    def test_timer_irq(self):
+        self.cpu.schedule_event(1000, lambda cycles: self.cpu.assert_interrupt(IRQ_LINE), period=1000)
+        self.cpu.run_for_cycles(10500)
+        self.assertHandled(irq=10, firq=0, nmi=0)
+
+    def test_record_replay(self):
+        self.cpu.schedule_event(100, lambda cycles: self.cpu.assert_interrupt(IRQ_LINE), period=300)
+        self.cpu.schedule_event(250, lambda cycles: self.cpu.nmi(), period=1000)
+        recorder = record_replay.Recorder(self.cpu)
+        recorder.start()
+        self.cpu.run_for_cycles(5000)
+        log_data = recorder.stop()
+        self.assertEqual(self.cpu.interrupt_counts[NMI_LINE], 5)
+
+        other_cpu = self._create_cpu()
+        stats = record_replay.Replayer(other_cpu, log_data).run()
+        self.assertEqual(stats["interrupt_line_changes"], 17 + 17 + 5)  # assert + release IRQ and NMI
+        self.assertEqual(other_cpu.interrupt_counts, self.cpu.interrupt_counts)
+        self.assertEqual(other_cpu.get_snapshot(), self.cpu.get_snapshot())
+
+    def _count_ops(self):
+        ops = []
+        get_and_call_next_op = self.cpu.get_and_call_next_op
+
+        def counting_get_and_call_next_op():
+            ops.append(self.cpu.program_counter.value)
+            get_and_call_next_op()
+
+        self.cpu.get_and_call_next_op = counting_get_and_call_next_op
+        return ops
+
+    def test_sync(self):
+        self.cpu.memory.load(0x1000, [
+            0x13,  # 1000 SYNC
+            0x30, 0x01,  # 1001 LEAX 1,X
+            0x20, 0xFB,  # 1003 BRA $1000
+        ])
+        self.cpu.schedule_event(14914, lambda cycles: self.cpu.assert_interrupt(IRQ_LINE), period=14914)
+        ops = self._count_ops()
+        self.cpu.run_for_cycles(14914 * 10 + 100)
+        self.assertHandled(irq=10, firq=0, nmi=0)
+        self.assertEqual(self.cpu.index_x.value, 10)  # returns after SYNC
+        self.assertLess(len(ops), 10 * 8)  # SYNC, IRQ handler, LEAX, BRA
+        self.assertEqual(self.cpu.wait_state, WAIT_SYNC)  # waits for the next IRQ
+        self.assertEqualHex(self.cpu.program_counter.value, 0x1000)
+
+    def test_sync_type_assert(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # "CPU TypeAssert used!"
+            self.cpu = self._create_cpu(CPUTypeAssert)
+        self.cpu.memory.load(0x1000, [
+            0x13,  # 1000 SYNC
+            0x30, 0x01,  # 1001 LEAX 1,X
+            0x20, 0xFB,  # 1003 BRA $1000
+        ])
+        self.cpu.schedule_event(100, lambda cycles: self.cpu.assert_interrupt(IRQ_LINE), period=100)
+        self.cpu.run_for_cycles(1000)  # the wait state keeps its type
+        self.assertEqual(self.cpu.interrupt_counts[IRQ_LINE], 10)
+        self.assertGreater(self.cpu.index_x.value, 0)
+
+    def test_sync_masked(self):
+        self.cpu.memory.load(0x1000, [
+            0x13,  # 1000 SYNC
+            0x30, 0x01,  # 1001 LEAX 1,X
+            0x20, 0xFB,  # 1003 BRA $1000
+        ])
+        self.cpu.set_cc(0x10)  # I
+        self.cpu.schedule_event(1000, lambda cycles: self.cpu.assert_interrupt(IRQ_LINE))
+        self.cpu.run_for_cycles(999)
+        self.assertEqual(self.cpu.cycles, 999)  # fast forward to the end of the run
+        self.assertEqualHex(self.cpu.program_counter.value, 0x1000)
+
+        self.cpu.step(3)  # SYNC waits until the IRQ, SYNC ends without delivery, LEAX
+        self.assertEqual(self.cpu.index_x.value, 1)
+        self.assertHandled(irq=0, firq=0, nmi=0)
+
+    def test_sync_without_events(self):
+        self.cpu.memory.load(0x1000, [
+            0x13,  # 1000 SYNC
+            0x30, 0x01,  # 1001 LEAX 1,X
+        ])
+        self.cpu.set_cc(0x10)  # I
+        self.assertEqual(self.cpu.scheduler.get_next_event_due(), NEVER)
+        cycles = self.cpu.step(1)
+        self.assertLess(cycles, 10)  # no fast forward
+        self.assertEqual(self.cpu.step(9), cycles * 9)
+        self.cpu.run()
+        self.assertLess(self.cpu.cycles, 1000000000)
+        self.assertEqual(self.cpu.wait_state, WAIT_SYNC)
+        self.assertEqualHex(self.cpu.program_counter.value, 0x1000)
+
+        self.cpu.assert_interrupt(IRQ_LINE)  # masked: SYNC ends without delivery
+        self.cpu.step(2)
+        self.assertEqual(self.cpu.index_x.value, 1)
+
+    def test_cwai(self):
+        self.cpu.memory.load(0x1000, [
+            0x3C, 0xEF,  # 1000 CWAI #$EF ; enable IRQ
+            0x30, 0x01,  # 1002 LEAX 1,X
+            0x20, 0xFA,  # 1004 BRA $1000
+        ])
+        self.cpu.set_cc(0x10)  # I
+        self.cpu.schedule_event(1000, lambda cycles: self.cpu.assert_interrupt(IRQ_LINE))
+        self.cpu.run_for_cycles(500)
+        self.assertEqual(self.cpu.cycles, 500)
+        self.assertEqual(self.cpu.system_stack_pointer.value, 0x7000 - 12)  # stacked once
+        self.assertEqualHex(self.cpu.program_counter.value, 0x1000)
+
+        self.cpu.run_for_cycles(500)
+        self.assertEqualHex(self.cpu.program_counter.value, 0x2000)
+        self.assertEqual(self.cpu.system_stack_pointer.value, 0x7000 - 12)  # not stacked again
+        self.assertEqual(self.cpu.interrupt_counts[IRQ_LINE], 1)
+
+        self.cpu.step(3)  # INC, STA, RTI
+        self.assertEqualHex(self.cpu.program_counter.value, 0x1002)
+        self.assertEqual(self.cpu.system_stack_pointer.value, 0x7000)
+        self.assertEqual(self.cpu.get_cc_value(), 0x80)  # E, I cleared by CWAI
+
+    def test_cwai_without_events(self):
+        self.cpu.memory.load(0x1000, [
+            0x3C, 0xEF,  # 1000 CWAI #$EF ; enable IRQ
+            0x30, 0x01,  # 1002 LEAX 1,X
+        ])
+        self.cpu.set_cc(0x10)  # I
+        self.assertEqual(self.cpu.scheduler.get_next_event_due(), NEVER)
+        self.cpu.step(1)  # stacks the entire state
+        cycles = self.cpu.step(1)
+        self.assertLess(cycles, 30)  # no fast forward
+        self.assertEqual(self.cpu.step(8), cycles * 8)
+        self.cpu.run()
+        self.assertLess(self.cpu.cycles, 1000000000)
+        self.assertEqual(self.cpu.system_stack_pointer.value, 0x7000 - 12)  # stacked once
+        self.assertEqualHex(self.cpu.program_counter.value, 0x1000)
+
+        self.cpu.assert_interrupt(IRQ_LINE)
+        self.cpu.step(1)
+        self.assertEqualHex(self.cpu.program_counter.value, 0x2000)
+        self.assertEqual(self.cpu.system_stack_pointer.value, 0x7000 - 12)  # not stacked again
+        self.assertEqual(self.cpu.interrupt_counts[IRQ_LINE], 1)
+
+    def test_cwai_firq(self):
+        self.cpu.memory.load(0x1000, [
+            0x3C, 0xBF,  # 1000 CWAI #$BF ; enable FIRQ
+            0x30, 0x01,  # 1002 LEAX 1,X
+        ])
+        self.cpu.set_cc(0x50)  # F and I
+        self.cpu.schedule_event(100, lambda cycles: self.cpu.assert_interrupt(IRQ_LINE))  # stays masked
+        self.cpu.schedule_event(300, lambda cycles: self.cpu.assert_interrupt(FIRQ_LINE))
+        self.cpu.run_for_cycles(300)
+        self.assertEqualHex(self.cpu.program_counter.value, 0x2100)
+        self.cpu.step(3)  # INC, STA, RTI: the entire state is pulled
+        self.assertEqualHex(self.cpu.program_counter.value, 0x1002)
+        self.assertEqual(self.cpu.system_stack_pointer.value, 0x7000)
+        self.assertEqual(self.cpu.get_cc_value(), 0x90)  # E and I
+        self.assertHandled(irq=0, firq=1, nmi=0)
+
+
+SWI_HANDLER = [
+    0x7C, 0x05, 0x03,  # 2300 INC $0503
+    0x3B,  # 2303 RTI
+]
+
+
+class SoftwareInterruptTestCase(BaseCPUTestCase):
+    def setUp(self):
+        super().setUp()
+        cfg = test_config.TestCfg(self.UNITTEST_CFG_DICT)
+        self.cpu = CPU(Memory(cfg), cfg)
+        memory = self.cpu.memory
+        memory.load(0x2300, SWI_HANDLER)
+        for vector in (self.cpu.SWI_VECTOR, self.cpu.SWI2_VECTOR, self.cpu.SWI3_VECTOR):
+            memory.load(vector, [0x23, 0x00])
+        self.cpu.system_stack_pointer.set(0x7000)
+        self.cpu.set_cc(0x00)
+        self.cpu.program_counter.set(0x1000)
+
+    def _test_software_interrupt(self, code, masked):
+        self.cpu.memory.load(0x1000, [0x86, 0x42] + code + [0x30, 0x01])  # LDA #$42 ; SWIx ; LEAX 1,X
+        self.cpu.step(2)
+        self.assertEqualHex(self.cpu.program_counter.value, 0x2300)
+        self.assertEqual(self.cpu.E, 1)
+        self.assertEqual(self.cpu.I, masked)
+        self.assertEqual(self.cpu.F, masked)
+        self.assertEqual(self.cpu.system_stack_pointer.value, 0x7000 - 12)  # entire state
+
+        self.cpu.step(2)  # INC, RTI
+        self.assertEqualHex(self.cpu.program_counter.value, 0x1002 + len(code))
+        self.assertEqual(self.cpu.system_stack_pointer.value, 0x7000)
+        self.assertEqual(self.cpu.get_cc_value(), 0x80)  # only E from the stacked CC
+        self.assertEqual(self.cpu.accu_a.value, 0x42)
+        self.assertMemory(0x0503, [1])
+
+    def test_swi(self):
+        self._test_software_interrupt([0x3F], masked=1)
+
+    def test_swi2(self):
+        self._test_software_interrupt([0x10, 0x3F], masked=0)
+
+    def test_swi3(self):
+        self._test_software_interrupt([0x11, 0x3F], masked=0)
+
+    def test_trap(self):
+        self.cpu.memory.load(0x1000, [
+            0x8E, 0x04, 0x00,  # 1000 LDX #$0400
+            0x10, 0x3F, 0x01,  # 1003 SWI2 ; FCB $01
+            0x30, 0x01,  # 1006 LEAX 1,X
+        ])
+
+        def fill(cpu):  # e.g.: a memset in Python
+            cpu.memory.load(cpu.index_x.value, [cpu.accu_a.value] * 4)
+            cpu.accu_b.set(4)
+            return 100
+
+        self.cpu.add_trap(service=0x01, callback=fill)
+        self.cpu.accu_a.set(0xAA)
+        self.cpu.step(2)
+        self.assertEqualHex(self.cpu.program_counter.value, 0x1006)
+        self.assertEqual(self.cpu.system_stack_pointer.value, 0x7000)  # nothing stacked
+        self.assertMemory(0x0400, [0xAA] * 4)
+        self.assertEqual(self.cpu.accu_b.value, 4)
+        self.assertGreaterEqual(self.cpu.cycles, 100)
+        self.assertEqual(self.cpu.trap_counts, {(SWI2, 0x01): 1})
+        self.cpu.step()
+        self.assertEqualHex(self.cpu.index_x.value, 0x0401)
+
+    def test_trap_after_change_cpu(self):
+        self.cpu.memory.load(0x1000, [
+            0x10, 0x3F, 0x01,  # 1000 SWI2 ; FCB $01
+            0x10, 0x3F, 0x01,  # 1003 SWI2 ; FCB $01
+        ])
+        calls = []
+        self.cpu.add_trap(service=0x01, callback=calls.append)
+        self.cpu.step()
+        old_cpu = self.cpu
+        self.cpu = self.cpu.to_speed_limit()
+        self.cpu.step()
+        self.assertEqualHex(self.cpu.program_counter.value, 0x1006)
+        self.assertEqual(calls, [old_cpu, self.cpu])
+        self.assertEqual(self.cpu.trap_counts, {(SWI2, 0x01): 2})
+
+    def test_trap_unknown_service(self):
+        code = [
+            0x10, 0x3F, 0x02,  # 1000 SWI2 ; FCB $02
+        ]
+        self.cpu.memory.load(0x1000, code)
+        self.cpu.step()
+        cycles = self.cpu.cycles
+
+        self.setUp()
+        self.cpu.memory.load(0x1000, code)
+        self.cpu.add_trap(service=0x01, callback=lambda cpu: None)
+        self.cpu.add_trap(service=0x02, callback=lambda cpu: None, opcode=SWI3)
+        self.cpu.step()  # a normal SWI2: no trap for service $02
+        self.assertEqualHex(self.cpu.program_counter.value, 0x2300)
+        self.assertEqual(self.cpu.cycles, cycles)
+        stacked_pc = self.cpu.memory.read_word(self.cpu.system_stack_pointer.value + 10)
+        self.assertEqualHex(stacked_pc, 0x1002)  # the handler can read the service byte
+        self.assertEqual(self.cpu.trap_counts, {})
+
+    def test_remove_trap(self):
+        self.cpu.add_trap(service=0x01, callback=lambda cpu: None, opcode=SWI)
+        self.assertEqual(list(self.cpu.traps), [SWI])
+        self.cpu.remove_trap(service=0x01, opcode=SWI)
+        self.assertEqual(self.cpu.traps, {})
+        with self.assertRaises(ValueError):
+            self.cpu.add_trap(service=0x01, callback=lambda cpu: None, opcode=0x12)
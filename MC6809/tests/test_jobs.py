@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+from MC6809.core.jobs import JobError, run_job
+from MC6809.tests.test_base import BaseCPUTestCase
+
+
+FILL_PROGRAM = bytes([
+    0x8E, 0x04, 0x00,  # LDX #$0400
+    0xA7, 0x80,  # STA ,X+
+    0x8C, 0x04, 0x10,  # CMPX #$0410
+    0x26, 0xF9,  # BNE $1003
+]).hex()
+
+
+def get_fill_job(value):
+    return {
+        "load": [{"address": 0x1000, "data": FILL_PROGRAM}],
+        "registers": {"A": value},
+        "start": 0x1000,
+        "end": 0x100a,
+        "dump": [[0x0400, 0x0411]],
+    }
+
+
+class JobsTestCase(BaseCPUTestCase):
+    def test_run_job(self):
+        result = run_job(self.cpu, get_fill_job(0x2a))
+        self.assertEqual(result["stopped"], "end")
+        self.assertEqual(result["registers"]["X"], 0x0410)
+        self.assertEqual(result["registers"]["PC"], 0x100a)
+        self.assertEqual(result["dump"], [{"address": 0x0400, "data": "2a" * 0x10 + "0000"}])
+        self.assertEqual(result["cycles"], self.cpu.cycles)
+
+    def test_max_cycles(self):
+        job = get_fill_job(0x2a)
+        job["max_cycles"] = 20
+        result = run_job(self.cpu, job)
+        self.assertEqual(result["stopped"], "max_cycles")
+        self.assertGreaterEqual(result["cycles"], 20)
+        self.assertLess(result["registers"]["X"], 0x0410)
+
+    def test_events(self):
+        calls = []
+        self.cpu.schedule_event(100, calls.append, period=100)
+        result = run_job(self.cpu, get_fill_job(0x2a))
+        self.assertEqual(result["stopped"], "end")
+        self.assertEqual(len(calls), result["cycles"] // 100)
+        self.assertNotIn(0x100a, self.cpu.memory._read_byte_callbacks)
+
+    def test_start_is_end(self):
+        job = get_fill_job(0x2a)
+        job["end"] = job["start"]
+        result = run_job(self.cpu, job)
+        self.assertEqual(result["stopped"], "end")
+        self.assertEqual(result["cycles"], 0)
+
+    def test_end_on_operand(self):
+        result = run_job(self.cpu, {
+            "load": [{"address": 0x1000, "data": "3001" "20fc"}],  # LEAX 1,X / BRA $1000
+            "registers": {"X": 0},
+            "start": 0x1000,
+            "end": 0x1001,  # the post byte of LEAX: no stop
+            "max_cycles": 1000,
+        })
+        self.assertEqual(result["stopped"], "max_cycles")
+        self.assertGreater(result["registers"]["X"], 0)
+        self.assertIn(result["registers"]["PC"], (0x1000, 0x1002))  # only complete instructions
+
+    def test_invalid_job(self):
+        with self.assertRaisesRegex(JobError, "Unknown job keys: foo"):
+            run_job(self.cpu, {"foo": 1})
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import binascii
+import random
+import unittest
+
+from MC6809.components.cpu6809 import CPU
+from MC6809.components.MC6809data.MC6809_op_data import REG_D, REG_S, REG_U, REG_X
+from MC6809.components.memory import Memory
+from MC6809.core.jobs import get_registers, run_job
+from MC6809.core.lockstep import LockstepEngine, numpy
+from MC6809.tests import test_config
+from MC6809.tests.test_base import BaseCPUTestCase
+
+
+# see: MC6809.tests.test_6809_program.Test6809_Program._crc16
+CRC16_CODE = [
+    0xA8, 0xC0,  # 0100 BL:   EORA  ,u+
+    0x10, 0x8E, 0x00, 0x08,  # 0102 LDY   #8
+    0x58,  # 0106 RL:   ASLB
+    0x49,  # 0107       ROLA
+    0x24, 0x04,  # 0108 BCC   cl
+    0x88, 0x10,  # 010A EORA  #CRCH
+    0xC8, 0x21,  # 010C EORB  #CRCL
+    0x31, 0x3F,  # 010E CL:   LEAY  -1,y
+    0x26, 0xF4,  # 0110 BNE   rl
+    0x30, 0x1F,  # 0112 LEAX  -1,x
+    0x26, 0xEA,  # 0114 BNE   bl
+]
+
+# see: MC6809.tests.test_6809_program.Test6809_Program._crc32
+CRC32_CODE = [
+    0x10, 0xCE, 0x40, 0x00,  # LDS   #$4000
+    0xCE, 0x10, 0x00,  # LDU   #$1000     ; start address in u
+    0x34, 0x10,  # PSHS  x          ; end address +1 to TOS
+    0xCC, 0xFF, 0xFF,  # LDD   #CRCINITL
+    0xDD, 0x82,  # STD   crc+2
+    0x8E, 0xFF, 0xFF,  # LDX   #CRCINITH
+    0x9F, 0x80,  # STX   crc
+    0xE8, 0xC0,  # BL:   EORB  ,u+
+    0x10, 0x8E, 0x00, 0x08,  # LDY   #8
+    0x1E, 0x01,  # RL:   EXG   d,x
+    0x44,  # RL1:  LSRA
+    0x56,  # RORB
+    0x1E, 0x01,  # EXG   d,x
+    0x46,  # RORA
+    0x56,  # RORB
+    0x24, 0x12,  # BCC   cl
+    0x88, 0x83,  # EORA  #CRCLH
+    0xC8, 0x20,  # EORB  #CRCLL
+    0x1E, 0x01,  # EXG   d,x
+    0x88, 0xED,  # EORA  #CRCHH
+    0xC8, 0xB8,  # EORB  #CRCHL
+    0x31, 0x3F,  # LEAY  -1,y
+    0x26, 0xEA,  # BNE   rl1
+    0x1E, 0x01,  # EXG   d,x
+    0x27, 0x04,  # BEQ   el
+    0x31, 0x3F,  # CL:   LEAY  -1,y
+    0x26, 0xE0,  # BNE   rl
+    0x11, 0xA3, 0xE4,  # EL:   CMPU  ,s
+    0x26, 0xD5,  # BNE   bl
+    0xDD, 0x82,  # STD   crc+2
+    0x9F, 0x80,  # STX   crc
+]
+
+# see: MC6809.tests.test_6809_program.Test6809_Program_Division2
+# dividend high word, low word and divisor are on the stack at S
+DIVISION_CODE = [
+    0x8E, 0x00, 0x10,  # 0100          LDX   #16
+    0xEC, 0x62,  # 0103          LDD   2,s
+    0x10, 0xA3, 0xE4,  # 0105          CMPD  ,s
+    0x24, 0x24,  # 0108          BHS   UMMODOV
+    0x68, 0x65,  # 010A          ASL   5,s
+    0x69, 0x64,  # 010C          ROL   4,s
+    0x59,  # 010E  UMMOD1: ROLB
+    0x49,  # 010F          ROLA
+    0x25, 0x09,  # 0110          BCS   UMMOD2
+    0x10, 0xA3, 0xE4,  # 0112          CMPD  ,s
+    0x24, 0x04,  # 0115          BHS   UMMOD2
+    0x1C, 0xFE,  # 0117          ANDCC #$fe
+    0x20, 0x04,  # 0119          BRA   UMMOD3
+    0xA3, 0xE4,  # 011B  UMMOD2: SUBD  ,s
+    0x1A, 0x01,  # 011D          ORCC  #$01
+    0x69, 0x65,  # 011F  UMMOD3: ROL   5,s
+    0x69, 0x64,  # 0121          ROL   4,s
+    0x30, 0x1F,  # 0123          LEAX  -1,x
+    0x26, 0xE7,  # 0125          BNE   UMMOD1
+    0xAE, 0x64,  # 0127          LDX   4,s
+    0x10, 0xA3, 0xE4,  # 0129          CMPD  ,s
+    0x25, 0x05,  # 012C          BLO   UMMOD4
+    0xEC, 0xE4,  # 012E UMMODOV: LDD   ,s
+    0x8E, 0xFF, 0xFF,  # 0130          LDX   #$FFFF
+    0x32, 0x62,  # 0133  UMMOD4: LEAS  2,s
+    0xAF, 0xE4,  # 0135          STX   ,s
+    0xED, 0x62,  # 0137          STD   2,s
+]
+
+START = 0x0100
+DATA_ADDRESS = 0x1000
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class LockstepEngineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.random = random.Random(6809)
+
+    def _random_buffers(self, count, min_size, max_size):
+        return [
+            bytes(self.random.randrange(0x100) for __ in range(self.random.randint(min_size, max_size)))
+            for __ in range(count)
+        ]
+
+    def _crc16_engine(self, buffers):
+        engine = LockstepEngine(lanes=len(buffers))
+        engine.load(START, CRC16_CODE)
+        for lane, data in enumerate(buffers):
+            engine.load_lane(lane, DATA_ADDRESS, data)
+        engine.set_register(REG_U, DATA_ADDRESS)
+        engine.set_register(REG_X, numpy.array([len(data) for data in buffers]))
+        self.assertEqual(engine.run(start=START, end=START + len(CRC16_CODE)), 0)
+        return engine
+
+    def test_crc16_same_as_cpu(self):
+        buffers = [b"Z", b"DragonPy works?!?"] + self._random_buffers(20, 1, 40)
+        engine = self._crc16_engine(buffers)
+        d = engine.get_register(REG_D)
+        self.assertEqual(d[0], 0xfbbf)  # see: test_6809_program.Test6809_Program.test_crc16_01
+        self.assertEqual(d[1], 0xa30d)
+
+        cfg = test_config.TestCfg(BaseCPUTestCase.UNITTEST_CFG_DICT)
+        cpu = CPU(Memory(cfg), cfg)
+        for lane, data in enumerate(buffers):
+            cpu.reset()
+            cpu.set_cc(0)
+            for register in cpu.register_str2object.values():
+                register.set(0)
+            result = run_job(cpu, {
+                "load": [
+                    {"address": START, "data": bytes(CRC16_CODE).hex()},
+                    {"address": DATA_ADDRESS, "data": data.hex()},
+                ],
+                "registers": {"U": DATA_ADDRESS, "X": len(data)},
+                "start": START,
+                "end": START + len(CRC16_CODE),
+            })
+            self.assertEqual(result["stopped"], "end")
+            lane_registers = {name: int(engine.get_register(name)[lane]) for name in result["registers"]}
+            self.assertEqual(lane_registers, get_registers(cpu), f"Lane {lane:d}")
+
+    def test_crc32(self):
+        buffers = self._random_buffers(50, 1, 30)
+        engine = LockstepEngine(lanes=len(buffers))
+        engine.load(START, CRC32_CODE)
+        for lane, data in enumerate(buffers):
+            engine.load_lane(lane, DATA_ADDRESS, data)
+        engine.set_register(REG_X, numpy.array([DATA_ADDRESS + len(data) for data in buffers]))
+        self.assertEqual(engine.run(start=START, end=START + len(CRC32_CODE)), 0)
+
+        crc32 = ((engine.get_register(REG_X) << 16) | engine.get_register(REG_D)) ^ 0xffffffff
+        self.assertEqual(crc32.tolist(), [binascii.crc32(data) for data in buffers])
+        self.assertEqual(engine.get_register(REG_S).tolist(), [0x4000 - 2] * len(buffers))
+
+        stats = engine.get_stats()
+        self.assertEqual(stats["lanes"], 50)
+        self.assertGreater(stats["lane_ops"], stats["steps"])
+        self.assertGreater(stats["utilisation"], 0.0)
+        self.assertLess(stats["utilisation"], 1.0)  # different data and lengths diverge
+
+    def test_lockstep_without_divergence(self):
+        engine = self._crc16_engine([b"same data"] * 10)
+        self.assertEqual(len(set(engine.get_register(REG_D).tolist())), 1)
+        stats = engine.get_stats()
+        self.assertEqual(stats["utilisation"], 1.0)
+        self.assertEqual(stats["lane_ops"], stats["steps"] * 10)
+
+    def test_division(self):
+        pairs = [(10, 3), (0xffff, 0x80), (0xfffffff, 0xffff), (1, 0xffff), (0x10000, 1), (1, 0)]
+        pairs += [(self.random.randrange(0x10000000), self.random.randrange(1, 0x10000)) for __ in range(30)]
+        engine = LockstepEngine(lanes=len(pairs))
+        engine.load(START, DIVISION_CODE)
+        stack = 0x4000 - 6
+        for lane, (dividend, divisor) in enumerate(pairs):
+            engine.load_lane(lane, stack, [
+                divisor >> 8, divisor & 0xff,
+                dividend >> 24, (dividend >> 16) & 0xff, (dividend >> 8) & 0xff, dividend & 0xff,
+            ])
+        engine.set_register(REG_S, stack)
+        self.assertEqual(engine.run(start=START, end=START + len(DIVISION_CODE)), 0)
+
+        quotients = engine.get_register(REG_X).tolist()
+        remainders = engine.get_register(REG_D).tolist()
+        for lane, (dividend, divisor) in enumerate(pairs):
+            if divisor == 0 or dividend // divisor > 0xffff:  # overflow
+                expected = (0xffff, divisor)
+            else:
+                expected = divmod(dividend, divisor)
+            self.assertEqual((quotients[lane], remainders[lane]), expected, f"${dividend:x} / ${divisor:x}")
+
+    def test_max_steps(self):
+        engine = LockstepEngine(lanes=3)
+        engine.load(START, [0x20, 0xFE])  # BRA *
+        self.assertEqual(engine.run(start=START, end=0x2000, max_steps=100), 3)
+        self.assertEqual(engine.get_stats()["steps"], 100)
+
+    def test_unsupported_opcode(self):
+        engine = LockstepEngine(lanes=2)
+        engine.load(START, [0x3D])  # MUL
+        with self.assertRaises(NotImplementedError) as context_manager:
+            engine.run(start=START, end=START + 1)
+        self.assertEqual(str(context_manager.exception), "Opcode $3d at $0100 is not supported")
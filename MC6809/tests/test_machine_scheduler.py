@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import unittest
+
+from MC6809.components.cpu6809 import CPU
+from MC6809.components.memory import Memory
+from MC6809.core.machine_scheduler import MachineScheduler
+from MC6809.tests import test_config
+from MC6809.tests.test_base import BaseCPUTestCase
+
+
+COUNTER_PROGRAM = [
+    0x30, 0x01,  # 4000 LEAX 1,X
+    0x20, 0xFC,  # 4002 BRA $4000
+]
+
+
+class MachineSchedulerTestCase(unittest.TestCase):
+    def _create_cpu(self):
+        cfg = test_config.TestCfg(BaseCPUTestCase.UNITTEST_CFG_DICT)
+        cpu = CPU(Memory(cfg), cfg)
+        cpu.memory.load(0x4000, COUNTER_PROGRAM)
+        cpu.program_counter.set(0x4000)
+        return cpu
+
+    def test_isolated_instances(self):
+        cpu1 = self._create_cpu()
+        cpu2 = self._create_cpu()
+        calls1 = []
+        calls2 = []
+        cpu1.add_sync_callback(100, calls1.append)
+        cpu2.add_sync_callback(1000, calls2.append)
+        self.assertIsNot(cpu1.scheduler, cpu2.scheduler)
+
+        cpu1.run_for_cycles(2000)
+        self.assertGreater(len(calls1), 10)
+        self.assertEqual(calls2, [])
+        self.assertEqual(cpu2.cycles, 0)
+
+        for name in ("inner_burst_op_count", "irq_enabled", "_wrong_NEG", "interrupt_counts"):
+            self.assertIn(name, cpu1.__dict__)
+            self.assertNotIn(name, CPU.__dict__)
+
+    def test_fairness(self):
+        scheduler = MachineScheduler(quantum=1000)
+        cpus = [self._create_cpu() for __ in range(3)]
+        scheduler.add(cpus[0], name="a")
+        scheduler.add(cpus[1], name="b")
+        scheduler.add(cpus[2], name="c", weight=2)
+        scheduler.run(rounds=50)
+
+        self.assertEqual(scheduler.rounds, 50)
+        for cpu, weight in zip(cpus, (1, 1, 2)):
+            target = 50 * 1000 * weight
+            self.assertGreaterEqual(cpu.cycles, target)  # no drift by the overshoot
+            self.assertLess(cpu.cycles, target + 20)
+
+        stats = scheduler.get_stats()
+        self.assertEqual(list(stats), ["a", "b", "c"])
+        self.assertAlmostEqual(stats["c"]["share"], 0.5, places=3)
+        self.assertEqual(stats["a"]["slices"], 50)
+        self.assertGreater(stats["a"]["cycles_per_sec"], 0)
+        self.assertFalse(stats["a"]["finished"])
+
+    def test_finished(self):
+        scheduler = MachineScheduler(quantum=1000)
+        cpu1 = self._create_cpu()
+        cpu2 = self._create_cpu()
+        scheduler.add(cpu1)
+        scheduler.add(cpu2)
+        cpu1.schedule_event(5000, lambda cycles: cpu1.quit())
+        cpu2.schedule_event(8000, lambda cycles: cpu2.quit())
+        scheduler.run()  # until all machines are finished
+        self.assertLess(cpu1.cycles, 6000)
+        self.assertLess(cpu2.cycles, 9000)
+        self.assertEqual(scheduler.rounds, 9)
+        self.assertEqual(scheduler.get_stats()["machine 0"]["slices"], 5)
+
+    def test_add_remove(self):
+        scheduler = MachineScheduler()
+        cpu = self._create_cpu()
+        machine = scheduler.add(cpu, name="board")
+        with self.assertRaises(ValueError):
+            scheduler.add(cpu)
+        with self.assertRaises(ValueError):
+            scheduler.add(self._create_cpu(), name="board")
+        with self.assertRaises(ValueError):
+            scheduler.add(self._create_cpu(), weight=0)
+        self.assertIs(scheduler.remove("board"), machine)
+        with self.assertRaises(KeyError):
+            scheduler.remove("board")
@@ -0,0 +1,422 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from MC6809.components import memory_backends
+from MC6809.components.cpu6809 import CPU
+from MC6809.components.mc6809_guest_call import MemoizedRoutine
+from MC6809.components.memory import Memory
+from MC6809.components.memory_backends import DEFAULT_BACKEND, get_available_backends
+from MC6809.components.memory_shared import SharedMemoryView, shared_memory
+from MC6809.core.rewind import Rewind
+from MC6809.tests import test_config
+from MC6809.tests.test_base import BaseCPUTestCase, print_cpu_state_data
+from MC6809.utils.image_formats import ImageFormatError
+
+
+class MemoryLoadTestCase(BaseCPUTestCase):
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.TemporaryDirectory(prefix="MC6809_")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        super().tearDown()
+
+    def _write_file(self, filename, content):
+        filepath = os.path.join(self.temp_dir.name, filename)
+        with open(filepath, "wb") as f:
+            f.write(content)
+        return filepath
+
+    def test_load_types(self):
+        memory = self.cpu.memory
+        memory.load(0x1000, [0x01, 0x02])
+        memory.load(0x1002, (0x03,))
+        memory.load(0x1003, b"\x04")
+        memory.load(0x1004, bytearray(b"\x05"))
+        memory.load(0x1005, memoryview(b"\x06"))
+        memory.load(0x1006, "\x07")
+        self.assertHexList(memory.get(0x1000, 0x1007), [1, 2, 3, 4, 5, 6, 7])
+
+    def test_load_overflow_datum(self):
+        with self.assertRaises(OverflowError) as cm:
+            self.cpu.memory.load(0x2000, [0x00, 0x100])
+        self.assertIn("datum=$100 ea=$2001", str(cm.exception))
+
+    def test_load_outside_memory(self):
+        with self.assertRaises(OverflowError) as cm:
+            self.cpu.memory.load(0xfffe, b"\x01\x02\x03")
+        self.assertIn("end address $10000 is outside the memory", str(cm.exception))
+        self.assertHexList(self.cpu.memory.get(0xfffe, 0x10000), [0, 0])
+
+    def test_load_raw_image(self):
+        filepath = self._write_file("test.rom", bytes(range(0x10)))
+        exec_address = self.cpu.memory.load_image(filepath, address=0x8000)
+        self.assertIsNone(exec_address)
+        self.assertHexList(self.cpu.memory.get(0x8000, 0x8010), list(range(0x10)))
+
+    def test_load_raw_image_without_address(self):
+        filepath = self._write_file("test.rom", b"\x01")
+        with self.assertRaises(ImageFormatError):
+            self.cpu.memory.load_image(filepath)
+
+    def test_load_empty_image(self):
+        filepath = self._write_file("empty.rom", b"")
+        with self.assertRaises(ImageFormatError):
+            self.cpu.memory.load_image(filepath, address=0x8000)
+
+    def test_load_decb_image(self):
+        filepath = self._write_file("TEST.BIN", bytes([
+            0x00, 0x00, 0x02, 0x30, 0x00, 0x12, 0x34,  # segment 1
+            0x00, 0x00, 0x01, 0x40, 0x00, 0x56,  # segment 2
+            0xFF, 0x00, 0x00, 0x30, 0x00,  # postamble with exec address
+        ]))
+        exec_address = self.cpu.memory.load_image(filepath)
+        self.assertEqualHexWord(exec_address, 0x3000)
+        self.assertHexList(self.cpu.memory.get(0x3000, 0x3002), [0x12, 0x34])
+        self.assertHexList(self.cpu.memory.get(0x4000, 0x4001), [0x56])
+
+    def test_load_truncated_decb_image(self):
+        filepath = self._write_file("TEST.BIN", bytes([
+            0x00, 0x00, 0x02, 0x30, 0x00, 0x12, 0x34,  # segment 1
+            0x00, 0x00, 0x05, 0x40, 0x00, 0x56,  # segment 2 is truncated
+        ]))
+        with self.assertRaises(ImageFormatError) as cm:
+            self.cpu.memory.load_image(filepath)
+        self.assertEqual(str(cm.exception), "DECB segment at offset $0007 is truncated")
+
+    def test_load_decb_image_outside_memory(self):
+        filepath = self._write_file("TEST.BIN", bytes([
+            0x00, 0x00, 0x02, 0xFF, 0xFF, 0x12, 0x34,  # segment ends at $10000
+            0xFF, 0x00, 0x00, 0x30, 0x00,  # postamble with exec address
+        ]))
+        with self.assertRaises(OverflowError) as cm:
+            self.cpu.memory.load_image(filepath)
+        self.assertIn("end address $10000 is outside the memory", str(cm.exception))
+
+    def test_load_srec_image(self):
+        filepath = self._write_file("test.s19", (
+            b"S00600004844521B\r\n"
+            b"S1061000ABCD0170\r\n"
+            b"S9031000EC\r\n"
+        ))
+        exec_address = self.cpu.memory.load_image(filepath)
+        self.assertEqualHexWord(exec_address, 0x1000)
+        self.assertHexList(self.cpu.memory.get(0x1000, 0x1003), [0xab, 0xcd, 0x01])
+
+
+class MemoryBackendTestCase(BaseCPUTestCase):
+    def test_default_backend(self):
+        self.assertEqual(self.cpu.memory._backend.name, DEFAULT_BACKEND)
+
+    def test_all_backends(self):
+        cfg = test_config.TestCfg(self.UNITTEST_CFG_DICT)
+        for backend in get_available_backends():
+            with self.subTest(backend=backend):
+                memory = Memory(cfg, backend=backend)
+                self.assertEqual(memory._backend.name, backend)
+                self.cpu = CPU(memory, cfg)
+                self.cpu_test_run(start=0x1000, end=None, mem=[
+                    0x86, 0x42,  # LDA #$42
+                    0xB7, 0x04, 0x00,  # STA $0400
+                    0xFC, 0x10, 0x00,  # LDD $1000
+                ])
+                self.assertEqualHexWord(self.cpu.accu_d.value, 0x8642)
+                self.assertEqualHexByte(memory.read_byte(0x0400), 0x42)
+                self.assertEqual(memory._backend.tobytes(0x1000, 0x1002), b"\x86\x42")
+                self.assertEqual(bytes(memory._backend.get_memoryview()[0x0400:0x0401]), b"\x42")
+                memory.close()
+
+    def test_cfg_backend(self):
+        cfg = test_config.TestCfg(self.UNITTEST_CFG_DICT)
+        cfg.MEMORY_BACKEND = "bytearray"
+        memory = Memory(cfg)
+        self.assertEqual(memory._backend.name, "bytearray")
+        self.assertIsInstance(memory._mem, bytearray)
+
+    def test_unknown_backend(self):
+        cfg = test_config.TestCfg(self.UNITTEST_CFG_DICT)
+        with self.assertRaises(ValueError):
+            Memory(cfg, backend="foobar")
+
+
+class MemorySearchTestCase(BaseCPUTestCase):
+    def setUp(self):
+        super().setUp()
+        self.memory = self.cpu.memory
+        self.memory.load(0x1000, [
+            0x8e, 0x04, 0x00,  # LDX #$0400
+            0x86, 0x2a,  # LDA #$2a
+            0xa7, 0x80,  # STA ,X+
+            0x8c, 0x04, 0x00,  # CMPX #$0400
+            0x8f, 0x04, 0x00,  # (illegal opcode)
+        ])
+
+    def test_find(self):
+        self.assertEqual(self.memory.find(b"\x86\x2a"), 0x1003)
+        self.assertEqual(self.memory.find([0x86, 0x2a], start_addr=0x1004), None)
+        self.assertEqual(self.memory.find(b"\xa7\x80", end_addr=0x1005), None)  # not complete in range
+        self.assertEqual(self.memory.find(b"\xa7\x80", end_addr=0x1006), 0x1005)
+
+    def test_find_all(self):
+        self.assertEqual(self.memory.find_all([None, 0x04, 0x00]), [0x1000, 0x1007, 0x100a])
+        self.assertEqual(self.memory.find_all([0x00, 0x00], 0x1000, 0x100e), [0x100c, 0x100d])
+
+    def test_mask(self):
+        self.assertEqual(
+            self.memory.find_all([0x8e, 0x04, 0x00], mask=[0xf0, 0xff, 0xff]),
+            [0x1000, 0x1007, 0x100a]
+        )
+        self.assertEqual(self.memory.find_all([0x8e, 0x04], mask=[0xfe, 0xff]), [0x1000, 0x100a])
+
+    def test_find_word(self):
+        self.assertEqual(self.memory.find_word(0x0400), 0x1001)
+        self.assertEqual(self.memory.find_all_words(0x0400), [0x1001, 0x1008, 0x100b])
+        self.assertEqual(self.memory.find_word(0x0004), None)  # Big-Endian
+
+    def test_search_backends(self):
+        cfg = test_config.TestCfg(self.UNITTEST_CFG_DICT)
+        for backend in get_available_backends():
+            with self.subTest(backend=backend):
+                memory = Memory(cfg, backend=backend)
+                memory.load(0x2000, b"MC6809")
+                self.assertEqual(memory.find(b"6809"), 0x2002)
+                memory.close()
+
+    @unittest.skipIf(memory_backends.numpy is None, "numpy not installed")
+    def test_numpy_view(self):
+        cfg = test_config.TestCfg(self.UNITTEST_CFG_DICT)
+        for backend in ("numpy", "bytearray", "array"):
+            with self.subTest(backend=backend):
+                memory = Memory(cfg, backend=backend)
+                view = memory.numpy_view()
+                memory.load(0x0400, [0x42])
+                self.assertEqual(view[0x0400], 0x42)  # no copy
+                self.assertEqual(int(view.sum()), 0x42)
+
+    def test_numpy_view_list_backend(self):
+        cfg = test_config.TestCfg(self.UNITTEST_CFG_DICT)
+        with self.assertRaises(RuntimeError):
+            Memory(cfg, backend="list").numpy_view()
+
+
+class PageHashesTestCase(BaseCPUTestCase):
+    def _create_memory(self):
+        cfg = test_config.TestCfg(self.UNITTEST_CFG_DICT)
+        memory = Memory(cfg)
+        CPU(memory, cfg)
+        return memory
+
+    def test_ram_hash(self):
+        memory = self._create_memory()
+        other_memory = self._create_memory()
+        self.assertEqual(memory.ram_hash(), other_memory.ram_hash())
+
+        memory.write_byte(0x0400, 0x01)
+        self.assertNotEqual(memory.ram_hash(), other_memory.ram_hash())
+        other_memory.write_word(0x0400, 0x0100)
+        self.assertEqual(memory.ram_hash(), other_memory.ram_hash())
+
+    def test_lazy_rehash(self):
+        memory = self._create_memory()
+        memory.get_page_hashes()
+        for address in range(0x0400, 0x0600):
+            memory.write_byte(address, 0xff)
+        memory.write_byte(0x2010, 0xff)
+        memory.ram_hash()
+        self.assertEqual(memory._page_hashes.rehashed, 3)
+        memory.ram_hash()
+        self.assertEqual(memory._page_hashes.rehashed, 3)
+
+    def test_diff_pages(self):
+        memory = self._create_memory()
+        other_memory = self._create_memory()
+        snapshot = memory.tobytes()
+
+        memory.write_byte(0x0410, 0x01)
+        memory.load(0x2000, b"\x01" * 0x1ff)
+        self.assertEqual(memory.diff_pages(other_memory), [0x0400, 0x2000, 0x2100])
+        self.assertEqual(memory.diff_pages(snapshot), [0x0400, 0x2000, 0x2100])
+        self.assertEqual(memory.diff_pages(memory.get_page_hashes()), [])
+
+    def test_disable(self):
+        memory = self._create_memory()
+        memory.ram_hash()
+        memory.disable_page_hashes()
+        self.assertEqual(memory._private_dirty_trackers, [])
+        self.assertEqual(memory._dirty_marks, {})
+
+    def test_host_collect(self):
+        memory = self._create_memory()
+        memory.add_dirty_tracking(0x0000, 0x7fff)  # e.g. of a GUI
+        ram_hash = memory.ram_hash()
+        memory.write_byte(0x2000, 0x01)
+        self.assertEqual(memory.collect_dirty(), [(0x2000, 0x20ff)])
+        self.assertNotEqual(memory.ram_hash(), ram_hash)  # The change is not lost
+
+    def test_print_cpu_state_data(self):
+        with mock.patch("builtins.print") as mock_print:
+            print_cpu_state_data(self.cpu.get_state())
+        self.assertIn("\tSHA from RAM:", [call[0][0] for call in mock_print.call_args_list])
+
+
+class DirtyTrackingTestCase(BaseCPUTestCase):
+    def test_no_tracking(self):
+        self.cpu.memory.write_byte(0x0400, 0x01)
+        self.assertEqual(self.cpu.memory.collect_dirty(), [])
+
+    def test_collect_spans(self):
+        memory = self.cpu.memory
+        memory.add_dirty_tracking(0x0400, 0x05ff, block_size=0x20)
+
+        memory.write_byte(0x0300, 0x01)  # not tracked
+        memory.write_byte(0x0401, 0x01)
+        memory.write_word(0x041f, 0x0102)  # two blocks
+        memory.write_byte(0x05ff, 0x01)
+        self.assertEqual(memory.collect_dirty(), [(0x0400, 0x043f), (0x05e0, 0x05ff)])
+        self.assertEqual(memory.collect_dirty(), [])
+
+    def test_collect_part(self):
+        memory = self.cpu.memory
+        memory.add_dirty_tracking(0x0400, 0x05ff)
+        memory.write_byte(0x0410, 0x01)
+        memory.write_byte(0x0510, 0x01)
+        self.assertEqual(memory.collect_dirty(0x0500, 0x05ff), [(0x0500, 0x05ff)])
+        self.assertEqual(memory.collect_dirty(0x0400, 0x04ff), [(0x0400, 0x04ff)])
+
+    def test_collect_partial_block(self):
+        memory = self.cpu.memory
+        memory.add_dirty_tracking(0x0400, 0x05ff)
+        memory.write_byte(0x0480, 0x01)
+        self.assertEqual(memory.collect_dirty(0x0400, 0x040f), [(0x0400, 0x040f)])
+        self.assertEqual(memory.collect_dirty(0x0470, 0x0500), [(0x0470, 0x04ff)])
+        # Both collects cover the block only partly: It's still dirty
+        self.assertEqual(memory.collect_dirty(), [(0x0400, 0x04ff)])
+        self.assertEqual(memory.collect_dirty(), [])
+
+    def test_overlapping_trackers(self):
+        memory = self.cpu.memory
+        screen = memory.add_dirty_tracking(0x0400, 0x05ff, block_size=0x20)
+        pages = memory.add_dirty_tracking(0x0000, 0x7fff)
+
+        memory.load(0x0420, b"\x01\x02")
+        self.assertEqual(screen.collect(), [(0x0420, 0x043f)])
+        self.assertEqual(pages.collect(), [(0x0400, 0x04ff)])
+
+        memory.remove_dirty_tracking(pages)
+        memory.write_byte(0x0000, 0x01)
+        memory.write_byte(0x0400, 0x01)
+        self.assertEqual(memory.collect_dirty(), [(0x0400, 0x041f)])
+
+    def test_private_tracker(self):
+        memory = self.cpu.memory
+        screen = memory.add_dirty_tracking(0x0400, 0x05ff)
+        private = memory.add_dirty_tracking(0x0000, 0x7fff, private=True)
+
+        memory.write_byte(0x0400, 0x01)
+        memory.load(0x2000, b"\x01")
+        self.assertEqual(memory.collect_dirty(), [(0x0400, 0x04ff)])  # only the host tracker
+        self.assertEqual(private.collect(), [(0x0400, 0x04ff), (0x2000, 0x20ff)])
+
+        memory.remove_dirty_tracking(private)
+        memory.remove_dirty_tracking(screen)
+        self.assertEqual(memory._dirty_marks, {})
+
+    def test_host_and_internal_trackers(self):
+        memory = self.cpu.memory
+        self.cpu.system_stack_pointer.set(0x7000)
+        ram_hash = memory.ram_hash()
+        rewind = Rewind(self.cpu)
+        routine = MemoizedRoutine(self.cpu, address=0x3000, code=[0x86, 0x01, 0x39])  # LDA #1 / RTS
+        routine()
+        screen = memory.add_dirty_tracking(0x0400, 0x05ff)
+        screen.collect()
+
+        memory.write_byte(0x2000, 0x01)  # outside of the screen
+        memory.write_byte(0x3001, 0x02)  # patch: LDA #2
+        self.assertEqual(memory.collect_dirty(), [])  # no spans of the internal trackers
+
+        self.assertNotEqual(memory.ram_hash(), ram_hash)
+        self.assertEqual(routine().a, 2)
+        rewind.restore(0)
+        self.assertEqualHexByte(memory.read_byte(0x2000), 0x00)
+
+
+def _read_shared_memory(layout, result_queue):
+    view = SharedMemoryView(layout)
+    result_queue.put((view.get(0x0400, 0x0403), view.read_word(0x0400)))
+    view.close()
+
+
+@unittest.skipIf(shared_memory is None, "multiprocessing.shared_memory needs Python 3.8")
+class SharedMemoryTestCase(BaseCPUTestCase):
+    def setUp(self):
+        cfg = test_config.TestCfg(self.UNITTEST_CFG_DICT)
+        memory = Memory(cfg, shared_memory=True)
+        self.cpu = CPU(memory, cfg)
+
+    def tearDown(self):
+        self.cpu.memory.close()
+
+    def test_layout(self):
+        layout = self.cpu.memory.get_shared_memory_layout()
+        self.assertEqual(layout["size"], 0x10000)
+        self.assertEqual(layout["ram"], [0x0000, 0x7fff])
+        self.assertEqual(layout["cfg"], "TestCfg")
+
+    def test_not_shared(self):
+        cfg = test_config.TestCfg(self.UNITTEST_CFG_DICT)
+        with self.assertRaises(RuntimeError):
+            Memory(cfg).get_shared_memory_layout()
+
+    def test_cpu_run(self):
+        self.cpu_test_run(start=0x1000, end=None, mem=[
+            0x86, 0x42,  # LDA #$42
+            0xB7, 0x04, 0x00,  # STA $0400
+            0xB7, 0x04, 0x02,  # STA $0402
+        ])
+        self.assertHexList(self.cpu.memory.get(0x0400, 0x0403), [0x42, 0x00, 0x42])
+
+    def test_read_only_view(self):
+        self.cpu.memory.write_word(0x0400, 0x1234)
+        view = SharedMemoryView(self.cpu.memory.get_shared_memory_layout())
+        self.assertEqualHexWord(view.read_word(0x0400), 0x1234)
+        with self.assertRaises(TypeError):
+            view.mem[0x0400] = 0x00
+        view.close()
+
+    def test_other_process(self):
+        self.cpu.memory.load(0x0400, b"\x01\x02\x03")
+        result_queue = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=_read_shared_memory,
+            args=(self.cpu.memory.get_shared_memory_layout(), result_queue)
+        )
+        process.start()
+        data, word = result_queue.get(timeout=10)
+        process.join(timeout=10)
+        self.assertEqual(data, b"\x01\x02\x03")
+        self.assertEqualHexWord(word, 0x0102)
+
+    def test_close(self):
+        memory = self.cpu.memory
+        memory.write_byte(0x0400, 0x42)
+        memory.close()
+        self.assertEqualHexByte(memory.read_byte(0x0400), 0x42)
+        memory.write_byte(0x0400, 0x43)
+        self.assertEqualHexByte(memory.read_byte(0x0400), 0x43)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+from MC6809.components.cpu6809 import CPU
+from MC6809.components.memory import Memory
+from MC6809.components.memory_bus import RAMBusDevice, start_bus_process
+from MC6809.tests import test_config
+from MC6809.tests.test_base import BaseCPUTestCase
+
+
+class MemoryBusTestCase(BaseCPUTestCase):
+    def setUp(self):
+        cfg = test_config.TestCfg(self.UNITTEST_CFG_DICT)
+        self.process, bus_queues = start_bus_process(RAMBusDevice)
+        memory = Memory(cfg, **bus_queues)
+        memory.bus.add_range(0x6000, 0x60ff)
+        self.cpu = CPU(memory, cfg)
+        self.bus = memory.bus
+
+    def tearDown(self):
+        self.bus.shutdown()
+        self.process.join(timeout=10)
+        self.assertEqual(self.process.exitcode, 0)
+
+    def test_write_read(self):
+        self.cpu_test_run(start=0x1000, end=None, mem=[
+            0x86, 0x42,  # LDA #$42
+            0xB7, 0x60, 0x10,  # STA $6010
+            0x86, 0x43,  # LDA #$43
+            0xB7, 0x60, 0x11,  # STA $6011
+            0xFC, 0x60, 0x10,  # LDD $6010
+        ])
+        self.assertEqualHexWord(self.cpu.accu_d.value, 0x4243)
+        self.assertEqual(self.bus.get_stats(), {
+            "reads": 2,
+            "writes": 2,
+            "write_batches": 1,  # both writes posted in one batch
+            "round_trips": 2,
+        })
+
+    def test_not_forwarded(self):
+        self.cpu.memory.write_byte(0x5fff, 0x12)
+        self.assertEqualHexByte(self.cpu.memory.read_byte(0x5fff), 0x12)
+        self.assertEqual(self.bus.get_stats()["writes"], 0)
+
+    def test_pipelined_reads(self):
+        memory = self.cpu.memory
+        memory.write_word(0x6000, 0x1234)
+        self.bus.prefetch(0x6000, 0x6001)
+        self.assertEqualHexWord(memory.read_word(0x6000), 0x1234)
+        self.assertEqual(self.bus.get_stats()["reads"], 2)
+
+    def test_deferred_sync(self):
+        memory = self.cpu.memory
+        self.bus.sync_cycles = 1000
+
+        memory.write_byte(0x6000, 0x01)
+        memory.write_byte(0x6001, 0x02)
+        self.assertEqual(self.bus.get_stats()["write_batches"], 0)  # still pending
+
+        self.assertEqualHexByte(memory.read_byte(0x6000), 0x01)  # flush + synchronous read
+        self.assertEqual(self.bus.get_stats()["round_trips"], 1)
+
+        self.assertEqualHexByte(memory.read_byte(0x6000), 0x01)  # from cache
+        self.assertEqual(self.bus.get_stats()["round_trips"], 1)
+
+        self.cpu.cycles += 2000
+        self.assertEqualHexByte(memory.read_byte(0x6001), 0x02)
+        self.assertEqual(self.bus.get_stats()["round_trips"], 2)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import random
+
+from MC6809.components.cpu6809 import CPU
+from MC6809.components.memory import Memory
+from MC6809.core import record_replay
+from MC6809.tests import test_config
+from MC6809.tests.test_base import BaseCPUTestCase
+
+
+PROGRAM = [
+    0x8E, 0x04, 0x00,  # 1000 LDX #$0400
+    0xB6, 0xFF, 0x00,  # 1003 LDA $FF00
+    0xFC, 0xFF, 0x02,  # 1006 LDD $FF02
+    0xED, 0x81,  # 1009 STD ,X++
+    0xB7, 0xFF, 0x04,  # 100B STA $FF04
+    0x8C, 0x04, 0x40,  # 100E CMPX #$0440
+    0x26, 0xF0,  # 1011 BNE $1003
+]
+END = 0x1013
+
+IRQ_HANDLER = [
+    0x7C, 0x05, 0x00,  # 2000 INC $0500
+    0x3B,  # 2003 RTI
+]
+
+
+class RandomDevice:
+    """ Not reproducible input, like a keyboard or a timer """
+
+    def __init__(self, memory):
+        self.writes = []
+        memory.add_read_byte_callback(self.read_byte, 0xff00, 0xff01)
+        memory.add_read_word_callback(self.read_word, 0xff02)
+        memory.add_write_byte_callback(self.write_byte, 0xff04)
+
+    def read_byte(self, cycles, last_op_address, address):
+        return random.randrange(0x100)
+
+    def read_word(self, cycles, last_op_address, address):
+        return random.randrange(0x10000)
+
+    def write_byte(self, cycles, last_op_address, address, value):
+        self.writes.append(value)
+
+
+class RecordReplayTestCase(BaseCPUTestCase):
+    def _create_cpu(self):
+        cfg = test_config.TestCfg(self.UNITTEST_CFG_DICT)
+        cpu = CPU(Memory(cfg), cfg)
+        cpu.memory.load(0x1000, PROGRAM)
+        cpu.memory.load(0x2000, IRQ_HANDLER)
+        cpu.memory.load(cpu.IRQ_VECTOR, [0x20, 0x00])
+        cpu.system_stack_pointer.set(0x7000)
+        cpu.irq_enabled = True
+        cpu.set_cc(0x00)
+        cpu.program_counter.set(0x1000)
+        return cpu
+
+    def _record(self, cpu):
+        device = RandomDevice(cpu.memory)
+        recorder = record_replay.Recorder(cpu)
+        recorder.start()
+        step = 0
+        while cpu.program_counter.value != END:
+            if step % 17 == 16:
+                cpu.irq()
+            cpu.get_and_call_next_op()
+            step += 1
+        log_data = recorder.stop()
+        self.assertEqual(len(device.writes), 0x20)
+        return log_data
+
+    def test_record_replay(self):
+        cpu = self._create_cpu()
+        log_data = self._record(cpu)
+        self.assertNotEqual(cpu.memory.tobytes(0x0500, 0x0501), b"\x00")  # IRQs handled
+
+        other_cpu = self._create_cpu()
+        stats = record_replay.Replayer(other_cpu, log_data).run()
+        self.assertEqual(stats["cycles"], cpu.cycles)
+        self.assertGreater(stats["irqs"], 0)
+
+        self.assertEqual(other_cpu.cycles, cpu.cycles)
+        self.assertEqual(other_cpu.get_snapshot(), cpu.get_snapshot())
+
+    def test_events(self):
+        cpu = self._create_cpu()
+        events = list(record_replay.iter_events(self._record(cpu)))
+        types = [event.type for event in events]
+        self.assertEqual(types.count(record_replay.EVENT_READ_BYTE), 0x20)
+        self.assertEqual(types.count(record_replay.EVENT_READ_WORD), 0x20)
+        self.assertEqual(types[-1], record_replay.EVENT_END)
+        self.assertEqual(events[-1].cycles, cpu.cycles)
+
+    def test_stop_restores_devices(self):
+        cpu = self._create_cpu()
+        self._record(cpu)
+        self.assertEqual(cpu.memory._read_byte_callbacks[0xff00].__name__, "read_byte")
+        self.assertEqual(cpu.irq.__func__, CPU.irq)
+
+    def test_divergence(self):
+        log_data = self._record(self._create_cpu())
+        other_cpu = self._create_cpu()
+        other_cpu.memory.load(0x1004, [0xFF, 0x01])  # LDA $FF01 instead of $FF00
+        with self.assertRaises(record_replay.ReplayError):
+            record_replay.Replayer(other_cpu, log_data).run()
+
+    def test_long_gap(self):
+        cpu = self._create_cpu()
+        recorder = record_replay.Recorder(cpu)
+        recorder.start()
+        cpu.cycles += 0x100000000 * 2 + 5
+        events = list(record_replay.iter_events(recorder.stop()))
+        self.assertEqual(events, [record_replay.Event(record_replay.EVENT_END, cpu.cycles, 0, 0)])
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+from MC6809.core.rewind import Rewind
+from MC6809.tests.test_base import BaseCPUTestCase
+
+
+class RewindTestCase(BaseCPUTestCase):
+    def setUp(self):
+        super().setUp()
+        self.memory = self.cpu.memory
+
+    def _step(self, address, value):
+        self.memory.write_byte(address, value)
+        self.cpu.accu_a.set(value)
+        self.cpu.cycles = (self.cpu.cycles // 1000 + 1) * 1000
+
+    def assert_state(self, address, value):
+        self.assertEqualHexByte(self.memory.read_byte(address), value)
+        self.assertEqualHexByte(self.cpu.accu_a.value, value)
+
+    def test_restore(self):
+        rewind = Rewind(self.cpu, page_size=0x10)
+        self._step(0x0400, 0x01)
+        rewind.checkpoint()
+        self._step(0x0400, 0x02)
+        self._step(0x1000, 0x02)
+        rewind.checkpoint()
+        self._step(0x0400, 0x03)
+        self._step(0x2000, 0x03)
+
+        self.assertEqual(rewind.get_cycles(), [0, 1000, 3000])
+        self.assertEqual(rewind.get_stats()["bytes"], 3 * 0x10)
+
+        rewind.restore(-1)
+        self.assertEqual(self.cpu.cycles, 3000)
+        self.assert_state(0x0400, 0x02)
+        self.assertEqualHexByte(self.memory.read_byte(0x1000), 0x02)
+        self.assertEqualHexByte(self.memory.read_byte(0x2000), 0x00)
+
+        rewind.restore(1)
+        self.assert_state(0x0400, 0x01)
+        self.assertEqualHexByte(self.memory.read_byte(0x1000), 0x00)
+        self.assertEqual(rewind.get_cycles(), [0, 1000])
+
+        rewind.restore(0)
+        self.assertEqual(self.cpu.cycles, 0)
+        self.assert_state(0x0400, 0x00)
+        self.assertEqual(len(rewind), 1)
+        self.assertEqual(rewind.get_stats()["restored"], 3)
+
+        with self.assertRaises(IndexError):
+            rewind.restore(1)
+        rewind.close()
+
+    def test_ring_eviction(self):
+        rewind = Rewind(self.cpu, max_checkpoints=2)
+        for value in range(1, 6):
+            self._step(0x0400 + value * 0x100, value)
+            rewind.checkpoint()
+
+        self.assertEqual(rewind.get_cycles(), [3000, 4000, 5000])
+        self.assertEqual(rewind.get_stats()["evicted"], 3)
+
+        rewind.restore(0)  # The merged base image
+        self.assert_state(0x0700, 0x03)
+        self.assertEqualHexByte(self.memory.read_byte(0x0500), 0x01)
+        self.assertEqualHexByte(self.memory.read_byte(0x0800), 0x00)
+        self.assertEqualHexByte(self.memory.read_byte(0x0900), 0x00)
+
+    def test_memory_budget(self):
+        rewind = Rewind(self.cpu, max_bytes=0x300)
+        for value in range(1, 6):
+            self._step(0x0400 + value * 0x100, value)
+            self._step(0x2000 + value * 0x100, value)
+            rewind.checkpoint()
+        self.assertEqual(rewind.get_stats()["checkpoints"], 1)
+        self.assertEqual(rewind.get_stats()["bytes"], 0x200)
+
+    def test_rewind_cycles(self):
+        rewind = Rewind(self.cpu)
+        for value in range(1, 6):
+            self._step(0x0400, value)
+            rewind.checkpoint()
+        self.assertEqual(rewind.get_cycles(), [0, 1000, 2000, 3000, 4000, 5000])
+
+        self.cpu.cycles = 5500
+        self.assertEqual(rewind.rewind_cycles(2000), 3000)
+        self.assert_state(0x0400, 0x03)
+        self.assertEqual(rewind.rewind_cycles(100000), 0)
+        self.assert_state(0x0400, 0x00)
+
+    def test_close(self):
+        self.memory.load(0x4000, [0x20, 0xFE])  # BRA *
+        self.cpu.program_counter.set(0x4000)
+        rewind = Rewind(self.cpu, interval=1000)
+        rewind.attach()
+        self.cpu.run_for_cycles(5000)
+        self.assertEqual(len(rewind), 6)
+
+        rewind.close()
+        self.assertEqual(len(self.cpu.scheduler), 0)
+        self.cpu.run_for_cycles(5000)
+        self.assertEqual(len(rewind), 6)
+
+    def test_host_collect(self):
+        self.memory.add_dirty_tracking(0x0000, 0x7fff)  # e.g. of a GUI
+        rewind = Rewind(self.cpu)
+        self._step(0x0400, 0x22)
+        rewind.checkpoint()
+        self._step(0x0400, 0x33)
+        self.assertEqual(self.memory.collect_dirty(), [(0x0400, 0x04ff)])
+        rewind.restore(-1)
+        self.assert_state(0x0400, 0x22)
+
+    def test_events_after_restore(self):
+        self.memory.load(0x4000, [0x20, 0xFE])  # BRA *
+        self.cpu.program_counter.set(0x4000)
+        rewind = Rewind(self.cpu, interval=1000, max_checkpoints=200)
+        rewind.attach()
+        calls = []
+        self.cpu.schedule_event(1500, calls.append, period=1000)
+        self.cpu.run_for_cycles(100000)
+        self.assertEqual(len(calls), 99)
+
+        rewind.restore(10)
+        self.assertEqual(self.cpu.cycles // 1000, 10)
+        self.assertEqual(len(rewind), 11)
+        del calls[:]
+        self.cpu.run_for_cycles(50000)
+        self.assertEqual(len(calls), 50)  # the timer doesn't stall
+        self.assertEqual(len(rewind), 61)  # the checkpoints, too
+
+    def test_attach(self):
+        self.memory.load(0x4000, [
+            0x7C, 0x04, 0x00,  # INC $0400
+            0x20, 0xFB,  # BRA $4000
+        ])
+        self.cpu.program_counter.set(0x4000)
+        rewind = Rewind(self.cpu, interval=1000)
+        rewind.attach()
+
+        values = {}  # The counter at every checkpoint
+
+        def store_value(cycles_since_last_call):
+            values[self.cpu.cycles] = self.memory._mem[0x0400]
+
+        self.cpu.add_sync_callback(1000, store_value)  # called after the checkpoint
+        self.cpu.burst_run()
+
+        self.assertGreater(len(rewind), 2)
+        cycles = rewind.get_cycles()
+        self.assertTrue(all(  # a checkpoint every 1000 cycles, without drift
+            second // 1000 - first // 1000 == 1 for first, second in zip(cycles, cycles[1:])
+        ), cycles)
+
+        for index in (-3, 1):
+            rewind.restore(index)
+            self.assertEqual(self.cpu.cycles, cycles[index])
+            self.assertEqual(self.memory.read_byte(0x0400), values[cycles[index]])
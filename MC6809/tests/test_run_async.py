@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import asyncio
+import time
+
+from MC6809.tests.test_base import BaseCPUTestCase
+
+
+class RunAsyncTestCase(BaseCPUTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cpu.memory.load(0x4000, [
+            0x30, 0x01,  # 4000 LEAX 1,X
+            0x20, 0xFC,  # 4002 BRA $4000
+        ])
+        self.cpu.program_counter.set(0x4000)
+
+    def _run_loop(self, coroutine):
+        # Not asyncio.run(): It's new in Python 3.7
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def _run(self, coroutine, ticks_interval=0):
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(self.cpu.cycles)
+                await asyncio.sleep(ticks_interval)
+
+        async def main():
+            ticker_task = asyncio.ensure_future(ticker())
+            result = await coroutine
+            ticker_task.cancel()
+            try:
+                await ticker_task
+            except asyncio.CancelledError:
+                pass
+            return result
+
+        return self._run_loop(main()), ticks
+
+    def test_cycles(self):
+        cycles, ticks = self._run(self.cpu.run_async(cycles=100000, yield_every=10000))
+        self.assertGreaterEqual(cycles, 100000)
+        self.assertEqual(cycles, self.cpu.cycles)
+        self.assertGreaterEqual(len(ticks), 10)  # the other task runs between the slices
+        for previous, tick in zip(ticks[1:], ticks[2:]):
+            self.assertLess(tick - previous, 10000 + 20)
+
+    def test_events(self):
+        calls = []
+        self.cpu.schedule_event(1000, calls.append, period=1000)
+        self._run(self.cpu.run_async(cycles=10000, yield_every=3000))
+        self.assertEqual(len(calls), 10)
+
+    def test_time_slice(self):
+        cycles, ticks = self._run(self.cpu.run_async(cycles=200000, yield_every=100000, time_slice=0.001))
+        slices = [tick - previous for previous, tick in zip(ticks, ticks[1:])]
+        self.assertLess(min(slices), 100000)  # shortened by the time slice
+
+    def test_quit(self):
+        async def quit_later():
+            await asyncio.sleep(0.05)
+            self.cpu.quit()
+
+        async def main():
+            asyncio.ensure_future(quit_later())
+            return await self.cpu.run_async(yield_every=1000)
+
+        cycles = self._run_loop(main())
+        self.assertGreater(cycles, 0)
+        self.assertFalse(self.cpu.running)
+
+    def test_speed_limit(self):
+        start_time = time.perf_counter()
+        cycles, ticks = self._run(
+            self.cpu.run_async(cycles=20000, yield_every=1000, target_cycles_per_sec=100000),
+            ticks_interval=0.001,
+        )
+        duration = time.perf_counter() - start_time
+        # Only loose bounds of the wall clock time, e.g. a loaded CI machine runs slower:
+        self.assertGreaterEqual(duration, 0.19)  # never faster than the limit
+        self.assertLess(duration, 5)
+        stats = self.cpu._pacer.get_stats()
+        if stats["slept"]:
+            self.assertGreater(len(ticks), 1)  # the waits don't block the loop
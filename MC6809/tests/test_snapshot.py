@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import os
+import tempfile
+
+from MC6809.components.cpu6809 import CPUSpeedLimit
+from MC6809.components.mc6809_interrupt import IRQ_LINE, NMI_LINE, WAIT_CWAI, WAIT_NONE
+from MC6809.core import snapshot
+from MC6809.tests.test_base import BaseCPUTestCase
+
+
+class SnapshotTestCase(BaseCPUTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cpu.index_x.set(0x1234)
+        self.cpu.index_y.set(0x5678)
+        self.cpu.user_stack_pointer.set(0x0100)
+        self.cpu.system_stack_pointer.set(0x0200)
+        self.cpu.program_counter.set(0x4000)
+        self.cpu.accu_d.set(0xabcd)
+        self.cpu.direct_page.set(0x12)
+        self.cpu.set_cc(0x55)
+        self.cpu.cycles = 0x123456789
+        self.cpu.memory.load(0x0400, b"MC6809")
+
+    def _reset(self):
+        for register in self.cpu.register_str2object.values():
+            register.set(0)
+        self.cpu.cycles = 0
+        self.cpu.memory.load(0x0400, bytes(6))
+
+    def assert_restored(self):
+        self.assertEqualHexWord(self.cpu.index_x.value, 0x1234)
+        self.assertEqualHexWord(self.cpu.index_y.value, 0x5678)
+        self.assertEqualHexWord(self.cpu.user_stack_pointer.value, 0x0100)
+        self.assertEqualHexWord(self.cpu.system_stack_pointer.value, 0x0200)
+        self.assertEqualHexWord(self.cpu.program_counter.value, 0x4000)
+        self.assertEqualHexWord(self.cpu.accu_d.value, 0xabcd)
+        self.assertEqualHexByte(self.cpu.direct_page.value, 0x12)
+        self.assertEqualHexByte(self.cpu.get_cc_value(), 0x55)
+        self.assertEqual(self.cpu.cycles, 0x123456789)
+
+    def test_round_trip(self):
+        data = self.cpu.get_snapshot()
+        self.assertEqual(len(data), snapshot.HEADER.size + 0x10000)
+        self._reset()
+        self.cpu.set_snapshot(data)
+        self.assert_restored()
+        self.assertEqual(self.cpu.memory.tobytes(0x0400, 0x0406), b"MC6809")
+
+    def test_compression(self):
+        for compression in ("zlib", "lzma"):
+            with self.subTest(compression=compression):
+                data = self.cpu.get_snapshot(compression=compression)
+                self.assertLess(len(data), 0x1000)
+                self._reset()
+                header = self.cpu.set_snapshot(data)
+                self.assertEqual(header.ram_size, 0x10000)
+                self.assert_restored()
+                self.assertEqual(self.cpu.memory.tobytes(0x0400, 0x0406), b"MC6809")
+
+    def test_without_ram(self):
+        data = self.cpu.get_snapshot(ram=False)
+        self.assertEqual(len(data), snapshot.HEADER.size)
+        self.cpu.memory.load(0x0400, b"foobar")
+        self.cpu.set_snapshot(data)
+        self.assert_restored()
+        self.assertEqual(self.cpu.memory.tobytes(0x0400, 0x0406), b"foobar")
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory(prefix="MC6809_") as temp_dir:
+            filepath = os.path.join(temp_dir, "test.snapshot")
+            size = snapshot.save_snapshot(self.cpu, filepath, compression="zlib")
+            self.assertEqual(os.path.getsize(filepath), size)
+            self._reset()
+            snapshot.load_snapshot(self.cpu, filepath)
+        self.assert_restored()
+        self.assertEqual(self.cpu.memory.tobytes(0x0400, 0x0406), b"MC6809")
+
+    def test_errors(self):
+        data = bytearray(self.cpu.get_snapshot())
+        with self.assertRaisesRegex(snapshot.SnapshotError, "Unknown snapshot compression"):
+            self.cpu.get_snapshot(compression="foo")
+        with self.assertRaisesRegex(snapshot.SnapshotError, "No MC6809 snapshot"):
+            self.cpu.set_snapshot(b"XXXX" + data[4:])
+        with self.assertRaisesRegex(snapshot.SnapshotError, "Unsupported snapshot version"):
+            self.cpu.set_snapshot(data[:4] + b"\xff" + data[5:])
+        with self.assertRaisesRegex(snapshot.SnapshotError, "Wrong RAM size"):
+            self.cpu.set_snapshot(data[:-1])
+
+    def test_change_cpu(self):
+        new_cpu = self.cpu.to_speed_limit()
+        self.assertIsInstance(new_cpu, CPUSpeedLimit)
+        self.cpu = new_cpu
+        self.assert_restored()
+        self.assertIs(new_cpu.memory, self.cpu.memory)
+
+    def test_change_cpu_moves_events_and_interrupts(self):
+        self.cpu.cycles = 0
+        self.cpu.memory.load(0x4000, [0x12] * 0x100)  # NOPs
+        self.cpu.memory.load(self.cpu.NMI_VECTOR, [0x50, 0x00])
+        calls = []
+        self.cpu.add_sync_callback(10, calls.append)
+        self.cpu.assert_interrupt(NMI_LINE)
+        old_cpu = self.cpu
+
+        self.cpu = self.cpu.to_speed_limit()
+        self.assertIs(self.cpu.scheduler, old_cpu.scheduler)
+        self.assertEqual(self.cpu.interrupt_lines, NMI_LINE)
+
+        self.cpu.step(1)  # NOP, then the NMI is delivered by the new CPU
+        self.assertEqual(self.cpu.interrupt_counts[NMI_LINE], 1)
+        self.assertEqualHexWord(self.cpu.program_counter.value, 0x5000)
+        self.assertEqual(old_cpu.interrupt_lines, NMI_LINE)  # untouched
+
+        self.cpu.step(10)
+        self.assertGreaterEqual(len(calls), 1)
+
+    def test_waiting_in_cwai(self):
+        self.cpu.memory.load(0x4000, [
+            0x3C, 0xEF,  # 4000 CWAI #$EF ; enable IRQ
+            0x30, 0x01,  # 4002 LEAX 1,X
+        ])
+        self.cpu.memory.load(self.cpu.IRQ_VECTOR, [0x50, 0x00])
+        self.cpu.irq_enabled = True
+        self.cpu.step(1)
+        self.assertEqual(self.cpu.wait_state, WAIT_CWAI)
+        self.assertEqualHexWord(self.cpu.system_stack_pointer.value, 0x0200 - 12)
+        data = self.cpu.get_snapshot(ram=False)
+
+        self._reset()
+        self.cpu.wait_state = WAIT_NONE
+        self.cpu.irq_enabled = False
+        self.cpu.set_snapshot(data)
+        self.assertEqual(self.cpu.wait_state, WAIT_CWAI)
+        self.assertTrue(self.cpu.irq_enabled)
+
+        self.cpu = self.cpu.to_speed_limit()
+        self.assertEqual(self.cpu.wait_state, WAIT_CWAI)
+        self.cpu.step(5)  # still waiting, without stacking again
+        self.assertEqualHexWord(self.cpu.program_counter.value, 0x4000)
+        self.assertEqualHexWord(self.cpu.system_stack_pointer.value, 0x0200 - 12)
+
+        self.cpu.assert_interrupt(IRQ_LINE)
+        self.cpu.step(1)
+        self.assertEqualHexWord(self.cpu.program_counter.value, 0x5000)
+        self.assertEqualHexWord(self.cpu.system_stack_pointer.value, 0x0200 - 12)
+        self.assertEqual(self.cpu.wait_state, WAIT_NONE)
+
+    def test_latched_nmi(self):
+        self.cpu.memory.load(0x4000, [0x12])  # NOP
+        self.cpu.memory.load(self.cpu.NMI_VECTOR, [0x50, 0x00])
+        self.cpu.nmi()
+        self.cpu = self.cpu.to_speed_limit()  # the pending NMI is moved to the new CPU
+        self.assertEqual(self.cpu.interrupt_lines, NMI_LINE)
+        self.cpu.step(1)  # NOP, then the NMI is delivered
+        self.assertEqualHexWord(self.cpu.program_counter.value, 0x5000)
+        self.assertEqual(self.cpu.interrupt_lines, 0)
+
+    def test_state(self):
+        state = self.cpu.get_state()
+        self.assertIsInstance(state["RAM"], bytes)
+        self._reset()
+        self.cpu.set_state(state)
+        self.assert_restored()
+        self.assertEqual(self.cpu.memory.tobytes(0x0400, 0x0406), b"MC6809")
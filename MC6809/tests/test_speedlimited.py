@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+"""
+    6809 unittests
+    ~~~~~~~~~~~~~~
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import unittest
+
+from MC6809.components.cpu6809 import CPUSpeedLimit
+from MC6809.components.mc6809_speedlimited import PACE_HYBRID, PACE_SLEEP, PACE_SPIN, Pacer
+from MC6809.components.memory import Memory
+from MC6809.tests import test_config
+from MC6809.tests.test_base import BaseCPUTestCase
+
+
+DRAGON_CYCLES_PER_SEC = 894886
+
+
+class FakeClock:
+    """
+    A clock, that only advances by sleep() and by the busy wait.
+    sleep() oversleeps like a real OS timer.
+    """
+
+    def __init__(self, oversleep=0.0, tick=0.00001):
+        self.now = 100.0
+        self.oversleep = oversleep
+        self.tick = tick
+        self.sleeps = []
+
+    def clock(self):
+        self.now += self.tick
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds + self.oversleep
+
+    def work(self, seconds):
+        self.now += seconds
+
+
+class PacerTestCase(unittest.TestCase):
+    def _create_pacer(self, fake_clock, mode, **kwargs):
+        return Pacer(
+            DRAGON_CYCLES_PER_SEC, mode=mode, clock=fake_clock.clock, sleep=fake_clock.sleep, **kwargs
+        )
+
+    def _run(self, pacer, fake_clock, bursts=100, burst_cycles=14914, burst_duration=0.005):
+        cycles = 0
+        pacer.start(cycles)
+        for __ in range(bursts):
+            fake_clock.work(burst_duration)
+            cycles += burst_cycles
+            pacer.pace(cycles)
+        return cycles
+
+    def test_no_drift(self):
+        fake_clock = FakeClock(oversleep=0.001)  # every sleep() is 1ms too long
+        pacer = self._create_pacer(fake_clock, PACE_SLEEP)
+        self._run(pacer, fake_clock)
+        stats = pacer.get_stats()
+        self.assertAlmostEqual(stats["speed"], 1.0, places=2)
+        self.assertEqual(stats["resyncs"], 0)
+        self.assertEqual(stats["bursts"], 100)
+        # The oversleep of one burst shortens the sleep of the next burst:
+        frame_time = 14914 / DRAGON_CYCLES_PER_SEC
+        self.assertAlmostEqual(fake_clock.sleeps[0], frame_time - 0.005, delta=0.0001)
+        for sleep_time in fake_clock.sleeps[1:]:
+            self.assertAlmostEqual(sleep_time, frame_time - 0.005 - 0.001, delta=0.0001)
+
+    def test_spin(self):
+        fake_clock = FakeClock()
+        pacer = self._create_pacer(fake_clock, PACE_SPIN)
+        self._run(pacer, fake_clock, bursts=10)
+        stats = pacer.get_stats()
+        self.assertEqual(fake_clock.sleeps, [])
+        self.assertGreater(stats["spun"], 0.1)
+        self.assertLess(stats["lateness_p100"], 0.0001)
+        self.assertAlmostEqual(stats["speed"], 1.0, places=3)
+
+    def test_hybrid(self):
+        fake_clock = FakeClock(oversleep=0.0005)
+        pacer = self._create_pacer(fake_clock, PACE_HYBRID, spin_time=0.002)
+        self._run(pacer, fake_clock, bursts=10)
+        stats = pacer.get_stats()
+        self.assertEqual(len(fake_clock.sleeps), 10)
+        self.assertGreater(stats["spun"], 10 * 0.0014)  # the oversleep is covered by the spin time
+        self.assertLess(stats["lateness_p100"], 0.0001)
+        self.assertAlmostEqual(stats["speed"], 1.0, places=3)
+
+    def test_too_slow(self):
+        fake_clock = FakeClock()
+        pacer = self._create_pacer(fake_clock, PACE_HYBRID, max_lag=0.1)
+        self._run(pacer, fake_clock, bursts=50, burst_duration=0.02)  # 20ms work for 16.7ms emulation
+        stats = pacer.get_stats()
+        self.assertEqual(fake_clock.sleeps, [])
+        self.assertEqual(stats["resyncs"], 1)
+        self.assertAlmostEqual(stats["speed"], 14914 / DRAGON_CYCLES_PER_SEC / 0.02, places=2)
+        self.assertGreater(stats["lateness_p99"], 0.05)
+
+    def test_resync_after_pause(self):
+        fake_clock = FakeClock()
+        pacer = self._create_pacer(fake_clock, PACE_SLEEP)
+        cycles = self._run(pacer, fake_clock, bursts=10)
+        fake_clock.work(5)  # e.g.: the host was paused
+        pacer.pace(cycles + 14914)
+        self.assertEqual(pacer.resyncs, 1)
+        del fake_clock.sleeps[:]
+        self._run(pacer, fake_clock, bursts=10)
+        self.assertEqual(len(fake_clock.sleeps), 10)  # no catch up at full speed
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            Pacer(1000, mode="foobar")
+
+
+class CPUSpeedLimitTestCase(BaseCPUTestCase):
+    def test_speed_limit(self):
+        cfg = test_config.TestCfg(self.UNITTEST_CFG_DICT)
+        cpu = CPUSpeedLimit(Memory(cfg), cfg)
+        cpu.memory.load(0x4000, [
+            0x30, 0x01,  # 4000 LEAX 1,X
+            0x20, 0xFC,  # 4002 BRA $4000
+        ])
+        cpu.program_counter.set(0x4000)
+        target = 50000  # cycles/sec
+        cpu.outer_burst_op_count = 10
+
+        # The emulation doesn't advance the fake clock: The machine load can't disturb the pacing
+        fake_clock = FakeClock()
+        cpu._pacer = Pacer(target, clock=fake_clock.clock, sleep=fake_clock.sleep)
+        cpu._pacer.start(cpu.cycles)
+
+        while cpu.cycles < target * 0.3:
+            cpu.run(max_run_time=0.01, target_cycles_per_sec=target)
+        stats = cpu.get_speed_stats()
+        self.assertAlmostEqual(stats["speed"], 1.0, delta=0.01)
+        self.assertEqual(stats["resyncs"], 0)
+        self.assertGreater(len(fake_clock.sleeps), 0)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+"""
+    MC6809 - binary image formats
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Parse the image formats that are used to get 6809 code into memory:
+
+    * raw - e.g. ROM dumps, the whole file is one segment
+    * DECB - the Disk Extended Color BASIC .BIN format (machine language files)
+    * Motorola S-record - S19/S28/S37 text files
+
+    All parser are generators of (address, data) segments. 'data' is a slice
+    of the given buffer (or a new bytes object for S-records), so that a
+    memory mapped file can be copied into the emulated memory without
+    any intermediate list.
+
+    :created: 2020 by the MC6809 team
+    :copyleft: 2020 by the MC6809 team, see AUTHORS for more details.
+    :license: GNU GPL v3 or above, see LICENSE for more details.
+"""
+
+
+import os
+
+
+FORMAT_RAW = "raw"
+FORMAT_DECB = "decb"
+FORMAT_SREC = "srec"
+
+FILE_EXTENSIONS = {
+    ".bin": FORMAT_DECB,
+    ".s19": FORMAT_SREC,
+    ".s28": FORMAT_SREC,
+    ".s37": FORMAT_SREC,
+    ".srec": FORMAT_SREC,
+    ".mot": FORMAT_SREC,
+}
+
+
+class ImageFormatError(ValueError):
+    pass
+
+
+def guess_format(filepath):
+    """
+    >>> guess_format("/foo/bar/GAME.BIN")
+    'decb'
+    >>> guess_format("monitor.s19")
+    'srec'
+    >>> guess_format("d32.rom")
+    'raw'
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    return FILE_EXTENSIONS.get(ext, FORMAT_RAW)
+
+
+def iter_raw_segments(data, address):
+    """
+    >>> list(iter_raw_segments(b"\\x12\\x34", address=0x8000))
+    [(32768, b'\\x124')]
+    """
+    if address is None:
+        raise ImageFormatError("A raw image needs a load address!")
+    yield address, data
+
+
+def iter_decb_segments(data):
+    """
+    Yields all segments of a DECB .BIN file.
+    The exec address from the postamble is returned as generator result,
+    use load_segments() to get it.
+
+    >>> image = bytes([0x00, 0x00, 0x02, 0x10, 0x00, 0xAB, 0xCD, 0xFF, 0x00, 0x00, 0x10, 0x00])
+    >>> [(hex(address), bytes(segment)) for address, segment in iter_decb_segments(image)]
+    [('0x1000', b'\\xab\\xcd')]
+
+    >>> list(iter_decb_segments(b"\\x00\\x00\\x05\\x10\\x00\\xAB"))
+    Traceback (most recent call last):
+    ...
+    MC6809.utils.image_formats.ImageFormatError: DECB segment at offset $0000 is truncated
+    """
+    view = memoryview(data)
+    size = len(view)
+    pos = 0
+    while pos + 5 <= size:
+        block_type = view[pos]
+        length = (view[pos + 1] << 8) | view[pos + 2]
+        address = (view[pos + 3] << 8) | view[pos + 4]
+        if block_type == 0xFF:
+            return address  # exec address of the postamble
+        if block_type != 0x00:
+            raise ImageFormatError(f"Unknown DECB block type ${block_type:02x} at offset ${pos:04x}")
+
+        start = pos + 5
+        end = start + length
+        if end > size:
+            raise ImageFormatError(f"DECB segment at offset ${pos:04x} is truncated")
+        yield address, view[start:end]
+        pos = end
+
+    raise ImageFormatError("DECB image without postamble")
+
+
+def iter_srec_segments(data):
+    """
+    Yields all data records of a Motorola S-record file.
+    The start address of the termination record is the generator result.
+
+    >>> records = b"S00600004844521B\\nS1061000ABCD0170\\nS9031000EC\\n"
+    >>> [(hex(address), segment) for address, segment in iter_srec_segments(records)]
+    [('0x1000', b'\\xab\\xcd\\x01')]
+
+    >>> list(iter_srec_segments(b"S1061000ABCD0100"))
+    Traceback (most recent call last):
+    ...
+    MC6809.utils.image_formats.ImageFormatError: S-record line 1 has a wrong checksum: $00 should be $70
+    """
+    address_sizes = {"0": 2, "1": 2, "2": 3, "3": 4, "5": 2, "6": 3, "7": 4, "8": 3, "9": 2}
+
+    for line_no, line in enumerate(bytes(data).splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line[:1] != b"S" or len(line) < 4:
+            raise ImageFormatError(f"S-record line {line_no:d} is not a S-record: {line[:20]!r}")
+
+        record_type = chr(line[1])
+        try:
+            address_size = address_sizes[record_type]
+            record = bytes.fromhex(line[2:].decode("ASCII"))
+        except (KeyError, ValueError) as err:
+            raise ImageFormatError(f"S-record line {line_no:d} is invalid: {err}")
+
+        count = record[0]
+        if count != len(record) - 1:
+            raise ImageFormatError(f"S-record line {line_no:d} has a wrong byte count")
+
+        checksum = ~sum(record[:-1]) & 0xff
+        if checksum != record[-1]:
+            raise ImageFormatError(
+                f"S-record line {line_no:d} has a wrong checksum: ${record[-1]:02x} should be ${checksum:02x}"
+            )
+
+        address = int.from_bytes(record[1:1 + address_size], "big")
+        if record_type in "123":
+            yield address, record[1 + address_size:-1]
+        elif record_type in "789":
+            return address
+
+
+def iter_segments(data, fmt, address=None):
+    if fmt == FORMAT_RAW:
+        return iter_raw_segments(data, address)
+    elif fmt == FORMAT_DECB:
+        return iter_decb_segments(data)
+    elif fmt == FORMAT_SREC:
+        return iter_srec_segments(data)
+    raise ImageFormatError(f"Unknown image format: {fmt!r}")
+
+
+def load_segments(segments, load_func):
+    """
+    Call 'load_func(address, data)' for every segment
+    and return the exec/start address (if the format stores one)
+
+    >>> image = b"S1051000ABCD72\\nS9031234B6\\n"
+    >>> loaded = []
+    >>> hex(load_segments(iter_srec_segments(image), lambda address, data: loaded.append((address, data))))
+    '0x1234'
+    >>> loaded
+    [(4096, b'\\xab\\xcd')]
+    """
+    while True:
+        try:
+            address, data = next(segments)
+        except StopIteration as err:
+            return err.value
+        load_func(address, data)